@@ -107,6 +107,32 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Con REDIS_URL (requiere el paquete redis) el cache de estadísticas y sus
+# invalidaciones se comparten entre todos los procesos.
+# Sin REDIS_URL se usa LocMemCache, que es propio de cada proceso: con varios workers
+# (gunicorn/uvicorn) una escritura solo invalida las estadísticas, los conteos de los grids
+# y los ETag del worker que la atendió, y los demás siguen sirviendo sus entradas hasta que
+# expiran (hasta 15 minutos en las estadísticas). Solo es adecuado para desarrollo o para un
+# único proceso; `manage.py check --deploy` lo reporta (core.E001).
+
+if os.environ.get("REDIS_URL") and not TEST:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 1000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -133,6 +159,10 @@ LANGUAGE_CODE = "es-ec"
 
 TIME_ZONE = "UTC"
 
+# Zona horaria en la que se definen los días, semanas, meses y años de las estadísticas
+# y de sus acumulados diarios (tras cambiarla hay que reconstruir los acumulados).
+ZONA_HORARIA_ESTADISTICAS = os.environ.get("ZONA_HORARIA_ESTADISTICAS", "America/Guayaquil")
+
 USE_I18N = True
 
 USE_TZ = True
@@ -208,8 +238,13 @@ if len(ENV_CORS_ALLOWED_ORIGINS) > 0:
 CORS_ALLOW_HEADERS = (
     *default_headers,
     "token",
+    "if-none-match",
+    "if-modified-since",
 )
 
+# El frontend lee el ETag para enviarlo en If-None-Match (core.condicional).
+CORS_EXPOSE_HEADERS = ("etag",)
+
 CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
@@ -220,7 +255,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.coreapi.AutoSchema",
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.GridLimitOffsetPagination",
     "PAGE_SIZE": 10,
 }
 
@@ -263,3 +298,9 @@ TEMPLATES = [
         },
     },
 ]
+
+# Dashboard de estadísticas: hilos del pool, tiempo máximo por widget y tiempo máximo en la
+# cola del pool antes de empezar (segundos).
+DASHBOARD_WORKERS = int(os.environ.get("DASHBOARD_WORKERS", 4))
+DASHBOARD_TIMEOUT = float(os.environ.get("DASHBOARD_TIMEOUT", 10))
+DASHBOARD_ESPERA = float(os.environ.get("DASHBOARD_ESPERA", 30))
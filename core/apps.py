@@ -1,6 +1,26 @@
+import uuid
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self) -> None:
+        from . import checks, stats_cache  # noqa: F401 (checks registra sus validaciones)
+
+        post_save.connect(
+            stats_cache.invalidar_por_modelo,
+            dispatch_uid=str(uuid.uuid3(uuid.NAMESPACE_OID, "stats_cache_post_save")),
+        )
+
+        post_delete.connect(
+            stats_cache.invalidar_por_modelo,
+            dispatch_uid=str(uuid.uuid3(uuid.NAMESPACE_OID, "stats_cache_post_delete")),
+        )
+
+        m2m_changed.connect(
+            stats_cache.invalidar_por_relacion,
+            dispatch_uid=str(uuid.uuid3(uuid.NAMESPACE_OID, "stats_cache_m2m_changed")),
+        )
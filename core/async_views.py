@@ -0,0 +1,66 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class RespuestaAsincrona(JsonResponse):
+    """
+    Respuesta JSON de las vistas asíncronas. Usa el mismo encoder que DRF para que el
+    cuerpo coincida con el de la vista síncrona y conserva data para el cache.
+    """
+
+    def __init__(self, data, status=status.HTTP_200_OK):
+        super().__init__(data, encoder=JSONEncoder, safe=False, status=status)
+        self.data = data
+
+
+def _autenticar(request):
+    """
+    Autentica la petición con las clases de autenticación configuradas en DRF.
+    Respeta _force_auth_user (pruebas y peticiones internas del dashboard).
+    """
+    usuario = getattr(request, "_force_auth_user", None)
+    if usuario is not None:
+        return usuario
+
+    for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        resultado = clase().authenticate(request)
+        if resultado is not None:
+            return resultado[0]
+    return None
+
+
+def vista_asincrona(func):
+    """
+    Convierte una corrutina en una vista de solo lectura (GET) para ASGI.
+    La autenticación es la misma que la de DRF y solo se permiten usuarios autenticados;
+    la corrutina recibe la petición con request.user y retorna una RespuestaAsincrona.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return RespuestaAsincrona(
+                {"detail": f'Método "{request.method}" no permitido.'},
+                status=status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+
+        try:
+            usuario = await sync_to_async(_autenticar)(request)
+        except exceptions.AuthenticationFailed as e:
+            return RespuestaAsincrona({"detail": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if usuario is None or not usuario.is_authenticated:
+            return RespuestaAsincrona(
+                {"detail": "Las credenciales de autenticación no se proveyeron."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        request.user = usuario
+        return await func(request, *args, **kwargs)
+
+    return wrapper
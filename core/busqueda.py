@@ -0,0 +1,219 @@
+import re
+import unicodedata
+import uuid
+
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.signals import post_delete, post_save
+
+from .models import TrigramaBusqueda
+
+# Marca de borde de palabra en los trigramas (no puede aparecer en el texto normalizado).
+# No se usan espacios porque las colaciones PAD SPACE de MySQL ignoran los finales.
+BORDE = "_"
+# Los trigramas del inicio de una palabra de la búsqueda pesan más en el ranking.
+PESO_PREFIJO = 2
+
+# Label del modelo: campos indexados.
+INDICES: dict[str, tuple[str, ...]] = {}
+
+_SEPARADORES = re.compile(r"[\W_]+")
+
+
+def palabras(texto) -> list[str]:
+    """
+    Palabras del texto en minúsculas y sin tildes.
+    """
+    if not texto:
+        return []
+    texto = unicodedata.normalize("NFKD", str(texto).casefold())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return [palabra for palabra in _SEPARADORES.split(texto) if palabra]
+
+
+def trigramas(texto) -> set[str]:
+    """
+    Trigramas de cada palabra con dos marcas de borde al inicio y una al final, de modo que
+    el inicio de la palabra tenga sus propios trigramas ("__a", "_an", "ana", "na_").
+    """
+    resultado = set()
+    for palabra in palabras(texto):
+        marcada = f"{BORDE * 2}{palabra}{BORDE}"
+        resultado.update(marcada[i : i + 3] for i in range(len(marcada) - 2))
+    return resultado
+
+
+def _prefijos(palabra: str) -> set[str]:
+    marcada = f"{BORDE * 2}{palabra}"
+    return {marcada[i : i + 3] for i in range(min(2, len(marcada) - 2))}
+
+
+def _requeridos(palabra: str) -> set[str]:
+    """
+    Trigramas que tiene todo texto que contiene la palabra. Las palabras de menos de tres
+    letras solo se pueden buscar como inicio de palabra.
+    """
+    if len(palabra) < 3:
+        return _prefijos(palabra)
+    return {palabra[i : i + 3] for i in range(len(palabra) - 2)}
+
+
+def registrar(modelo, campos: tuple[str, ...]):
+    """
+    Indexa los campos del modelo y conecta las señales que mantienen el índice.
+    Se llama desde el ready() de la aplicación del modelo.
+    """
+    label = modelo._meta.label_lower
+    INDICES[label] = tuple(campos)
+
+    post_save.connect(
+        indexar_por_modelo,
+        sender=modelo,
+        dispatch_uid=str(uuid.uuid3(uuid.NAMESPACE_OID, f"busqueda_indexar_{label}")),
+    )
+    post_delete.connect(
+        desindexar_por_modelo,
+        sender=modelo,
+        dispatch_uid=str(uuid.uuid3(uuid.NAMESPACE_OID, f"busqueda_desindexar_{label}")),
+    )
+
+
+def _filas(label: str, instancia) -> list[TrigramaBusqueda]:
+    return [
+        TrigramaBusqueda(modelo=label, campo=campo, trigrama=trigrama, objeto_id=instancia.pk)
+        for campo in INDICES[label]
+        for trigrama in trigramas(getattr(instancia, campo))
+    ]
+
+
+@transaction.atomic
+def indexar(instancia):
+    """
+    Reemplaza las filas del registro en el índice. Los registros eliminados lógicamente
+    se quitan del índice.
+    """
+    label = instancia._meta.label_lower
+    TrigramaBusqueda.objects.filter(modelo=label, objeto_id=instancia.pk).delete()
+    if getattr(instancia, "deleted_at", None) is None:
+        TrigramaBusqueda.objects.bulk_create(_filas(label, instancia), ignore_conflicts=True)
+
+
+def indexar_por_modelo(sender, instance, raw=False, **kwargs):
+    if not raw:
+        indexar(instance)
+
+
+def desindexar_por_modelo(sender, instance, **kwargs):
+    TrigramaBusqueda.objects.filter(
+        modelo=sender._meta.label_lower, objeto_id=instance.pk
+    ).delete()
+
+
+@transaction.atomic
+def reindexar(modelo, lote: int = 1000) -> int:
+    """
+    Reconstruye el índice del modelo con sus registros activos. Retorna la cantidad de filas.
+    """
+    label = modelo._meta.label_lower
+    TrigramaBusqueda.objects.filter(modelo=label).delete()
+
+    total = 0
+    queryset = modelo._default_manager.filter(deleted_at__isnull=True).only("pk", *INDICES[label])
+    filas = []
+    for instancia in queryset.iterator(chunk_size=lote):
+        filas.extend(_filas(label, instancia))
+        if len(filas) >= lote:
+            TrigramaBusqueda.objects.bulk_create(filas, ignore_conflicts=True)
+            total += len(filas)
+            filas = []
+    TrigramaBusqueda.objects.bulk_create(filas, ignore_conflicts=True)
+    return total + len(filas)
+
+
+def candidatos(modelo, texto, campos: tuple[str, ...] = None, mismo_campo: bool = False):
+    """
+    Queryset de valores (objeto_id, puntaje) con los registros que tienen todos los trigramas
+    de las palabras del texto entre los campos (con mismo_campo, todos en un mismo campo),
+    del mejor puntaje al peor.
+    El puntaje suma los trigramas encontrados; los del inicio de cada palabra de la búsqueda
+    valen PESO_PREFIJO, por lo que primero aparecen los registros donde una palabra empieza
+    con lo buscado. Retorna None si el texto no tiene palabras.
+    """
+    label = modelo._meta.label_lower
+    terminos = palabras(texto)
+    if not terminos:
+        return None
+
+    requeridos = set().union(*(_requeridos(palabra) for palabra in terminos))
+    prefijos = set().union(*(_prefijos(palabra) for palabra in terminos))
+
+    return (
+        TrigramaBusqueda.objects.filter(
+            modelo=label,
+            campo__in=campos or INDICES[label],
+            trigrama__in=requeridos | prefijos,
+        )
+        .values("objeto_id", *(("campo",) if mismo_campo else ()))
+        .annotate(
+            encontrados=Count("trigrama", filter=Q(trigrama__in=requeridos), distinct=True),
+            puntaje=Sum(
+                Case(
+                    When(trigrama__in=prefijos, then=Value(PESO_PREFIJO)),
+                    default=Value(1),
+                    output_field=IntegerField(),
+                )
+            ),
+        )
+        .filter(encontrados=len(requeridos))
+        .order_by("-puntaje", "objeto_id")
+    )
+
+
+def filtrar(queryset, campos: tuple[str, ...], texto):
+    """
+    Equivale a filtrar con icontains en alguno de los campos, pero solo revisa los registros
+    que el índice encuentra para ese texto (sin recorrer la tabla completa). Los textos con
+    palabras de menos de tres letras usan icontains directamente.
+    """
+    condicion = Q()
+    for campo in campos:
+        condicion |= Q(**{f"{campo}__icontains": texto})
+
+    terminos = palabras(texto)
+    if not terminos or any(len(palabra) < 3 for palabra in terminos):
+        return queryset.filter(condicion)
+
+    # Todas las palabras deben aparecer en el mismo campo, como en icontains. Los candidatos
+    # van como subconsulta: la lista de ids no se carga en memoria ni tiene un tamaño que
+    # pueda superar el límite de parámetros de la base.
+    ids = (
+        candidatos(queryset.model, texto, campos, mismo_campo=True)
+        .order_by()
+        .values("objeto_id")
+    )
+    return queryset.filter(pk__in=ids).filter(condicion)
+
+
+def buscar(queryset, texto, campos: tuple[str, ...] = None) -> list:
+    """
+    Registros del queryset que coinciden con el texto ordenados por relevancia.
+    Sin texto retorna el queryset completo. Los textos con palabras de menos de tres letras
+    se filtran con icontains (como en filtrar()) y se ordenan por id.
+    El ranking se calcula en la base: los candidatos van como subconsulta y el puntaje de
+    cada registro se lee con una subconsulta correlacionada.
+    """
+    terminos = palabras(texto)
+    if not terminos:
+        return list(queryset)
+
+    campos = campos or INDICES[queryset.model._meta.label_lower]
+    if any(len(palabra) < 3 for palabra in terminos):
+        return list(filtrar(queryset, campos, texto).order_by("pk"))
+
+    encontrados = candidatos(queryset.model, texto, campos).order_by()
+    puntaje = encontrados.filter(objeto_id=OuterRef("pk")).values("puntaje")[:1]
+    return list(
+        queryset.filter(pk__in=encontrados.values("objeto_id"))
+        .annotate(puntaje=Subquery(puntaje, output_field=IntegerField()))
+        .order_by("-puntaje", "pk")
+    )
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends cuyo contenido es propio de cada proceso.
+CACHES_POR_PROCESO = ("django.core.cache.backends.locmem.LocMemCache",)
+
+
+@register(Tags.caches, deploy=True)
+def cache_compartido(app_configs, **kwargs):
+    """
+    Las versiones de core.stats_cache (ETag de los selectores) se guardan sin expiración:
+    con un cache por proceso, una escritura atendida por un worker no cambia la versión que
+    ven los demás y estos siguen respondiendo 304 con datos desactualizados.
+    """
+    if settings.CACHES["default"]["BACKEND"] in CACHES_POR_PROCESO:
+        return [
+            Error(
+                "El cache por defecto es local a cada proceso; las versiones de los modelos "
+                "(ETag/304 de core.condicional) no se comparten entre workers.",
+                hint="Configure REDIS_URL u otro cache compartido entre procesos.",
+                id="core.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,51 @@
+import functools
+import random
+import time
+
+from django.db import OperationalError
+
+# Códigos de MySQL: 1205 (lock wait timeout) y 1213 (deadlock).
+MYSQL_CODIGOS_REINTENTABLES = (1205, 1213)
+SQLITE_MENSAJES_REINTENTABLES = ("database is locked", "database table is locked")
+
+
+class ConflictoConcurrencia(Exception):
+    """
+    Se lanza cuando otra transacción modificó las filas leídas antes de que se
+    pudieran escribir (por ejemplo, el contador de consumo de un lote).
+    """
+
+
+def es_conflicto(exc: Exception) -> bool:
+    if isinstance(exc, ConflictoConcurrencia):
+        return True
+    if isinstance(exc, OperationalError):
+        if exc.args and exc.args[0] in MYSQL_CODIGOS_REINTENTABLES:
+            return True
+        return any(mensaje in str(exc) for mensaje in SQLITE_MENSAJES_REINTENTABLES)
+    return False
+
+
+def con_reintentos(func=None, *, intentos: int = 5, espera: float = 0.02):
+    """
+    Reintenta la función (que debe abrir su propia transacción) cuando falla por
+    un conflicto de concurrencia, con una espera exponencial con jitter entre
+    intentos. Tras el último intento se propaga la excepción.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for intento in range(intentos):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as exc:
+                    if not es_conflicto(exc) or intento == intentos - 1:
+                        raise
+                    time.sleep(espera * (2**intento) * random.uniform(0.5, 1.5))
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -0,0 +1,53 @@
+import functools
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+
+from core.stats_cache import _versiones
+
+
+def firma(request, tags) -> tuple[str, int]:
+    """
+    Retorna el ETag y la fecha de modificación (timestamp) de la respuesta según la versión de
+    cada tag. Las versiones se cambian con cada escritura de los modelos (señales de
+    core.stats_cache y AuditQuerySet.update()) y son el instante de esa escritura (en
+    nanosegundos); la fecha se redondea hacia arriba al segundo.
+    """
+    versiones = _versiones(tags)
+    contenido = f"{request.get_full_path()}|{sorted(versiones.items())!r}"
+    etag = quote_etag(hashlib.md5(contenido.encode()).hexdigest())
+    return etag, -(-max(versiones.values()) // 1_000_000_000)
+
+
+def get_condicional(*tags: str):
+    """
+    GET condicional (ETag / Last-Modified) para las acciones de un ViewSet que solo leen los
+    modelos de los tags (labels, p. ej. "inventory.producto"). Si el cliente envía el ETag
+    vigente (If-None-Match) se responde 304 sin consultar las tablas; solo se lee la versión de
+    cada tag en el cache. Last-Modified es informativo: tiene resolución de segundos y dos
+    escrituras en el mismo segundo no la cambiarían, por lo que If-Modified-Since no produce 304.
+    Se aplica después de la autenticación y los permisos de DRF.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if hasattr(arg, "query_params"))
+            etag, modificado = firma(request, tags)
+
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = func(*args, **kwargs)
+            if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+                response.headers.setdefault("ETag", etag)
+                response.headers.setdefault("Last-Modified", http_date(modificado))
+
+            # Los navegadores guardan la respuesta pero la revalidan en cada petición.
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,123 @@
+import hashlib
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.db.models.sql.datastructures import Join
+
+from core.models import AuditModel
+from core.stats_cache import _versiones
+
+PREFIJO = "conteos"
+# Los conteos se invalidan con las escrituras de los modelos consultados (señales de
+# core.stats_cache); el TTL acota lo que no pasa por señales (update(), bulk_create()).
+TIMEOUT = 60
+
+
+def _expresiones(where):
+    """
+    Expresiones de los filtros de una consulta (incluye las subconsultas).
+    """
+    for hijo in where.children:
+        if hasattr(hijo, "children"):
+            yield from _expresiones(hijo)
+        else:
+            yield from hijo.flatten()
+
+
+def queryset_para_contar(queryset):
+    """
+    Retorna una copia del queryset sin lo que no afecta a la cantidad de filas: orden,
+    select_related y prefetch. Django ya omite en el COUNT las anotaciones que no se usan,
+    pero no sus joins; las vistas los evitan contando otro queryset
+    (GridMixin.get_grid_conteo_queryset).
+    Las consultas agrupadas, distinct o combinadas se retornan sin cambios.
+    """
+    query = queryset.query
+    if query.group_by is not None or query.distinct or query.combinator:
+        return queryset
+    return queryset.order_by().select_related(None).prefetch_related(None)
+
+
+def _tablas(query) -> set[str]:
+    tablas = {
+        join.table_name
+        for alias, join in query.alias_map.items()
+        if query.alias_refcount[alias] or not isinstance(join, Join)
+    }
+    for expresion in _expresiones(query.where):
+        if hasattr(expresion, "alias_map"):
+            tablas |= _tablas(expresion)
+    return tablas
+
+
+def tags(queryset) -> tuple[str, ...]:
+    """
+    Labels de los modelos cuyas tablas lee el queryset (los tags de invalidación del conteo).
+    """
+    tablas = _tablas(queryset.query)
+    return tuple(
+        sorted(
+            modelo._meta.label_lower
+            for modelo in apps.get_models(include_auto_created=True)
+            if modelo._meta.db_table in tablas
+        )
+    )
+
+
+def contar(queryset, timeout: int = TIMEOUT) -> tuple[int, bool]:
+    """
+    Cuenta las filas del queryset usando el cache. La clave es el SQL normalizado del conteo,
+    por lo que peticiones con los mismos filtros (en cualquier orden, en cualquier página)
+    comparten la entrada; deja de ser válida en cuanto se escribe uno de los modelos leídos.
+    Retorna (cantidad, acierto).
+    """
+    conteo = queryset_para_contar(queryset)
+    sql, params = conteo.query.get_compiler(conteo.db).as_sql()
+    clave = f"{PREFIJO}:{hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()}"
+    versiones = _versiones(tags(conteo))
+
+    entrada = cache.get(clave)
+    if entrada is not None and entrada["versiones"] == versiones:
+        return entrada["count"], True
+
+    cantidad = conteo.count()
+    cache.set(clave, {"versiones": versiones, "count": cantidad}, timeout)
+    return cantidad, False
+
+
+def estimar(modelo, using: str = "default") -> int | None:
+    """
+    Cantidad aproximada de filas de la tabla del modelo según las estadísticas de la base.
+    En los modelos con eliminación lógica (AuditModel) se restan los eliminados, que los grids
+    no listan; ese conteo es exacto y se cachea como los demás (contar).
+    Retorna None si no hay estadísticas.
+    """
+    connection = connections[using]
+    tabla = modelo._meta.db_table
+    if connection.vendor == "mysql":
+        sql = (
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        )
+    elif connection.vendor == "sqlite":
+        # sqlite_stat1 solo existe después de ANALYZE; su primer número es la cantidad de filas.
+        sql = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+    else:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tabla])
+            fila = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if fila is None or fila[0] is None:
+        return None
+    cantidad = int(str(fila[0]).split()[0])
+    if issubclass(modelo, AuditModel):
+        eliminados, _ = contar(
+            modelo._base_manager.db_manager(using).filter(deleted_at__isnull=False)
+        )
+        cantidad = max(cantidad - eliminados, 0)
+    return cantidad
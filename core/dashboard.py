@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from rest_framework import status
+
+logger = logging.getLogger(__name__)
+
+MAX_WIDGETS = 20
+
+# Vistas de estadísticas que pueden pedirse como widgets del dashboard.
+WIDGETS: dict[str, Callable] = {}
+
+_executor: ThreadPoolExecutor = None
+
+
+def registrar_widget(nombre: str, vista: Callable):
+    WIDGETS[nombre] = vista
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "DASHBOARD_WORKERS", 4),
+            thread_name_prefix="dashboard",
+        )
+    return _executor
+
+
+class _Inicio:
+    """
+    Instante (time.monotonic) en que un widget empieza a ejecutarse en el pool.
+    """
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.instante = None
+
+    def marcar(self):
+        self.instante = time.monotonic()
+        self.evento.set()
+
+
+def _ejecutar(vista: Callable, request, params: dict, iniciado: _Inicio):
+    """
+    Ejecuta la vista del widget con una petición GET interna que reutiliza el usuario
+    ya autenticado, por lo que no se repiten la autenticación ni los middlewares.
+    """
+    iniciado.marcar()
+    inicio = time.perf_counter()
+    try:
+        interna = HttpRequest()
+        interna.method = "GET"
+        interna.path = request.path
+        interna.META = request.META.copy()
+        interna.GET = QueryDict(urlencode(params, doseq=True))
+        interna._force_auth_user = request.user
+
+        response = vista(interna)
+        return {
+            "status": response.status_code,
+            "data": response.data,
+            "cache": response.get("X-Cache"),
+            "ms": round((time.perf_counter() - inicio) * 1000, 2),
+        }
+    except Exception:
+        # El detalle (p. ej. errores de la base) queda en el log, no en la respuesta.
+        logger.exception("Error al calcular el widget %s", getattr(vista, "__name__", vista))
+        return {
+            "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "error": "Error al calcular el widget",
+            "ms": round((time.perf_counter() - inicio) * 1000, 2),
+        }
+    finally:
+        # Cada hilo del pool abre su propia conexión; se cierra al terminar el widget.
+        connections.close_all()
+
+
+def calcular(request, widgets: list[dict]) -> list[dict]:
+    """
+    Calcula los widgets ({"nombre", "params", "timeout"}) en paralelo en un pool de
+    hilos acotado. El tiempo de cada widget se cuenta desde que empieza a ejecutarse, no
+    mientras espera en la cola del pool (compartido por todas las peticiones).
+    - Un widget que supera su tiempo se reporta con estado 504 sin bloquear al resto; su
+      hilo termina el trabajo en segundo plano.
+    - Un widget que no empieza en DASHBOARD_ESPERA segundos se cancela y se reporta con 503.
+    """
+    timeout_por_defecto = getattr(settings, "DASHBOARD_TIMEOUT", 10)
+    limite_espera = time.monotonic() + getattr(settings, "DASHBOARD_ESPERA", 30)
+    executor = _get_executor()
+
+    tareas = []
+    for widget in widgets:
+        timeout = min(float(widget.get("timeout", timeout_por_defecto)), timeout_por_defecto)
+        iniciado = _Inicio()
+        futuro = executor.submit(
+            _ejecutar, WIDGETS[widget["nombre"]], request, widget.get("params") or {}, iniciado
+        )
+        tareas.append((widget, futuro, iniciado, timeout))
+
+    resultados = []
+    for widget, futuro, iniciado, timeout in tareas:
+        resultado = {"nombre": widget["nombre"], "params": widget.get("params") or {}}
+        if not iniciado.evento.wait(max(0, limite_espera - time.monotonic())):
+            if futuro.cancel():
+                resultado.update(
+                    {
+                        "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                        "error": "No hay hilos disponibles para calcular el widget",
+                    }
+                )
+                resultados.append(resultado)
+                continue
+            # Empezó justo después de la espera; marcar() es lo primero que ejecuta.
+            iniciado.evento.wait()
+
+        try:
+            resultado.update(
+                futuro.result(timeout=max(0, iniciado.instante + timeout - time.monotonic()))
+            )
+        except TimeoutError:
+            futuro.cancel()
+            resultado.update(
+                {"status": status.HTTP_504_GATEWAY_TIMEOUT, "error": "Tiempo de espera agotado"}
+            )
+        resultados.append(resultado)
+
+    return resultados
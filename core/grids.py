@@ -0,0 +1,260 @@
+import json
+from decimal import InvalidOperation
+
+from dateutil import parser
+from django.db.models import Exists, OuterRef, Q
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from core import busqueda
+from core.pagination import KeysetGridMixin, numerar, recorrer_por_bloques
+
+
+class Filtro:
+    """
+    Filtro de un grid a partir de uno o más query params. Solo se aplica (y solo agrega sus
+    joins) si todos sus parámetros vienen con valor. Los valores no válidos lanzan ValueError.
+    """
+
+    parametros: tuple[str, ...] = ()
+
+    def valores(self, params) -> list[str] | None:
+        valores = [params.get(parametro) for parametro in self.parametros]
+        return valores if all(valores) else None
+
+    def convertir(self, convertir, valor: str):
+        try:
+            return convertir(valor)
+        except (ValueError, TypeError, OverflowError, InvalidOperation):
+            raise ValueError(f"Valor no válido para {'/'.join(self.parametros)}: {valor}")
+
+    def aplicar(self, queryset, *valores):
+        raise NotImplementedError
+
+
+class Contiene(Filtro):
+    def __init__(self, parametro: str, campo: str = None):
+        self.parametros = (parametro,)
+        self.lookup = f"{campo or parametro}__icontains"
+
+    def aplicar(self, queryset, valor):
+        return queryset.filter(**{self.lookup: valor})
+
+
+class Igual(Filtro):
+    def __init__(self, parametro: str, campo: str = None, tipo=str):
+        self.parametros = (parametro,)
+        self.campo = campo or parametro
+        self.tipo = tipo
+
+    def aplicar(self, queryset, valor):
+        return queryset.filter(**{self.campo: self.convertir(self.tipo, valor)})
+
+
+class Booleano(Filtro):
+    """
+    "true" filtra los verdaderos; cualquier otro valor, los falsos.
+    """
+
+    def __init__(self, parametro: str, campo: str = None):
+        self.parametros = (parametro,)
+        self.campo = campo or parametro
+
+    def aplicar(self, queryset, valor):
+        return queryset.filter(**{self.campo: valor == "true"})
+
+
+class EnLista(Filtro):
+    """
+    Lista separada por comas; se ignoran los elementos que no se pueden convertir.
+    Con metodo, la lista se pasa a ese método del queryset en lugar de filtrar con __in
+    (p. ej. LoteQuerySet.con_estado).
+    """
+
+    def __init__(self, parametro: str, campo: str = None, tipo=str, metodo: str = None):
+        self.parametros = (parametro,)
+        self.lookup = f"{campo or parametro}__in"
+        self.tipo = tipo
+        self.metodo = metodo
+
+    def aplicar(self, queryset, valor):
+        elementos = []
+        for elemento in valor.split(","):
+            try:
+                elementos.append(self.tipo(elemento))
+            except (ValueError, TypeError):
+                continue
+        if self.metodo is not None:
+            return getattr(queryset, self.metodo)(elementos)
+        return queryset.filter(**{self.lookup: elementos})
+
+
+class RangoFechas(Filtro):
+    """
+    Rango (inclusive) entre dos query params con fechas ISO; se aplica si vienen ambos.
+    """
+
+    def __init__(self, inicio: str, fin: str, campo: str, validar: bool = False):
+        self.parametros = (inicio, fin)
+        self.lookup = f"{campo}__range"
+        self.validar = validar
+
+    def aplicar(self, queryset, inicio, fin):
+        inicio = self.convertir(parser.isoparse, inicio)
+        fin = self.convertir(parser.isoparse, fin)
+        if self.validar and inicio > fin:
+            raise ValueError("La fecha de inicio no puede ser mayor a la fecha de fin")
+        return queryset.filter(**{self.lookup: [inicio, fin]})
+
+
+class Indexado(Filtro):
+    """
+    icontains en alguno de los campos resuelto con el índice de búsqueda (core.busqueda).
+    Con relacion, los campos son del modelo relacionado (p. ej. el nombre del producto de un lote).
+    """
+
+    def __init__(self, parametro: str, campos: tuple[str, ...] = None, relacion: str = None):
+        self.parametros = (parametro,)
+        self.campos = campos or (parametro,)
+        self.relacion = relacion
+
+    def aplicar(self, queryset, valor):
+        if self.relacion is None:
+            return busqueda.filtrar(queryset, self.campos, valor)
+
+        modelo = queryset.model._meta.get_field(self.relacion).related_model
+        relacionados = busqueda.filtrar(modelo._base_manager.all(), self.campos, valor)
+        return queryset.filter(**{f"{self.relacion}__in": relacionados})
+
+
+class Existe(Filtro):
+    """
+    icontains en alguno de los campos de una relación de varios registros (muchos a muchos
+    o inversa). Se resuelve con EXISTS para no repetir filas por cada registro relacionado.
+    """
+
+    def __init__(self, parametro: str, relacion: str, campos: tuple[str, ...]):
+        self.parametros = (parametro,)
+        self.relacion = relacion
+        self.lookups = tuple(f"{relacion}__{campo}__icontains" for campo in campos)
+
+    def aplicar(self, queryset, valor):
+        condicion = Q()
+        for lookup in self.lookups:
+            condicion |= Q(**{lookup: valor})
+        relacionados = queryset.model._base_manager.filter(condicion, pk=OuterRef("pk"))
+        return queryset.filter(Exists(relacionados))
+
+
+class FiltrosGrid:
+    """
+    Especificación declarativa de los filtros de un grid. Se arma una vez al definir la vista:
+        grid_filtros = FiltrosGrid(
+            Indexado("nombre"),
+            Igual("precio", tipo=Decimal),
+            Existe("productos", "productos", ("nombre", "sku")),
+        )
+    aplicar() agrega al queryset solo los filtros cuyos parámetros vienen en la petición.
+    """
+
+    def __init__(self, *filtros: Filtro):
+        self.filtros = filtros
+
+    def aplicar(self, queryset, params):
+        for filtro in self.filtros:
+            valores = filtro.valores(params)
+            if valores is not None:
+                queryset = filtro.aplicar(queryset, *valores)
+        return queryset
+
+
+def _json(data) -> str:
+    # Mismo formato que el JSONRenderer de DRF (compacto y sin escapar caracteres no ASCII).
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def respuesta_en_stream(bloques, serializar) -> StreamingHttpResponse:
+    """
+    Escribe {"next", "previous", "results", "count"} a medida que se serializa cada bloque
+    de objetos; count va al final porque se cuenta mientras se escribe (sin COUNT(*)).
+    """
+
+    def escribir():
+        cantidad = 0
+        yield '{"next":null,"previous":null,"results":['
+        for bloque in bloques:
+            filas = serializar(bloque)
+            if filas:
+                yield ("," if cantidad else "") + ",".join(_json(fila) for fila in filas)
+                cantidad += len(filas)
+        yield f'],"count":{cantidad}}}'
+
+    return StreamingHttpResponse(escribir(), content_type="application/json")
+
+
+class GridMixin(KeysetGridMixin):
+    """
+    Acción grid de un ViewSet: aplica grid_filtros y responde con paginación por cursor
+    (?cursor=), por limit/offset (?offset=) o con todas las filas.
+    Personalización:
+    - get_grid_queryset(): queryset base (select_related, anotaciones).
+    - get_grid_conteo_queryset(): queryset base del total de la paginación por offset.
+    - grid_serializer_class o serializar_grid(): filas de la respuesta.
+    Sin paginación la respuesta se escribe en stream por bloques de grid_tamano_bloque filas,
+    por lo que la memoria del worker no depende del tamaño de la tabla.
+    """
+
+    grid_filtros = FiltrosGrid()
+    grid_serializer_class = None
+    grid_tamano_bloque = 500
+
+    def get_grid_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def get_grid_filtrado(self):
+        """
+        Queryset del grid con los filtros de la petición (ValueError si alguno no es válido).
+        """
+        return self.grid_filtros.aplicar(self.get_grid_queryset(), self.request.query_params)
+
+    def get_grid_conteo_queryset(self):
+        """
+        Queryset sobre el que se aplican los filtros para contar las filas. Las vistas con
+        anotaciones o joins que no cambian la cantidad de filas pueden retornarlo sin ellos;
+        los filtros del grid deben funcionar sobre ambos querysets.
+        """
+        return self.get_grid_queryset()
+
+    def serializar_grid(self, objetos, paginado: bool = True):
+        if self.grid_serializer_class is None:
+            return self.get_serializer(objetos, many=True).data
+        return self.grid_serializer_class(
+            objetos, many=True, context=self.get_serializer_context()
+        ).data
+
+    @action(methods=["get"], detail=False)
+    def grid(self, request: Request):
+        try:
+            queryset = self.get_grid_filtrado()
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        respuesta = self.paginar_por_cursor(queryset, self.serializar_grid)
+        if respuesta is not None:
+            return respuesta
+
+        if request.query_params.get("offset") and self.paginator is not None:
+            conteo = self.grid_filtros.aplicar(self.get_grid_conteo_queryset(), request.query_params)
+            page = self.paginator.paginate_queryset(queryset, request, view=self, conteo=conteo)
+            if page is not None:
+                offset = self.paginator.get_offset(request)
+                return self.get_paginated_response(numerar(self.serializar_grid(page), offset + 1))
+
+        return respuesta_en_stream(
+            recorrer_por_bloques(queryset, self.grid_tamano_bloque),
+            lambda bloque: self.serializar_grid(bloque, paginado=False),
+        )
@@ -0,0 +1,194 @@
+import asyncio
+import statistics
+import threading
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Nombre del endpoint: (ruta síncrona, ruta asíncrona).
+ENDPOINTS = {
+    "service_per_months": ("servicios-realizados", "async-servicios-realizados"),
+    "most_performed_services": ("most-performed-services", "async-most-performed-services"),
+    "performance_services_products": (
+        "performance-services-products",
+        "async-performance-services-products",
+    ),
+}
+
+
+def _endpoints():
+    from inventory.urls import ASYNC_STATS
+
+    endpoints = {
+        nombre: (f"stats-{nombre.replace('_', '-')}", f"async-{nombre}")
+        for nombre in ASYNC_STATS
+    }
+    endpoints.update(ENDPOINTS)
+    return endpoints
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara cuántas peticiones concurrentes a una estadística atiende un worker WSGI "
+        "(vista síncrona) frente a un worker ASGI (vistas síncrona y asíncrona). "
+        "Usa los datos de la base configurada; cada petición lleva un parámetro distinto "
+        "para no responder desde el cache de estadísticas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("endpoint", nargs="?", default="valor_inventario")
+        parser.add_argument("--peticiones", type=int, default=50)
+        parser.add_argument(
+            "--hilos-wsgi",
+            type=int,
+            default=1,
+            help="Hilos del worker WSGI (un worker sync de gunicorn atiende una petición a la vez).",
+        )
+        parser.add_argument(
+            "--latencia",
+            type=float,
+            default=0,
+            help="Milisegundos de espera agregados a cada consulta (simula una base remota).",
+        )
+        parser.add_argument("--usuario", help="Usuario con el que se autentican las peticiones.")
+        parser.add_argument("--host", help="Host de las peticiones (por defecto el primero de ALLOWED_HOSTS).")
+
+    def handle(self, *args, **options):
+        import_module(settings.ROOT_URLCONF)
+        endpoints = _endpoints()
+        if options["endpoint"] not in endpoints:
+            raise CommandError(f"Endpoint no válido, use uno de: {', '.join(sorted(endpoints))}")
+        ruta_sync, ruta_async = (reverse(nombre) for nombre in endpoints[options["endpoint"]])
+
+        usuario = self.usuario(options["usuario"])
+        self.host = options["host"] or next(
+            (host for host in settings.ALLOWED_HOSTS if host and "*" not in host), "localhost"
+        ).lstrip(".")
+        self.token = str(AccessToken.for_user(usuario))
+        self.peticiones = options["peticiones"]
+
+        latencia = options["latencia"] / 1000
+
+        def agregar_latencia(execute, sql, params, many, context):
+            time.sleep(latencia)
+            return execute(sql, params, many, context)
+
+        def instalar_latencia(sender, connection, **kwargs):
+            connection.execute_wrappers.append(agregar_latencia)
+
+        if latencia:
+            # Cada hilo abre su propia conexión; la espera se instala al crearla.
+            connections.close_all()
+            connection_created.connect(instalar_latencia)
+        try:
+            self.reportar(
+                f"WSGI, vista síncrona ({options['hilos_wsgi']} hilos)",
+                self.wsgi(ruta_sync, options["hilos_wsgi"]),
+            )
+            self.reportar("ASGI, vista síncrona", asyncio.run(self.asgi(ruta_sync)))
+            self.reportar("ASGI, vista asíncrona", asyncio.run(self.asgi(ruta_async)))
+        finally:
+            connection_created.disconnect(instalar_latencia)
+
+    def usuario(self, username):
+        if username:
+            usuario = User.objects.filter(username=username, is_active=True).first()
+        else:
+            usuario = User.objects.filter(is_active=True).order_by("-is_superuser", "id").first()
+        if usuario is None:
+            raise CommandError("No hay un usuario activo para autenticar las peticiones")
+        return usuario
+
+    def wsgi(self, ruta: str, hilos: int) -> tuple[float, list[float], list[int]]:
+        pendientes = iter(range(self.peticiones))
+        bloqueo = threading.Lock()
+        latencias, estados = [], []
+
+        def trabajar():
+            client = Client(HTTP_HOST=self.host, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+            try:
+                while True:
+                    with bloqueo:
+                        i = next(pendientes, None)
+                    if i is None:
+                        return
+                    inicio = time.perf_counter()
+                    response = client.get(ruta, {"benchmark": i})
+                    with bloqueo:
+                        latencias.append(time.perf_counter() - inicio)
+                        estados.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        return time.perf_counter() - inicio, latencias, estados
+
+    async def asgi(self, ruta: str) -> tuple[float, list[float], list[int]]:
+        application = get_asgi_application()
+
+        async def peticion(i: int):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": ruta,
+                "raw_path": ruta.encode(),
+                "root_path": "",
+                "query_string": f"benchmark={i}".encode(),
+                "headers": [
+                    (b"host", self.host.encode()),
+                    (b"authorization", f"Bearer {self.token}".encode()),
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": (self.host, 80),
+            }
+            recibido = False
+            estado = None
+
+            async def receive():
+                nonlocal recibido
+                if not recibido:
+                    recibido = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # El cliente no se desconecta; Django cancela esta espera al responder.
+                await asyncio.Future()
+
+            async def send(mensaje):
+                nonlocal estado
+                if mensaje["type"] == "http.response.start":
+                    estado = mensaje["status"]
+
+            inicio = time.perf_counter()
+            await application(scope, receive, send)
+            return time.perf_counter() - inicio, estado
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(peticion(i) for i in range(self.peticiones)))
+        duracion = time.perf_counter() - inicio
+        return duracion, [latencia for latencia, _ in resultados], [estado for _, estado in resultados]
+
+    def reportar(self, nombre: str, resultado: tuple[float, list[float], list[int]]):
+        duracion, latencias, estados = resultado
+        errores = sum(1 for estado in estados if estado != 200)
+        percentiles = statistics.quantiles(latencias, n=20) if len(latencias) > 1 else latencias * 19
+        self.stdout.write(
+            f"{nombre}: {duracion:.3f}s, {len(latencias) / duracion:.1f} peticiones/s, "
+            f"p50 {percentiles[9] * 1000:.1f}ms, p95 {percentiles[18] * 1000:.1f}ms"
+            + (f", {errores} errores" if errores else "")
+        )
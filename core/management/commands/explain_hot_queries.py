@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from core.query_plans import cargar_consultas, recorridos_completos
+
+
+class Command(BaseCommand):
+    help = "Ejecuta EXPLAIN sobre las consultas de grids y estadísticas y reporta los recorridos completos de tabla."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--plan", action="store_true", help="Muestra el plan completo de cada consulta."
+        )
+
+    def handle(self, *args, **options):
+        sin_indice = 0
+
+        for nombre, consulta in sorted(cargar_consultas().items()):
+            resultado = recorridos_completos(consulta.construir())
+            if resultado is None:
+                self.stdout.write(self.style.WARNING(f"{nombre}: EXPLAIN no soportado, se omite"))
+                continue
+
+            recorridos, plan = resultado
+            faltantes = sorted(set(recorridos) & set(consulta.tablas))
+            sin_indice += len(faltantes)
+
+            if faltantes:
+                self.stdout.write(self.style.ERROR(f"{nombre}: sin índice en {', '.join(faltantes)}"))
+            elif recorridos:
+                self.stdout.write(self.style.WARNING(f"{nombre}: recorrido completo en {', '.join(recorridos)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{nombre}: OK"))
+
+            if options["plan"]:
+                self.stdout.write(plan)
+
+        if sin_indice:
+            self.stdout.write(self.style.ERROR(f"{sin_indice} tablas calientes sin índice"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Todas las consultas calientes usan índices"))
@@ -0,0 +1,26 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core import busqueda
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice de búsqueda por trigramas de los modelos registrados "
+        "(necesario después de cargar datos sin señales, p. ej. con bulk_create o SQL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "modelos", nargs="*", help="Labels de los modelos (p. ej. inventory.producto); por defecto todos."
+        )
+
+    def handle(self, *args, **options):
+        labels = options["modelos"] or sorted(busqueda.INDICES)
+        for label in labels:
+            if label not in busqueda.INDICES:
+                raise CommandError(
+                    f"Modelo no indexado, use uno de: {', '.join(sorted(busqueda.INDICES))}"
+                )
+            filas = busqueda.reindexar(apps.get_model(label))
+            self.stdout.write(f"{label}: {filas} trigramas")
@@ -0,0 +1,30 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import stats_cache
+
+
+class Command(BaseCommand):
+    help = "Muestra los aciertos y fallos del cache de estadísticas por endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reiniciar", action="store_true", help="Reinicia los contadores después de mostrarlos."
+        )
+
+    def handle(self, *args, **options):
+        # Los endpoints se registran al importar las vistas.
+        import_module(settings.ROOT_URLCONF)
+
+        for nombre, valores in stats_cache.contadores().items():
+            total = valores["hits"] + valores["misses"]
+            ratio = valores["hits"] / total * 100 if total else 0
+            self.stdout.write(
+                f"{nombre}: {valores['hits']} hits, {valores['misses']} misses ({ratio:.1f}% hits)"
+            )
+
+        if options["reiniciar"]:
+            stats_cache.reiniciar_contadores()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados"))
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.utils import timezone
 
+from core.stats_cache import invalidar
+
 
 class AuditQuerySet(models.QuerySet):
     def active(self):
@@ -9,6 +12,13 @@ class AuditQuerySet(models.QuerySet):
     def inactive(self):
         return self.filter(deleted_at__isnull=False)
 
+    def update(self, **kwargs):
+        # update() no emite señales: se cambia aquí la versión del modelo (core.stats_cache).
+        filas = super().update(**kwargs)
+        if filas:
+            invalidar(self.model._meta.label_lower)
+        return filas
+
 
 class AuditManager(models.Manager):
     def get_queryset(self):
@@ -21,6 +31,70 @@ class AuditManager(models.Manager):
         return self.get_queryset().inactive()
 
 
+class AcumuladoManager(models.Manager):
+    """
+    Manager de las tablas de acumulados, con una fila por clave (p. ej. fecha y servicio).
+    Las escrituras suman diferencias con F() sobre la fila existente en lugar de recalcular
+    la clave, por lo que dos transacciones que registran en la misma clave no se pisan.
+    Las filas cuyo contador llega a 0 se eliminan.
+    - campos_clave: campos que identifican la fila (tienen una restricción única).
+    - contador: campo con la cantidad de registros acumulados.
+    """
+
+    campos_clave: tuple[str, ...] = ()
+    contador: str = ""
+
+    def sumar(self, diferencias: dict[tuple, dict]):
+        """
+        Aplica {clave: {campo: diferencia}}, donde clave son los valores de campos_clave.
+        Solo se crea la fila si no existe y el contador aumenta; una diferencia negativa sobre
+        una fila que no existe se ignora (el acumulado ya estaba desfasado y se corrige con
+        el comando de reconstrucción).
+        """
+        for clave, valores in diferencias.items():
+            valores = {campo: valor for campo, valor in valores.items() if valor}
+            if not valores:
+                continue
+
+            filtro = dict(zip(self.campos_clave, clave))
+            if not self._sumar(filtro, valores) and valores.get(self.contador, 0) > 0:
+                try:
+                    with transaction.atomic():
+                        self.create(**filtro, **valores)
+                except IntegrityError:
+                    # Otra transacción creó la fila entre el UPDATE y el INSERT.
+                    self._sumar(filtro, valores)
+            elif valores.get(self.contador, 0) < 0:
+                self.filter(**filtro, **{self.contador: 0}).delete()
+
+        invalidar(self.model._meta.label_lower)
+
+    def crear_acumulados(self, filas, lote: int = 1000) -> list:
+        """
+        Crea las filas acumulando en memoria los pares (clave, {campo: valor}) recibidos
+        (p. ej. uno por registro). Lo usan las reconstrucciones, que antes eliminan las filas.
+        """
+        acumulados: dict[tuple, dict] = {}
+        for clave, valores in filas:
+            actual = acumulados.setdefault(clave, dict.fromkeys(valores, 0))
+            for campo, valor in valores.items():
+                actual[campo] += valor or 0
+
+        invalidar(self.model._meta.label_lower)
+        return self.bulk_create(
+            (
+                self.model(**dict(zip(self.campos_clave, clave)), **valores)
+                for clave, valores in acumulados.items()
+            ),
+            batch_size=lote,
+        )
+
+    def _sumar(self, filtro, valores) -> int:
+        return self.filter(**filtro).update(
+            **{campo: F(campo) + valor for campo, valor in valores.items()}
+        )
+
+
 class AuditModel(models.Model):
     """
     Modelo abstracto que proporciona campos de auditoría para el seguimiento de la creación, actualización y eliminación de registros.
@@ -91,3 +165,34 @@ class ServicioEspecialidad(AuditModel):
             personal.especialidades.remove(self) """
 
         super().delete(using, keep_parents)
+
+
+class TrigramaBusqueda(models.Model):
+    """
+    Índice de búsqueda por trigramas (core.busqueda). Cada fila indica que el campo de un
+    registro contiene el trigrama; se mantiene con las señales post_save y post_delete.
+    Atributos:
+    - modelo: Label del modelo indexado (p. ej. "inventory.producto").
+    - campo: Nombre del campo indexado.
+    - trigrama: Tres caracteres del texto normalizado (los bordes de palabra se marcan con
+      core.busqueda.BORDE, "_").
+    - objeto_id: Id del registro indexado.
+    """
+
+    modelo = models.CharField(max_length=50)
+    campo = models.CharField(max_length=50)
+    trigrama = models.CharField(max_length=3)
+    objeto_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["modelo", "trigrama", "campo", "objeto_id"], name="trigrama_busqueda_unico"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["objeto_id", "modelo"], name="trigrama_busqueda_objeto_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo}.{self.campo}[{self.objeto_id}]: {self.trigrama!r}"
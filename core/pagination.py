@@ -1,5 +1,234 @@
-from rest_framework.pagination import CursorPagination
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    LimitOffsetPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from core import conteos
 
 class createdDateCursorPagination(CursorPagination):
     page_size = 10
-    ordering = 'created_at'
\ No newline at end of file
+    ordering = 'created_at'
+
+
+def despues_de(queryset, creado, pk):
+    """
+    Filas posteriores a (created_at, id) en el orden de los grids.
+    """
+    return queryset.filter(Q(created_at__gt=creado) | Q(created_at=creado, pk__gt=pk))
+
+
+def recorrer_por_bloques(queryset, tamano: int):
+    """
+    Recorre el queryset en bloques (listas) ordenados por (created_at, id). Cada bloque es una
+    consulta con LIMIT que continúa desde la última fila del anterior, por lo que solo hay un
+    bloque en memoria (a diferencia de iterator() en MySQL, cuyo driver carga todo el resultado).
+    Los prefetch_related se resuelven por bloque.
+    """
+    queryset = queryset.order_by("created_at", "pk")
+    bloque = list(queryset[:tamano])
+    while bloque:
+        yield bloque
+        if len(bloque) < tamano:
+            return
+        ultima = bloque[-1]
+        bloque = list(despues_de(queryset, ultima.created_at, ultima.pk)[:tamano])
+
+
+def numerar(data, primera: int = 1):
+    """
+    Agrega row_number a las filas serializadas, empezando en primera.
+    """
+    for i, item in enumerate(data):
+        item["row_number"] = primera + i
+    return data
+
+
+class GridLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination con el conteo cacheado (core.conteos.contar): las páginas de un
+    mismo resultado reutilizan el COUNT(*) hasta que se escribe alguno de los modelos leídos.
+    Con ?count=estimate un listado sin filtros toma el total de las estadísticas de la tabla.
+    El origen del total se informa en la cabecera X-Count (HIT, MISS o ESTIMATE).
+    conteo es el queryset que se cuenta en lugar del paginado (p. ej. sin las anotaciones del
+    grid, GridMixin.get_grid_conteo_queryset); debe tener las mismas filas.
+    """
+
+    count_query_param = "count"
+    # Parámetros que no filtran el resultado.
+    parametros_de_pagina = ("limit", "offset", "count", "cursor", "format")
+
+    def paginate_queryset(self, queryset, request, view=None, conteo=None):
+        self.origen_conteo = None
+        self.conteo = conteo
+        return super().paginate_queryset(queryset, request, view)
+
+    def sin_filtros(self) -> bool:
+        return all(
+            not valor
+            for nombre, valor in self.request.query_params.items()
+            if nombre not in self.parametros_de_pagina
+        )
+
+    def get_count(self, queryset):
+        if not hasattr(queryset, "query"):
+            return super().get_count(queryset)
+        if self.conteo is not None:
+            queryset = self.conteo
+
+        if self.request.query_params.get(self.count_query_param) == "estimate" and self.sin_filtros():
+            estimado = conteos.estimar(queryset.model, queryset.db)
+            if estimado is not None:
+                self.origen_conteo = "ESTIMATE"
+                return estimado
+
+        cantidad, acierto = conteos.contar(queryset)
+        self.origen_conteo = "HIT" if acierto else "MISS"
+        return cantidad
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.origen_conteo:
+            response["X-Count"] = self.origen_conteo
+        return response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por keyset para los grids: ordena por (created_at, id) y lee cada página con
+    WHERE (created_at, id) > (fila límite) LIMIT n, sin COUNT ni OFFSET, por lo que el costo
+    no crece con la profundidad de la página.
+    El cursor es opaco y guarda la clave de la fila límite, la dirección y su número de fila;
+    así row_number se calcula sin OFFSET. Un cursor vacío (?cursor=) pide la primera página.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = 200
+    invalid_cursor_message = "Cursor inválido"
+
+    def get_limit(self, request) -> int:
+        try:
+            return _positive_int(
+                request.query_params[self.limit_query_param], strict=True, cutoff=self.max_limit
+            )
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def decode_cursor(self, request):
+        """
+        Retorna (created_at, id, número de fila, hacia_atras) o None para la primera página.
+        """
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(codificado.encode("ascii")))
+            creado = parse_datetime(datos["c"])
+            if creado is None:
+                raise ValueError(datos["c"])
+            return creado, int(datos["i"]), int(datos["f"]), bool(datos["a"])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, fila_limite, numero: int, hacia_atras: bool) -> str:
+        datos = {
+            "c": fila_limite.created_at.isoformat(),
+            "i": fila_limite.pk,
+            "f": numero,
+            "a": int(hacia_atras),
+        }
+        codificado = base64.urlsafe_b64encode(json.dumps(datos).encode()).decode("ascii")
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, codificado
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        cursor = self.decode_cursor(request)
+
+        hacia_atras = False
+        if cursor is None:
+            numero = 0
+            queryset = queryset.order_by("created_at", "pk")
+        else:
+            creado, pk, numero, hacia_atras = cursor
+            if hacia_atras:
+                queryset = queryset.filter(
+                    Q(created_at__lt=creado) | Q(created_at=creado, pk__lt=pk)
+                ).order_by("-created_at", "-pk")
+            else:
+                queryset = despues_de(queryset, creado, pk).order_by("created_at", "pk")
+
+        # Se lee una fila extra para saber si hay más páginas en esa dirección.
+        filas = list(queryset[: self.limit + 1])
+        hay_mas = len(filas) > self.limit
+        self.page = filas[: self.limit]
+
+        if hacia_atras:
+            self.page.reverse()
+            self.primera_fila = numero - len(self.page)
+            self.has_next, self.has_previous = True, hay_mas
+        else:
+            self.primera_fila = numero + 1
+            self.has_next, self.has_previous = hay_mas, cursor is not None
+
+        return self.page
+
+    def numerar(self, data):
+        """
+        Agrega row_number a las filas serializadas de la página.
+        """
+        return numerar(data, self.primera_fila)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], self.primera_fila + len(self.page) - 1, False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], self.primera_fila, True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+
+class KeysetGridMixin:
+    """
+    Habilita la paginación por keyset (?cursor=) en la acción grid de un ViewSet, además
+    de la paginación por limit/offset existente.
+    """
+
+    keyset_pagination_class = KeysetPagination
+
+    def paginar_por_cursor(self, queryset, serializar):
+        """
+        Retorna la respuesta paginada por cursor si la petición lo pide (None en caso
+        contrario). serializar recibe la lista de instancias de la página y retorna sus filas.
+        """
+        if self.keyset_pagination_class.cursor_query_param not in self.request.query_params:
+            return None
+
+        paginador = self.keyset_pagination_class()
+        page = paginador.paginate_queryset(queryset, self.request, view=self)
+        return paginador.get_paginated_response(paginador.numerar(serializar(page)))
@@ -0,0 +1,205 @@
+import datetime
+import zoneinfo
+
+from django.conf import settings
+from django.db import models
+from django.db.models import F
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+GRANULARIDADES = ("day", "week", "month", "year")
+
+_TRUNCAR = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+    "year": TruncYear,
+}
+
+
+def zona_horaria(nombre: str = None) -> zoneinfo.ZoneInfo:
+    """
+    Zona horaria en la que se definen los días de las estadísticas
+    (settings.ZONA_HORARIA_ESTADISTICAS, por defecto America/Guayaquil).
+    """
+    return zoneinfo.ZoneInfo(nombre or settings.ZONA_HORARIA_ESTADISTICAS)
+
+
+def hoy(tz: datetime.tzinfo = None) -> datetime.date:
+    return timezone.localdate(timezone=tz or zona_horaria())
+
+
+def dia(fecha_hora: datetime.datetime, tz: datetime.tzinfo = None) -> datetime.date:
+    """
+    Día al que pertenece la fecha y hora (None si no hay fecha).
+    """
+    return timezone.localtime(fecha_hora, tz or zona_horaria()).date() if fecha_hora else None
+
+
+def inicio_del_dia(fecha: datetime.date, tz: datetime.tzinfo = None) -> datetime.datetime:
+    return datetime.datetime.combine(fecha, datetime.time.min, tzinfo=tz or zona_horaria())
+
+
+def inicio_periodo(fecha: datetime.date, granularidad: str) -> datetime.date:
+    if granularidad == "day":
+        return fecha
+    if granularidad == "week":
+        return fecha - datetime.timedelta(days=fecha.weekday())
+    if granularidad == "month":
+        return fecha.replace(day=1)
+    if granularidad == "year":
+        return fecha.replace(month=1, day=1)
+    raise ValueError("Granularidad no válida, use 'day', 'week', 'month' o 'year'")
+
+
+def siguiente_periodo(inicio: datetime.date, granularidad: str) -> datetime.date:
+    """
+    Inicio del periodo siguiente al que empieza en la fecha indicada.
+    """
+    if granularidad == "day":
+        return inicio + datetime.timedelta(days=1)
+    if granularidad == "week":
+        return inicio + datetime.timedelta(days=7)
+    if granularidad == "month":
+        return datetime.date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+    if granularidad == "year":
+        return datetime.date(inicio.year + 1, 1, 1)
+    raise ValueError("Granularidad no válida, use 'day', 'week', 'month' o 'year'")
+
+
+def rango(fecha: datetime.date, granularidad: str, desplazamiento: int = 0):
+    """
+    Retorna los días (inclusive) del periodo que contiene la fecha; con desplazamiento
+    el de los periodos anteriores (-1) o posteriores (1).
+    """
+    inicio = inicio_periodo(fecha, granularidad)
+    for _ in range(abs(desplazamiento)):
+        if desplazamiento > 0:
+            inicio = siguiente_periodo(inicio, granularidad)
+        else:
+            inicio = inicio_periodo(inicio - datetime.timedelta(days=1), granularidad)
+    return inicio, siguiente_periodo(inicio, granularidad) - datetime.timedelta(days=1)
+
+
+def periodo_actual(period: str, fecha: datetime.date = None):
+    """
+    Rango de días del periodo actual ("week", "month" o "year") como en los parámetros
+    period de las estadísticas.
+    """
+    if period not in ("week", "month", "year"):
+        raise ValueError("Periodo no válido, use 'week', 'month' o 'year'")
+    return rango(fecha or hoy(), period)
+
+
+def periodos(desde: datetime.date, hasta: datetime.date, granularidad: str) -> list[datetime.date]:
+    """
+    Inicio de cada periodo que se superpone con el rango de días (inclusive).
+    """
+    inicios = []
+    inicio = inicio_periodo(desde, granularidad)
+    while inicio <= hasta:
+        inicios.append(inicio)
+        inicio = siguiente_periodo(inicio, granularidad)
+    return inicios
+
+
+def _campo(modelo, ruta: str) -> models.Field:
+    *relaciones, nombre = ruta.split(LOOKUP_SEP)
+    for relacion in relaciones:
+        modelo = modelo._meta.get_field(relacion).related_model
+    return modelo._meta.get_field(nombre)
+
+
+def truncar(modelo, campo: str, granularidad: str, tz: datetime.tzinfo = None):
+    """
+    Expresión con el inicio del periodo (fecha) al que pertenece el campo. Los campos
+    de fecha y hora se truncan en la zona horaria de las estadísticas; en MySQL eso usa
+    CONVERT_TZ, que retorna NULL si el servidor no tiene cargadas las tablas de zonas horarias
+    (mysql_tzinfo_to_sql). Las estadísticas truncan los campos de fecha de los acumulados
+    diarios, que no necesitan conversión.
+    """
+    if granularidad not in _TRUNCAR:
+        raise ValueError("Granularidad no válida, use 'day', 'week', 'month' o 'year'")
+    if isinstance(_campo(modelo, campo), models.DateTimeField):
+        return _TRUNCAR[granularidad](
+            campo, output_field=models.DateField(), tzinfo=tz or zona_horaria()
+        )
+    if granularidad == "day":
+        return F(campo)
+    return _TRUNCAR[granularidad](campo)
+
+
+def filtrar_rango(queryset, campo: str, desde: datetime.date = None, hasta: datetime.date = None, tz=None):
+    """
+    Filtra el queryset por un rango de días (inclusive, extremos opcionales). En los campos
+    de fecha y hora los días empiezan a medianoche en la zona horaria de las estadísticas.
+    """
+    if isinstance(_campo(queryset.model, campo), models.DateTimeField):
+        if desde:
+            queryset = queryset.filter(**{f"{campo}__gte": inicio_del_dia(desde, tz)})
+        if hasta:
+            queryset = queryset.filter(
+                **{f"{campo}__lt": inicio_del_dia(hasta + datetime.timedelta(days=1), tz)}
+            )
+        return queryset
+
+    if desde:
+        queryset = queryset.filter(**{f"{campo}__gte": desde})
+    if hasta:
+        queryset = queryset.filter(**{f"{campo}__lte": hasta})
+    return queryset
+
+
+class Serie:
+    """
+    Serie de un queryset agregada por periodos con una sola consulta GROUP BY.
+    Atributos:
+    - consulta: Queryset con una fila por periodo (periodo, agregados).
+    Uso:
+        serie = Serie(ServicioRealizadoDiario.objects, "fecha", desde, hasta, "week",
+                      {"total": Sum("cantidad")})
+        filas = serie.filas()            # o: await serie.afilas()
+    Los periodos sin datos se completan con vacio en cada agregado. Sin desde, la serie
+    empieza en el primer periodo con datos.
+    """
+
+    def __init__(
+        self,
+        queryset,
+        campo: str,
+        desde: datetime.date,
+        hasta: datetime.date,
+        granularidad: str,
+        agregados: dict,
+        tz: datetime.tzinfo = None,
+        vacio=0,
+    ):
+        self.desde = desde
+        self.hasta = hasta
+        self.granularidad = granularidad
+        self.agregados = agregados
+        self.vacio = vacio
+        self.consulta = (
+            filtrar_rango(queryset, campo, desde, hasta, tz)
+            .annotate(periodo=truncar(queryset.model, campo, granularidad, tz))
+            .values("periodo")
+            .annotate(**agregados)
+            .order_by("periodo")
+        )
+
+    def completar(self, filas: list[dict]) -> list[dict]:
+        por_periodo = {fila["periodo"]: fila for fila in filas}
+        desde = self.desde or (filas[0]["periodo"] if filas else None)
+        if desde is None:
+            return []
+        return [
+            por_periodo.get(inicio) or {"periodo": inicio, **dict.fromkeys(self.agregados, self.vacio)}
+            for inicio in periodos(desde, self.hasta, self.granularidad)
+        ]
+
+    def filas(self) -> list[dict]:
+        return self.completar(list(self.consulta))
+
+    async def afilas(self) -> list[dict]:
+        return self.completar([fila async for fila in self.consulta])
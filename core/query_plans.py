@@ -0,0 +1,100 @@
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+from django.db import connections
+from django.db.models import QuerySet
+from django.test import RequestFactory
+from django.utils.module_loading import autodiscover_modules
+from rest_framework.request import Request
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConsultaCaliente:
+    """
+    Consulta que se ejecuta en cada petición de un grid o de una estadística.
+    Atributos:
+    - nombre: Identificador de la consulta (vista y acción que la ejecutan).
+    - construir: Función que arma el queryset con parámetros representativos.
+    - tablas: Tablas que deben resolverse con un índice (nunca con un recorrido completo).
+    """
+
+    nombre: str
+    construir: Callable[[], QuerySet]
+    tablas: tuple[str, ...] = ()
+
+
+HOT_QUERIES: dict[str, ConsultaCaliente] = {}
+
+# En SQLite "SCAN" siempre recorre la tabla o el índice completo; "SEARCH" usa un rango del índice.
+_SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)\b")
+
+
+def consulta_caliente(nombre: str, tablas: tuple[str, ...] = ()):
+    """
+    Registra la función decorada como constructora de una consulta caliente.
+    Los módulos hot_queries.py de cada aplicación se cargan con cargar_consultas().
+    """
+
+    def decorator(construir):
+        HOT_QUERIES[nombre] = ConsultaCaliente(nombre, construir, tuple(tablas))
+        return construir
+
+    return decorator
+
+
+def cargar_consultas() -> dict[str, ConsultaCaliente]:
+    autodiscover_modules("hot_queries")
+    return HOT_QUERIES
+
+
+def queryset_de_grid(vista, **params) -> QuerySet:
+    """
+    Queryset que ejecuta la acción grid de la vista (core.grids.GridMixin) con los query
+    params indicados, para que las consultas calientes sean las mismas que las del grid.
+    """
+    view = vista(action="grid", args=(), kwargs={}, format_kwarg=None)
+    view.request = Request(RequestFactory().get("/", params))
+    return view.get_grid_filtrado()
+
+
+def recorridos_completos(queryset: QuerySet) -> tuple[list[str], str] | None:
+    """
+    Ejecuta EXPLAIN sobre el queryset y retorna las tablas que se leen con un
+    recorrido completo junto con el plan en texto. Soporta SQLite y MySQL/MariaDB;
+    con otras bases registra una advertencia y retorna None.
+    """
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "sqlite":
+        plan = queryset.explain()
+        return _SQLITE_SCAN.findall(plan), plan
+
+    if vendor == "mysql":
+        plan = queryset.explain(format="json")
+        tablas = []
+        for fila in plan.splitlines():
+            datos = json.loads(fila)
+            # Django serializa cada fila en JSON, por lo que el plan llega como texto.
+            if isinstance(datos, str):
+                datos = json.loads(datos)
+            _recorrer_plan_mysql(datos, tablas)
+        return tablas, plan
+
+    logger.warning("EXPLAIN no soportado para %s; se omite la consulta", vendor)
+    return None
+
+
+def _recorrer_plan_mysql(nodo, tablas: list[str]):
+    if isinstance(nodo, dict):
+        if nodo.get("access_type") == "ALL" and "table_name" in nodo:
+            tablas.append(nodo["table_name"])
+        for valor in nodo.values():
+            _recorrer_plan_mysql(valor, tablas)
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            _recorrer_plan_mysql(valor, tablas)
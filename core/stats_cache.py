@@ -0,0 +1,190 @@
+import functools
+import hashlib
+import inspect
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from core import periodos
+
+PREFIJO = "stats"
+TIMEOUT = 60 * 15
+# Aplicaciones cuyos modelos alimentan las estadísticas y los conteos de los grids.
+APPS_INVALIDADAS = ("inventory", "services", "customers", "staff")
+
+# Nombres de los endpoints cacheados (se registran al importar las vistas).
+ENDPOINTS_REGISTRADOS: set[str] = set()
+
+
+def _clave_tag(tag: str) -> str:
+    return f"{PREFIJO}:tag:{tag}"
+
+
+def _clave_contador(nombre: str, tipo: str) -> str:
+    return f"{PREFIJO}:{tipo}:{nombre}"
+
+
+def _clave_entrada(nombre: str, request) -> str:
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    # El día forma parte de la clave porque varios endpoints calculan periodos relativos a hoy.
+    firma = hashlib.md5(f"{periodos.hoy()}?{params}".encode()).hexdigest()
+    return f"{PREFIJO}:entrada:{nombre}:{firma}"
+
+
+def _versiones(tags) -> dict[str, int]:
+    """
+    Retorna la versión actual de cada tag; los tags sin versión (nuevos o
+    desalojados del cache) reciben una nueva.
+    """
+    claves = {_clave_tag(tag): tag for tag in tags}
+    versiones = {claves[clave]: version for clave, version in cache.get_many(claves).items()}
+
+    faltantes = {tag: time.time_ns() for tag in tags if tag not in versiones}
+    if faltantes:
+        cache.set_many({_clave_tag(tag): version for tag, version in faltantes.items()}, None)
+        versiones.update(faltantes)
+    return versiones
+
+
+def _contar(nombre: str, tipo: str):
+    clave = _clave_contador(nombre, tipo)
+    if not cache.add(clave, 1, None):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 1, None)
+
+
+def _nuevas_versiones(tags):
+    cache.set_many({_clave_tag(tag): time.time_ns() for tag in tags}, None)
+
+
+def invalidar(*tags: str):
+    """
+    Invalida las entradas que dependen de alguno de los tags (label de modelo, p. ej.
+    "inventory.lote") cambiando su versión. Se invalida de inmediato y otra vez al
+    confirmar la transacción, para descartar lo que otra petición haya cacheado
+    leyendo los datos anteriores al commit.
+    """
+    _nuevas_versiones(tags)
+    transaction.on_commit(lambda: _nuevas_versiones(tags))
+
+
+def invalidar_por_modelo(sender, **kwargs):
+    if sender._meta.app_label in APPS_INVALIDADAS:
+        invalidar(sender._meta.label_lower)
+
+
+def invalidar_por_relacion(sender, action: str, **kwargs):
+    """
+    Invalida la tabla intermedia de una relación muchos a muchos (señal m2m_changed).
+    """
+    if action.startswith("post_"):
+        invalidar_por_modelo(sender)
+
+
+def contadores() -> dict[str, dict[str, int]]:
+    """
+    Retorna los aciertos y fallos de cada endpoint cacheado.
+    """
+    claves = [
+        _clave_contador(nombre, tipo)
+        for nombre in ENDPOINTS_REGISTRADOS
+        for tipo in ("hits", "misses")
+    ]
+    valores = cache.get_many(claves)
+    return {
+        nombre: {
+            tipo: valores.get(_clave_contador(nombre, tipo), 0) for tipo in ("hits", "misses")
+        }
+        for nombre in sorted(ENDPOINTS_REGISTRADOS)
+    }
+
+
+def reiniciar_contadores():
+    cache.delete_many(
+        [
+            _clave_contador(nombre, tipo)
+            for nombre in ENDPOINTS_REGISTRADOS
+            for tipo in ("hits", "misses")
+        ]
+    )
+
+
+def _buscar(nombre: str, tags, request):
+    """
+    Retorna la clave de la entrada, las versiones actuales de sus tags y los datos
+    cacheados si siguen siendo válidos (None en caso contrario).
+    """
+    clave = _clave_entrada(nombre, request)
+    versiones = _versiones(tags)
+
+    entrada = cache.get(clave)
+    if entrada is not None and entrada["versiones"] == versiones:
+        _contar(nombre, "hits")
+        return clave, versiones, entrada
+    _contar(nombre, "misses")
+    return clave, versiones, None
+
+
+def _guardar(clave: str, versiones, response, timeout: int):
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(
+            clave,
+            {"versiones": versiones, "data": response.data, "status": response.status_code},
+            timeout,
+        )
+
+
+def cache_estadistica(nombre: str, tags: tuple[str, ...], timeout: int = TIMEOUT):
+    """
+    Cachea la respuesta de un endpoint de estadísticas según su nombre y sus query params.
+    La entrada guarda la versión de cada tag del que depende y deja de ser válida en
+    cuanto alguno se invalida (señales post_save/post_delete o invalidar()).
+    Sirve para funciones con @api_view, acciones de un ViewSet y vistas asíncronas
+    (core.async_views); las variantes síncrona y asíncrona de un endpoint comparten el nombre
+    y por lo tanto las entradas.
+    """
+    ENDPOINTS_REGISTRADOS.add(nombre)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            from core.async_views import RespuestaAsincrona
+
+            @functools.wraps(func)
+            async def async_wrapper(request, *args, **kwargs):
+                clave, versiones, entrada = await sync_to_async(_buscar)(nombre, tags, request)
+                if entrada is not None:
+                    response = RespuestaAsincrona(entrada["data"], status=entrada["status"])
+                    response["X-Cache"] = "HIT"
+                    return response
+
+                response = await func(request, *args, **kwargs)
+                await sync_to_async(_guardar)(clave, versiones, response, timeout)
+                response["X-Cache"] = "MISS"
+                return response
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if hasattr(arg, "query_params"))
+            clave, versiones, entrada = _buscar(nombre, tags, request)
+            if entrada is not None:
+                response = Response(entrada["data"], status=entrada["status"])
+                response["X-Cache"] = "HIT"
+                return response
+
+            response = func(*args, **kwargs)
+            _guardar(clave, versiones, response, timeout)
+            response["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
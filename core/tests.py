@@ -1,3 +1,625 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 
-# Create your tests here.
+from core.query_plans import cargar_consultas, recorridos_completos
+
+
+class HotQueriesIndexTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        consultas = cargar_consultas()
+        self.assertTrue(consultas)
+
+        for nombre, consulta in consultas.items():
+            with self.subTest(consulta=nombre):
+                resultado = recorridos_completos(consulta.construir())
+                if resultado is None:
+                    self.skipTest("EXPLAIN no soportado en esta base")
+                recorridos, plan = resultado
+                self.assertFalse(set(recorridos) & set(consulta.tablas), plan)
+
+
+class StatsCacheTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create(username="admin")
+
+    def get(self, action, **params):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from inventory.views import StatisticsViewSet
+
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=self.user)
+        return StatisticsViewSet.as_view({"get": action})(request)
+
+    def test_hits_until_a_dependency_changes(self):
+        from decimal import Decimal
+        from django.utils import timezone
+        from core import stats_cache
+        from inventory.models import Lote, Producto
+        from services.models import Servicio
+
+        producto = Producto.objects.create(nombre="P1", precio=Decimal("20.00"))
+
+        self.assertEqual(self.get("valor_inventario")["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.get("valor_inventario")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        # Un cambio en otro modelo no invalida la entrada.
+        Servicio.objects.create(nombre="Service 1")
+        self.assertEqual(self.get("valor_inventario")["X-Cache"], "HIT")
+
+        Lote.objects.create(producto=producto, costo=Decimal("5.00"), fe_compra=timezone.now())
+        response = self.get("valor_inventario")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["total"], Decimal("5.00"))
+
+        self.assertEqual(self.get("productos_cerca_de_agotar", umbral=5)["X-Cache"], "MISS")
+        self.assertEqual(self.get("productos_cerca_de_agotar", umbral=3)["X-Cache"], "MISS")
+
+        self.assertEqual(stats_cache.contadores()["valor_inventario"], {"hits": 2, "misses": 2})
+        stats_cache.reiniciar_contadores()
+        self.assertEqual(stats_cache.contadores()["valor_inventario"], {"hits": 0, "misses": 0})
+
+    def test_bulk_writes_invalidate_their_tags(self):
+        from django.utils import timezone
+        from customers.models import Cliente
+        from inventory.models import Lote, Producto
+        from services.models import ServicioRealizado, ServicioRealizadoProducto, Servicio
+
+        producto = Producto.objects.create(nombre="P1", usos_est=10)
+        Lote.objects.create(producto=producto, fe_exp=timezone.now() + timezone.timedelta(days=30))
+        servicio_realizado = ServicioRealizado.objects.create(
+            cliente=Cliente.objects.create(nombre="John Doe"),
+            servicio=Servicio.objects.create(nombre="Service 1"),
+        )
+
+        self.get("productos_mas_utilizados")
+        self.assertEqual(self.get("productos_mas_utilizados")["X-Cache"], "HIT")
+
+        ServicioRealizadoProducto.objects.asignar_fefo(servicio_realizado, {producto.id: 3})
+
+        response = self.get("productos_mas_utilizados")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data[0]["usos"], 3)
+
+
+class DashboardTests(TransactionTestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from inventory.models import Producto, ProductoMarca
+
+        cache.clear()
+        self.user = User.objects.create(username="admin")
+        marca = ProductoMarca.objects.create(nombre="Marca")
+        Producto.objects.create(nombre="P1", marca=marca)
+        Producto.objects.create(nombre="P2", marca=marca)
+
+    def post(self, widgets):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from inventory.views import StatisticsViewSet
+
+        request = APIRequestFactory().post("/", {"widgets": widgets}, format="json")
+        force_authenticate(request, user=self.user)
+        return StatisticsViewSet.as_view({"post": "dashboard"})(request)
+
+    def test_combines_widgets_computed_in_parallel(self):
+        import services.views  # noqa: F401 Registra los widgets de servicios.
+
+        response = self.post(
+            [
+                {"nombre": "productos_por_marca"},
+                {"nombre": "valor_inventario"},
+                {"nombre": "most_performed_services", "params": {"period": "year"}},
+                {"nombre": "most_performed_services", "params": {"period": "decade"}},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        widgets = response.data["widgets"]
+        self.assertEqual([w["status"] for w in widgets], [200, 200, 200, 400])
+        self.assertEqual(widgets[0]["data"], [{"marca": "Marca", "total": 2}])
+        self.assertEqual(widgets[2]["params"], {"period": "year"})
+        for widget in widgets:
+            self.assertIn("ms", widget)
+
+    def test_slow_widget_times_out_without_blocking_others(self):
+        import threading
+        from core import dashboard
+
+        liberar = threading.Event()
+
+        def lento(request):
+            from rest_framework.response import Response
+
+            liberar.wait(5)
+            return Response()
+
+        dashboard.registrar_widget("lento", lento)
+        try:
+            response = self.post(
+                [{"nombre": "lento", "timeout": 0.1}, {"nombre": "productos_por_marca"}]
+            )
+        finally:
+            liberar.set()
+            del dashboard.WIDGETS["lento"]
+
+        self.assertEqual([w["status"] for w in response.data["widgets"]], [504, 200])
+
+    def test_timeout_counts_from_start_not_from_queue(self):
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        from core import dashboard
+
+        def corto(request):
+            time.sleep(0.2)
+            return dashboard.WIDGETS["productos_por_marca"](request)
+
+        dashboard.registrar_widget("corto", corto)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            with mock.patch.object(dashboard, "_executor", executor):
+                response = self.post([{"nombre": "corto", "timeout": 0.5}] * 3)
+        finally:
+            executor.shutdown()
+            del dashboard.WIDGETS["corto"]
+
+        # Con un solo hilo el tercer widget espera 0.4 s en la cola y aun así no se agota.
+        self.assertEqual([w["status"] for w in response.data["widgets"]], [200, 200, 200])
+
+    def test_errors_are_logged_not_returned(self):
+        from core import dashboard
+
+        def falla(request):
+            raise RuntimeError("detalle interno de la base")
+
+        dashboard.registrar_widget("falla", falla)
+        try:
+            with self.assertLogs("core.dashboard", level="ERROR") as logs:
+                response = self.post([{"nombre": "falla"}])
+        finally:
+            del dashboard.WIDGETS["falla"]
+
+        (widget,) = response.data["widgets"]
+        self.assertEqual(widget["status"], 500)
+        self.assertNotIn("detalle interno", widget["error"])
+        self.assertIn("detalle interno", "\n".join(logs.output))
+
+    def test_rejects_unknown_widgets(self):
+        response = self.post([{"nombre": "no_existe"}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_invalid_timeouts(self):
+        for timeout in ("rápido", None, 0, "nan"):
+            with self.subTest(timeout=timeout):
+                response = self.post([{"nombre": "valor_inventario", "timeout": timeout}])
+                self.assertEqual(response.status_code, 400)
+
+
+class AsyncStatsTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        cache.clear()
+        self.user = User.objects.create(username="admin")
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    async def test_async_variants_match_sync_views_and_share_cache(self):
+        from decimal import Decimal
+        from django.core.cache import cache
+        from django.test import AsyncClient
+        from django.urls import reverse
+        from django.utils import timezone
+        from inventory.models import Lote, Producto, ProductoMarca
+
+        marca = await ProductoMarca.objects.acreate(nombre="Marca")
+        producto = await Producto.objects.acreate(
+            nombre="P1", marca=marca, precio=Decimal("1.00"), usos_est=4
+        )
+        await Lote.objects.acreate(
+            producto=producto, fe_exp=timezone.now() + timezone.timedelta(days=5)
+        )
+        client = AsyncClient()
+
+        for sync, asincrona, params in (
+            ("stats-productos-por-marca", "async-productos_por_marca", {}),
+            ("stats-cantidad-usos-estimados", "async-cantidad_usos_estimados", {}),
+            ("stats-valor-inventario", "async-valor_inventario", {}),
+            ("stats-lotes-cerca-de-expirar", "async-lotes_cerca_de_expirar", {}),
+            ("stats-productos-cerca-de-agotar", "async-productos_cerca_de_agotar", {}),
+            ("most-performed-services", "async-most-performed-services", {"period": "year"}),
+        ):
+            with self.subTest(endpoint=asincrona):
+                response = await client.get(reverse(asincrona), params, headers=self.headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["X-Cache"], "MISS")
+
+                response_sync = await client.get(reverse(sync), params, headers=self.headers)
+                self.assertEqual(response_sync["X-Cache"], "HIT")
+
+                # Sin cache la vista síncrona calcula la respuesta por su cuenta.
+                await cache.aclear()
+                response_sync = await client.get(reverse(sync), params, headers=self.headers)
+                self.assertEqual(response_sync["X-Cache"], "MISS")
+                self.assertEqual(response.json(), response_sync.json())
+
+        response = await client.get(
+            reverse("async-cantidad_usos_estimados"), {"nuevo": 1}, headers=self.headers
+        )
+        self.assertEqual(response.json(), {"total": 4})
+
+        response = await client.get(reverse("async-lotes_cerca_de_expirar"), headers=self.headers)
+        self.assertEqual(response.json()[0]["producto"]["nombre"], "P1")
+
+    async def test_async_variants_validate_params_and_require_authentication(self):
+        from django.test import AsyncClient
+        from django.urls import reverse
+
+        response = await AsyncClient().get(reverse("async-valor_inventario"))
+        self.assertEqual(response.status_code, 401)
+
+        response = await AsyncClient().get(
+            reverse("async-productos_mas_utilizados"), {"period": "decade"}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json())
+
+
+class PeriodosTests(TestCase):
+    def test_ranges_cross_year_boundaries(self):
+        import datetime
+        from core import periodos
+
+        d = datetime.date
+        self.assertEqual(periodos.rango(d(2025, 1, 1), "week"), (d(2024, 12, 30), d(2025, 1, 5)))
+        self.assertEqual(periodos.rango(d(2025, 1, 15), "month", -1), (d(2024, 12, 1), d(2024, 12, 31)))
+        self.assertEqual(periodos.rango(d(2024, 12, 15), "month", 1), (d(2025, 1, 1), d(2025, 1, 31)))
+        self.assertEqual(periodos.rango(d(2024, 2, 10), "month"), (d(2024, 2, 1), d(2024, 2, 29)))
+        self.assertEqual(periodos.rango(d(2025, 3, 3), "year", -1), (d(2024, 1, 1), d(2024, 12, 31)))
+        self.assertEqual(
+            periodos.periodos(d(2024, 11, 20), d(2025, 2, 1), "month"),
+            [d(2024, 11, 1), d(2024, 12, 1), d(2025, 1, 1), d(2025, 2, 1)],
+        )
+        with self.assertRaises(ValueError):
+            periodos.periodo_actual("decade")
+
+    def test_series_are_one_query_with_gaps_filled(self):
+        import datetime
+        from django.db.models import Sum
+        from core import periodos
+        from services.models import Servicio, ServicioRealizadoDiario
+
+        servicio = Servicio.objects.create(nombre="Corte")
+        ServicioRealizadoDiario.objects.bulk_create(
+            ServicioRealizadoDiario(fecha=fecha, servicio=servicio, cantidad=cantidad)
+            for fecha, cantidad in (
+                (datetime.date(2024, 1, 3), 2),
+                (datetime.date(2024, 1, 5), 1),
+                (datetime.date(2024, 12, 31), 4),
+            )
+        )
+
+        serie = periodos.Serie(
+            ServicioRealizadoDiario.objects,
+            "fecha",
+            datetime.date(2024, 1, 1),
+            datetime.date(2024, 12, 31),
+            "week",
+            {"total": Sum("cantidad")},
+        )
+        with self.assertNumQueries(1):
+            filas = serie.filas()
+
+        self.assertEqual(len(filas), 53)
+        self.assertEqual(filas[0], {"periodo": datetime.date(2024, 1, 1), "total": 3})
+        self.assertEqual(filas[1], {"periodo": datetime.date(2024, 1, 8), "total": 0})
+        self.assertEqual(filas[-1], {"periodo": datetime.date(2024, 12, 30), "total": 4})
+
+    def test_datetime_fields_are_bucketed_in_the_statistics_timezone(self):
+        import datetime
+        from django.db.models import Count
+        from customers.models import Cliente
+        from core import periodos
+        from services.models import Servicio, ServicioRealizado
+
+        # 03:00 UTC del 1 de marzo es 22:00 del 29 de febrero en Guayaquil.
+        ServicioRealizado.objects.create(
+            cliente=Cliente.objects.create(nombre="John Doe"),
+            servicio=Servicio.objects.create(nombre="Corte"),
+            fecha=datetime.datetime(2024, 3, 1, 3, tzinfo=datetime.timezone.utc),
+        )
+
+        filas = periodos.Serie(
+            ServicioRealizado.objects,
+            "fecha",
+            datetime.date(2024, 2, 1),
+            datetime.date(2024, 3, 31),
+            "month",
+            {"total": Count("id")},
+        ).filas()
+        self.assertEqual([fila["total"] for fila in filas], [1, 0])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from customers.models import Cliente
+
+        self.user = User.objects.create(username="admin")
+        for i in range(5):
+            Cliente.objects.create(nombre=f"Ana {i}", apellido="A", cedula=f"0{i}")
+        Cliente.objects.create(nombre="Luis", apellido="B", cedula="09")
+        # Mismo created_at para todos: el orden lo decide el desempate por id.
+        Cliente.objects.update(created_at=timezone.now())
+
+    def get(self, url):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from customers.views import ClienteView
+
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.user)
+        return ClienteView.as_view({"get": "grid"})(request)
+
+    def test_walks_pages_without_count_or_offset(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from customers.models import Cliente
+
+        ids = list(Cliente.objects.filter(nombre__icontains="ana").order_by("id").values_list("id", flat=True))
+        url = "/?cursor=&limit=2&nombre=ana"
+        paginas = []
+        while url:
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            for consulta in consultas.captured_queries:
+                self.assertNotIn("COUNT(*)", consulta["sql"].upper())
+                self.assertNotIn("OFFSET", consulta["sql"].upper())
+            self.assertNotIn("count", response.data)
+            paginas.append(response.data)
+            url = response.data["next"]
+
+        filas = [fila for pagina in paginas for fila in pagina["results"]]
+        self.assertEqual([fila["id"] for fila in filas], ids)
+        self.assertEqual([fila["row_number"] for fila in filas], [1, 2, 3, 4, 5])
+        self.assertIsNone(paginas[0]["previous"])
+
+        anterior = self.get(paginas[-1]["previous"])
+        self.assertEqual([fila["id"] for fila in anterior.data["results"]], ids[2:4])
+        self.assertEqual([fila["row_number"] for fila in anterior.data["results"]], [3, 4])
+        self.assertIsNotNone(anterior.data["next"])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.get("/?cursor=no-es-un-cursor").status_code, 404)
+
+
+class GridCountTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from customers.models import Cliente
+
+        cache.clear()
+        self.user = User.objects.create(username="admin")
+        for i in range(3):
+            Cliente.objects.create(nombre=f"Ana {i}", apellido="A", cedula=f"0{i}")
+
+    def get(self, url):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from customers.views import ClienteView
+
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.user)
+        return ClienteView.as_view({"get": "grid"})(request)
+
+    def test_count_is_cached_per_filters_until_a_write(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from customers.models import Cliente
+
+        response = self.get("/?offset=0&limit=2&nombre=ana")
+        self.assertEqual((response.data["count"], response["X-Count"]), (3, "MISS"))
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.get("/?limit=2&nombre=ana&offset=2")
+        self.assertEqual((response.data["count"], response["X-Count"]), (3, "HIT"))
+        self.assertFalse(any("COUNT(*)" in q["sql"].upper() for q in consultas.captured_queries))
+
+        # Otros filtros tienen su propio conteo.
+        self.assertEqual(self.get("/?offset=0&nombre=ana 1")["X-Count"], "MISS")
+
+        Cliente.objects.create(nombre="Ana 3", apellido="A", cedula="03")
+        response = self.get("/?offset=0&limit=2&nombre=ana")
+        self.assertEqual((response.data["count"], response["X-Count"]), (4, "MISS"))
+
+    def test_estimate_only_without_filters(self):
+        from django.db import connection
+        from customers.models import Cliente
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        self.assertEqual(self.get("/?offset=0&count=estimate")["X-Count"], "ESTIMATE")
+        self.assertEqual(self.get("/?offset=0&count=estimate")["X-Count"], "ESTIMATE")
+        response = self.get("/?offset=0&count=estimate&nombre=ana")
+        self.assertEqual((response.data["count"], response["X-Count"]), (3, "MISS"))
+
+        # Las estadísticas incluyen los eliminados lógicamente; el grid no los lista.
+        Cliente.objects.first().delete()
+        response = self.get("/?offset=0&count=estimate")
+        self.assertEqual((response.data["count"], response["X-Count"]), (2, "ESTIMATE"))
+
+    def test_count_query_drops_unused_annotations(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from inventory.models import Producto, ProductoMarca, ProductoTipo
+        from inventory.views import ProductoView
+
+        Producto.objects.create(
+            nombre="P1",
+            tipo=ProductoTipo.objects.create(nombre="Tipo"),
+            marca=ProductoMarca.objects.create(nombre="Marca"),
+        )
+
+        def conteos(url):
+            request = APIRequestFactory().get(url)
+            force_authenticate(request, user=self.user)
+            with CaptureQueriesContext(connection) as consultas:
+                response = ProductoView.as_view({"get": "grid"})(request)
+            self.assertEqual(response.status_code, 200)
+            return [q["sql"] for q in consultas.captured_queries if "COUNT(*)" in q["sql"].upper()]
+
+        (conteo,) = conteos("/?offset=0")
+        self.assertNotIn("productostock", conteo)
+        self.assertNotIn("productotipo", conteo)
+
+        (filtrado,) = conteos("/?offset=0&status=true")
+        self.assertIn("productostock", filtrado)
+
+
+class BusquedaTests(TestCase):
+    def test_index_follows_saves_and_ranks_word_prefixes_first(self):
+        from decimal import Decimal
+        from core import busqueda
+        from core.models import TrigramaBusqueda
+        from inventory.models import Producto
+
+        antishampoo = Producto.objects.create(nombre="Antishampoo", sku="A1", precio=Decimal("1"))
+        shampoo = Producto.objects.create(nombre="Shampoo Keratina", sku="S1", precio=Decimal("1"))
+        tinte = Producto.objects.create(nombre="Tinte", sku="T1", precio=Decimal("1"))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(busqueda.buscar(Producto.objects.all(), "SHAMP"), [shampoo, antishampoo])
+        self.assertEqual(busqueda.buscar(Producto.objects.all(), "keratína shampoo"), [shampoo])
+        # Las palabras cortas también se encuentran en medio de un campo (icontains).
+        self.assertEqual(busqueda.buscar(Producto.objects.all(), "a1"), [antishampoo])
+        self.assertEqual(busqueda.buscar(Producto.objects.all(), "t1"), [tinte])
+
+        shampoo.nombre = "Acondicionador"
+        shampoo.save()
+        self.assertEqual(busqueda.buscar(Producto.objects.all(), "shampoo"), [antishampoo])
+
+        antishampoo.delete()
+        self.assertEqual(busqueda.buscar(Producto.objects.all(), "shampoo"), [])
+        self.assertFalse(TrigramaBusqueda.objects.filter(objeto_id=antishampoo.pk, modelo="inventory.producto"))
+
+        TrigramaBusqueda.objects.all().delete()
+        busqueda.reindexar(Producto)
+        self.assertEqual(busqueda.buscar(Producto.objects.all(), "acond"), [shampoo])
+
+    def test_filter_matches_icontains(self):
+        from core import busqueda
+        from customers.models import Cliente
+
+        for i, cedula in enumerate(("0912345678", "0919120000", "1709123456")):
+            Cliente.objects.create(nombre=f"Cliente {i}", apellido="José", cedula=cedula)
+
+        for campo, texto in (("cedula", "0912"), ("cedula", "91"), ("apellido", "jos"), ("nombre", "nte 1")):
+            with self.subTest(campo=campo, texto=texto):
+                self.assertQuerySetEqual(
+                    busqueda.filtrar(Cliente.objects.all(), (campo,), texto),
+                    Cliente.objects.filter(**{f"{campo}__icontains": texto}),
+                    ordered=False,
+                )
+
+
+class GridStreamTests(TestCase):
+    def test_unpaginated_grid_streams_in_blocks(self):
+        import json
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from customers.models import Cliente
+        from customers.views import ClienteView
+
+        user = User.objects.create(username="admin")
+        for i in range(5):
+            Cliente.objects.create(nombre=f"Cliente {i}", apellido="Pérez", cedula=f"0{i}")
+        Cliente.objects.update(created_at=timezone.now())
+
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=user)
+        with mock.patch.object(ClienteView, "grid_tamano_bloque", 2):
+            response = ClienteView.as_view({"get": "grid"})(request)
+            with CaptureQueriesContext(connection) as consultas:
+                data = json.loads(b"".join(response.streaming_content))
+
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(
+            [fila["id"] for fila in data["results"]],
+            list(Cliente.objects.order_by("id").values_list("id", flat=True)),
+        )
+        self.assertEqual(data["results"][0]["apellido"], "Pérez")
+        self.assertEqual(len(consultas.captured_queries), 3)
+        self.assertTrue(all("LIMIT 2" in q["sql"] for q in consultas.captured_queries))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create(username="admin")
+
+    def get(self, **headers):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from customers.views import ClienteView
+
+        request = APIRequestFactory().get("/", **headers)
+        force_authenticate(request, user=self.user)
+        return ClienteView.as_view({"get": "selector"})(request)
+
+    def test_if_modified_since_alone_does_not_return_304(self):
+        response = self.get()
+        response = self.get(HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        from django.test import override_settings
+        from core.checks import cache_compartido
+
+        self.assertEqual([error.id for error in cache_compartido(None)], ["core.E001"])
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(cache_compartido(None), [])
+
+    def test_selector_returns_304_without_queries_until_a_write(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from customers.models import Cliente
+
+        cliente = Cliente.objects.create(nombre="Ana", apellido="Pérez", cedula="01")
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(len(consultas.captured_queries), 0)
+
+        Cliente.objects.filter(pk=cliente.pk).update(nombre="Ana María")
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data[0]["nombre"], "Ana María")
+
+        etag = response["ETag"]
+        cliente.delete()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), [])
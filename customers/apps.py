@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CustomersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'customers'
+
+    def ready(self) -> None:
+        from core import busqueda
+        from .models import Cliente
+
+        busqueda.registrar(Cliente, ("nombre", "apellido", "cedula", "email", "telefono"))
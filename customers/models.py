@@ -28,6 +28,11 @@ class Cliente(AuditModel):
     cedula = models.CharField(max_length=20, unique=True, null=True, blank=True)
     #notas = models.TextField(null=True, blank=True)
 
+    class Meta(AuditModel.Meta):
+        indexes = [
+            models.Index(fields=["deleted_at", "created_at"], name="cliente_activo_creado_idx"),
+        ]
+
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
 
@@ -1,38 +1,69 @@
 import uuid
 from django.apps import AppConfig
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class InventoryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "inventory"
 
-    """ def ready(self) -> None:
+    def ready(self) -> None:
+        from core import busqueda
         from . import signals
-        from .models import Lote, ProductoImg
+        from .models import Lote, Producto
 
-        post_delete.connect(
+        """ post_delete.connect(
             signals.eliminar_imagen,
             sender=ProductoImg,
             dispatch_uid=str(uuid.uuid3(uuid.NAMESPACE_OID, "eliminar_imagen")),
+        ) """
+
+        pre_save.connect(
+            signals.lote_guardar_producto_anterior,
+            sender=Lote,
+            dispatch_uid=str(
+                uuid.uuid3(uuid.NAMESPACE_OID, "lote_guardar_producto_anterior")
+            ),
         )
 
         post_save.connect(
-            signals.producto_update_posee_existencias_on_lote_save,
+            signals.producto_update_stock_on_lote_save,
             sender=Lote,
             dispatch_uid=str(
-                uuid.uuid3(
-                    uuid.NAMESPACE_OID, "producto_update_posee_existencias_on_lote_save"
-                )
+                uuid.uuid3(uuid.NAMESPACE_OID, "producto_update_stock_on_lote_save")
             ),
         )
 
         post_delete.connect(
-            signals.producto_update_posee_existencias_on_lote_save,
+            signals.producto_update_stock_on_lote_delete,
             sender=Lote,
             dispatch_uid=str(
-                uuid.uuid3(
-                    uuid.NAMESPACE_OID, "producto_update_posee_existencias_on_lote_save"
-                )
+                uuid.uuid3(uuid.NAMESPACE_OID, "producto_update_stock_on_lote_delete")
             ),
-        ) """
+        )
+
+        post_save.connect(
+            signals.lote_compra_diaria_on_lote_save,
+            sender=Lote,
+            dispatch_uid=str(
+                uuid.uuid3(uuid.NAMESPACE_OID, "lote_compra_diaria_on_lote_save")
+            ),
+        )
+
+        post_delete.connect(
+            signals.lote_compra_diaria_on_lote_delete,
+            sender=Lote,
+            dispatch_uid=str(
+                uuid.uuid3(uuid.NAMESPACE_OID, "lote_compra_diaria_on_lote_delete")
+            ),
+        )
+
+        post_save.connect(
+            signals.producto_update_stock_on_producto_save,
+            sender=Producto,
+            dispatch_uid=str(
+                uuid.uuid3(uuid.NAMESPACE_OID, "producto_update_stock_on_producto_save")
+            ),
+        )
+
+        busqueda.registrar(Producto, ("nombre", "sku"))
@@ -0,0 +1,136 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Sum
+from rest_framework import status
+
+from core import periodos
+from core.async_views import RespuestaAsincrona, vista_asincrona
+from core.stats_cache import cache_estadistica
+from .models import LoteCompraDiaria, Producto
+from .pronosticos import pronosticar_stock
+from .serializers import LoteAllSerializer, ProductoWithExistenciasSerializer
+from .views import (
+    consulta_horizonte_expiracion,
+    consulta_lotes_cerca_de_expirar,
+    consulta_productos_cerca_de_agotar,
+    consulta_productos_mas_utilizados,
+    consulta_productos_por_marca,
+    consulta_total_productos_por_tipo,
+    parametros_pronostico,
+    periodos_valor_inventario,
+    respuesta_horizonte_expiracion,
+    respuesta_valor_inventario,
+    serializar_productos_mas_utilizados,
+)
+
+# Variantes asíncronas de las acciones de StatisticsViewSet. Usan el ORM asíncrono para
+# que un worker ASGI atienda otras peticiones mientras espera las consultas.
+
+
+@vista_asincrona
+@cache_estadistica(
+    "total_productos_por_tipo",
+    tags=("inventory.producto", "inventory.productotipo"),
+)
+async def total_productos_por_tipo(request):
+    return RespuestaAsincrona(
+        [
+            {"tipo": data["tipo__nombre"], "total": data["total"]}
+            async for data in consulta_total_productos_por_tipo()
+        ]
+    )
+
+
+@vista_asincrona
+@cache_estadistica(
+    "productos_por_marca",
+    tags=("inventory.producto", "inventory.productomarca"),
+)
+async def productos_por_marca(request):
+    return RespuestaAsincrona(
+        [
+            {"marca": data["marca__nombre"], "total": data["total"]}
+            async for data in consulta_productos_por_marca()
+        ]
+    )
+
+
+@vista_asincrona
+@cache_estadistica("valor_inventario", tags=("inventory.lotecompradiaria",))
+async def valor_inventario(request):
+    valores = await LoteCompraDiaria.objects.atotales(
+        periodos_valor_inventario(periodos.hoy())
+    )
+    return RespuestaAsincrona(respuesta_valor_inventario(valores))
+
+
+@vista_asincrona
+@cache_estadistica("cantidad_usos_estimados", tags=("inventory.producto",))
+async def cantidad_usos_estimados(request):
+    return RespuestaAsincrona(await Producto.objects.aaggregate(total=Sum("usos_est")))
+
+
+@vista_asincrona
+@cache_estadistica(
+    "productos_mas_utilizados",
+    tags=("services.productousodiario", "inventory.producto"),
+)
+async def productos_mas_utilizados(request):
+    try:
+        productos_usados, granularity, limite = consulta_productos_mas_utilizados(request.GET)
+    except ValueError as e:
+        return RespuestaAsincrona({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    filas = [fila async for fila in productos_usados]
+    return RespuestaAsincrona(serializar_productos_mas_utilizados(filas, granularity, limite))
+
+
+@vista_asincrona
+@cache_estadistica(
+    "lotes_cerca_de_expirar",
+    tags=("inventory.lote", "inventory.producto"),
+)
+async def lotes_cerca_de_expirar(request):
+    lotes = [lote async for lote in consulta_lotes_cerca_de_expirar(request.GET)]
+    return RespuestaAsincrona(LoteAllSerializer(lotes, many=True).data)
+
+
+@vista_asincrona
+@cache_estadistica(
+    "horizonte_expiracion",
+    tags=("inventory.lote", "inventory.producto", "inventory.productotipo"),
+)
+async def horizonte_expiracion(request):
+    try:
+        horizontes, filas = consulta_horizonte_expiracion(request.GET)
+    except ValueError as e:
+        return RespuestaAsincrona({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return RespuestaAsincrona(
+        respuesta_horizonte_expiracion(horizontes, [fila async for fila in filas])
+    )
+
+
+@vista_asincrona
+@cache_estadistica(
+    "productos_cerca_de_agotar",
+    tags=("inventory.productostock", "inventory.producto"),
+)
+async def productos_cerca_de_agotar(request):
+    productos = [producto async for producto in consulta_productos_cerca_de_agotar(request.GET)]
+    return RespuestaAsincrona(ProductoWithExistenciasSerializer(productos, many=True).data)
+
+
+@vista_asincrona
+@cache_estadistica(
+    "pronostico_agotamiento",
+    tags=("services.productousodiario", "inventory.lote", "inventory.producto"),
+)
+async def pronostico_agotamiento(request):
+    try:
+        dias, metodo, alpha, limite = parametros_pronostico(request.GET)
+    except ValueError as e:
+        return RespuestaAsincrona({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # El cálculo es NumPy sobre tres consultas; se ejecuta fuera del event loop.
+    pronostico = await sync_to_async(pronosticar_stock)(dias, metodo, alpha)
+    return RespuestaAsincrona(pronostico[:limite])
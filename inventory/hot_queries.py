@@ -0,0 +1,91 @@
+import datetime
+from django.db.models import Value
+from django.utils import timezone
+
+from core import busqueda, periodos
+from core.query_plans import consulta_caliente, queryset_de_grid
+from .models import Lote, LoteCompraDiaria, LoteEstado, Producto
+from .views import (
+    LoteView,
+    ProductoView,
+    consulta_horizonte_expiracion,
+    consulta_lotes_cerca_de_expirar,
+    consulta_productos_cerca_de_agotar,
+    consulta_total_productos_por_tipo,
+    periodos_valor_inventario,
+)
+
+
+@consulta_caliente("producto.grid", tablas=("inventory_producto",))
+def producto_grid():
+    return queryset_de_grid(ProductoView)
+
+
+@consulta_caliente("producto.grid?status", tablas=("inventory_productostock",))
+def producto_grid_status():
+    return queryset_de_grid(ProductoView, status="true")
+
+
+@consulta_caliente("producto.grid?nombre", tablas=("inventory_producto",))
+def producto_grid_nombre():
+    return queryset_de_grid(ProductoView, nombre="shampoo")
+
+
+@consulta_caliente("lote.grid", tablas=("inventory_lote",))
+def lote_grid():
+    return queryset_de_grid(LoteView)
+
+
+@consulta_caliente("lote.grid?fe_exp", tablas=("inventory_lote",))
+def lote_grid_fe_exp():
+    ahora = timezone.now()
+    return queryset_de_grid(
+        LoteView,
+        fe_exp_inicio=ahora.isoformat(),
+        fe_exp_fin=(ahora + datetime.timedelta(days=30)).isoformat(),
+    )
+
+
+@consulta_caliente("stats.horizonte_expiracion", tablas=("inventory_lote",))
+def horizonte_expiracion():
+    return consulta_horizonte_expiracion({})[1]
+
+
+@consulta_caliente("lote.disponibles", tablas=("inventory_lote",))
+def lote_disponibles():
+    return Lote.objects.disponibles().filter(producto_id=1).order_by("fe_exp")
+
+
+@consulta_caliente("stats.total_productos_por_tipo")
+def total_productos_por_tipo():
+    return consulta_total_productos_por_tipo()
+
+
+@consulta_caliente("stats.valor_inventario")
+def valor_inventario():
+    # totales() usa aggregate(), que no admite EXPLAIN; agrupar por una constante produce
+    # la misma consulta. El total lee todo el acumulado diario, por lo que no exige índice.
+    agregados = LoteCompraDiaria.objects.agregados_totales(
+        periodos_valor_inventario(periodos.hoy())
+    )
+    return LoteCompraDiaria.objects.annotate(grupo=Value(1)).values("grupo").annotate(**agregados)
+
+
+@consulta_caliente("stats.lotes_cerca_de_expirar", tablas=("inventory_lote",))
+def lotes_cerca_de_expirar():
+    return consulta_lotes_cerca_de_expirar({})
+
+
+@consulta_caliente("stats.productos_cerca_de_agotar", tablas=("inventory_productostock",))
+def productos_cerca_de_agotar():
+    return consulta_productos_cerca_de_agotar({})
+
+
+@consulta_caliente("expire_lotes", tablas=("inventory_lote",))
+def expire_lotes():
+    return Lote.objects.filter(estado=LoteEstado.ACTIVO, fe_exp__lte=timezone.now())
+
+
+@consulta_caliente("producto.search", tablas=("core_trigramabusqueda",))
+def producto_search():
+    return busqueda.candidatos(Producto, "shampoo keratina")
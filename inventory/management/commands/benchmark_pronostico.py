@@ -0,0 +1,61 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventory.models import Lote, Producto
+from inventory.pronosticos import METODOS, pronosticar_stock
+from services.models import ProductoUsoDiario
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de pronosticar_stock con datos sintéticos. "
+        "Los datos se crean dentro de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=3000)
+        parser.add_argument("--dias", type=int, default=90, help="Días de historial de usos.")
+        parser.add_argument("--metodo", choices=METODOS, default="ewma")
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        self.stdout.write("Generando datos...")
+        productos = Producto.objects.bulk_create(
+            Producto(nombre=f"Benchmark {i}", usos_est=20) for i in range(options["productos"])
+        )
+        vencimiento = timezone.now() + datetime.timedelta(days=15)
+        Lote.objects.bulk_create(
+            (Lote(producto=producto, cant=1, fe_exp=vencimiento) for producto in productos),
+            batch_size=1000,
+        )
+        hoy = timezone.localdate()
+        ProductoUsoDiario.objects.bulk_create(
+            (
+                ProductoUsoDiario(
+                    fecha=hoy - datetime.timedelta(days=dia), producto=producto, usos=1
+                )
+                for producto in productos[::3]
+                for dia in range(1, options["dias"] + 1)
+            ),
+            batch_size=1000,
+        )
+
+        consultas = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal consultas
+            consultas += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            pronostico = pronosticar_stock(dias_historial=options["dias"], metodo=options["metodo"])
+            duracion = time.perf_counter() - inicio
+        self.stdout.write(
+            f"pronosticar_stock ({len(pronostico)} productos): {duracion:.3f}s, {consultas} consultas"
+        )
+        transaction.set_rollback(True)
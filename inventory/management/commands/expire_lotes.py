@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.stats_cache import invalidar
+from inventory.models import Lote, LoteEstado, ProductoStock
+
+
+class Command(BaseCommand):
+    help = "Marca como vencidos los lotes activos cuya fecha de expiración ya pasó. Pensado para ejecutarse periódicamente (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        total = 0
+
+        while True:
+            with transaction.atomic():
+                lotes = list(
+                    Lote.objects.select_for_update()
+                    .filter(estado=LoteEstado.ACTIVO, fe_exp__lte=ahora)
+                    .values_list("id", "producto_id")[: options["batch_size"]]
+                )
+                if not lotes:
+                    break
+
+                Lote.objects.filter(pk__in=[lote_id for lote_id, _ in lotes]).update(
+                    estado=LoteEstado.VENCIDO
+                )
+                invalidar("inventory.lote")
+                ProductoStock.objects.recalcular(
+                    {producto_id for _, producto_id in lotes}
+                )
+
+            total += len(lotes)
+
+        self.stdout.write(self.style.SUCCESS(f"Se marcaron {total} lotes como vencidos"))
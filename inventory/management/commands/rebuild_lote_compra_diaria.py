@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from inventory.models import LoteCompraDiaria
+
+
+class Command(BaseCommand):
+    help = "Reconstruye las compras diarias (LoteCompraDiaria) a partir de los lotes activos."
+
+    def handle(self, *args, **options):
+        filas = LoteCompraDiaria.objects.reconstruir()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Se reconstruyeron las compras de {len(filas)} días")
+        )
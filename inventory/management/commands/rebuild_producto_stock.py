@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from inventory.models import Producto, ProductoStock
+
+
+class Command(BaseCommand):
+    help = "Recalcula la fotografía de stock (ProductoStock) de los productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--vencidos",
+            action="store_true",
+            help="Solo recalcula los productos cuyo próximo lote ya expiró.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options["vencidos"]:
+            producto_ids = ProductoStock.objects.filter(
+                fe_exp_proxima__lte=timezone.now()
+            ).values_list("producto_id", flat=True)
+        else:
+            producto_ids = Producto.objects.values_list("id", flat=True)
+
+        producto_ids = list(producto_ids)
+        batch_size = options["batch_size"]
+
+        for i in range(0, len(producto_ids), batch_size):
+            ProductoStock.objects.recalcular(producto_ids[i : i + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Se recalculó el stock de {len(producto_ids)} productos")
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from core.stats_cache import invalidar
+from inventory.models import Lote
+
+
+class Command(BaseCommand):
+    help = "Compara el contador servicios_realizados de cada lote con el consumo real y corrige las diferencias."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo reporta las diferencias sin corregirlas.",
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        lotes = list(
+            Lote.objects.select_for_update()
+            .with_consumo_real()
+            .exclude(consumo_real=F("servicios_realizados"))
+            .only("id", "servicios_realizados")
+        )
+
+        for lote in lotes:
+            self.stdout.write(
+                f"Lote {lote.id}: guardado {lote.servicios_realizados}, real {lote.consumo_real}"
+            )
+            lote.servicios_realizados = lote.consumo_real
+
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.WARNING(f"Se encontraron {len(lotes)} lotes con diferencias")
+            )
+            return
+
+        Lote.objects.bulk_update(lotes, ["servicios_realizados"], batch_size=500)
+        invalidar("inventory.lote")
+        self.stdout.write(self.style.SUCCESS(f"Se corrigieron {len(lotes)} lotes"))
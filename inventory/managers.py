@@ -1,4 +1,10 @@
-from core.models import AuditManager
+import datetime
+from django.db import connections, models
+from django.db.models import F, Q, Sum
+
+from core.models import AcumuladoManager, AuditManager
+from core.periodos import dia
+from core.stats_cache import invalidar
 from .querysets import ProductoQuerySet, LoteQuerySet
 
 
@@ -12,9 +18,168 @@ class ProductoManager(AuditManager):
     def with_existencias(self):
         return self.get_queryset().with_existencias()
 
+    def stock_for(self, producto_ids):
+        """
+        Lee existencias, usos_restantes y posee_existencias de varios productos de su
+        fotografía de stock (ProductoStock) en una sola consulta.
+        Retorna un diccionario {producto_id: {...}} con todos los ids solicitados; los
+        productos sin fotografía tienen el stock en cero.
+        """
+        from .models import ProductoStock
+
+        campos = ("existencias", "usos_restantes", "posee_existencias")
+        stock = {
+            producto_id: {"existencias": 0, "usos_restantes": 0, "posee_existencias": False}
+            for producto_id in producto_ids
+        }
+        if not stock:
+            return stock
+
+        filas = ProductoStock.objects.filter(producto_id__in=stock.keys()).values(
+            "producto_id", *campos
+        )
+        for fila in filas:
+            stock[fila["producto_id"]] = {campo: fila[campo] for campo in campos}
+
+        return stock
+
 class LoteManager(AuditManager):
     def get_queryset(self):
         return LoteQuerySet(self.model, using=self._db)
     
     def with_servicios_restantes(self):
-        return self.get_queryset().with_servicios_restantes()
\ No newline at end of file
+        return self.get_queryset().with_servicios_restantes()
+
+    def with_consumo_real(self):
+        return self.get_queryset().with_consumo_real()
+
+    def registrar_consumo(self, cambios: dict[int, int], esperados: dict[int, int] = None):
+        return self.get_queryset().registrar_consumo(cambios, esperados)
+
+    def con_estado(self, estados):
+        return self.get_queryset().con_estado(estados)
+
+    def disponibles(self):
+        return self.get_queryset().disponibles()
+
+    def horizonte_expiracion(self, horizontes: tuple[int, ...] = (7, 30, 60, 90)):
+        return self.get_queryset().horizonte_expiracion(horizontes)
+
+
+class ProductoStockManager(models.Manager):
+    STOCK_FIELDS = [
+        "existencias",
+        "usos_restantes",
+        "posee_existencias",
+        "lote_fefo",
+        "fe_exp_proxima",
+        "actualizado",
+    ]
+
+    def recalcular(self, producto_ids):
+        """
+        Recalcula y guarda la fotografía de stock de los productos indicados
+        con una sola consulta sobre sus lotes activos (en orden FEFO).
+        Emite existencias_cambiadas con los productos que ganaron o perdieron existencias.
+        """
+        from .models import Lote
+        from .signals import existencias_cambiadas
+
+        stocks = {
+            producto_id: self.model(producto_id=producto_id)
+            for producto_id in set(producto_ids)
+            if producto_id is not None
+        }
+        if not stocks:
+            return []
+
+        anteriores = dict(
+            self.filter(producto_id__in=stocks.keys()).values_list(
+                "producto_id", "posee_existencias"
+            )
+        )
+
+        lotes = (
+            Lote.objects.disponibles()
+            .with_servicios_restantes()
+            .filter(producto_id__in=stocks.keys())
+            .order_by("producto_id", F("fe_exp").asc(nulls_last=True), "id")
+            .values_list("id", "producto_id", "cant", "fe_exp", "servicios_restantes")
+        )
+
+        for lote_id, producto_id, cant, fe_exp, servicios_restantes in lotes:
+            stock = stocks[producto_id]
+            if stock.lote_fefo_id is None:
+                stock.lote_fefo_id = lote_id
+                stock.fe_exp_proxima = fe_exp
+            stock.existencias += cant
+            stock.usos_restantes += servicios_restantes
+            stock.posee_existencias = True
+
+        # MySQL no admite indicar la columna del conflicto: ON DUPLICATE KEY UPDATE usa la
+        # restricción única de producto.
+        conflicto = {"update_conflicts": True, "update_fields": self.STOCK_FIELDS}
+        if connections[self.db].features.supports_update_conflicts_with_target:
+            conflicto["unique_fields"] = ["producto"]
+        resultado = self.bulk_create(stocks.values(), **conflicto)
+        invalidar(self.model._meta.label_lower)
+
+        cambiados = [
+            producto_id
+            for producto_id, stock in stocks.items()
+            if anteriores.get(producto_id, False) != stock.posee_existencias
+        ]
+        if cambiados:
+            existencias_cambiadas.send(sender=self.model, producto_ids=cambiados)
+
+        return resultado
+
+
+class LoteCompraDiariaManager(AcumuladoManager):
+    campos_clave = ("fecha",)
+    contador = "cantidad"
+
+    def clave(self, fe_compra) -> tuple:
+        """
+        Clave de la fila de un lote: su día de compra o SIN_FECHA si no tiene.
+        """
+        return (dia(fe_compra) or self.model.SIN_FECHA,)
+
+    def reconstruir(self):
+        """
+        Reemplaza toda la tabla acumulando los lotes activos.
+        """
+        from .models import Lote
+
+        self.all().delete()
+        return self._crear(Lote.objects.active())
+
+    def _crear(self, lotes):
+        # El día se calcula en Python (periodos.dia): en MySQL TruncDate con zona horaria
+        # (CONVERT_TZ) retorna NULL si no están cargadas las tablas de zonas horarias.
+        filas = lotes.values_list("fe_compra", "costo")
+        return self.crear_acumulados(
+            (self.clave(fe_compra), {"cantidad": 1, "costo": costo})
+            for fe_compra, costo in filas.order_by().iterator(chunk_size=2000)
+        )
+
+    def totales(self, periodos: dict[str, tuple[datetime.date, datetime.date]]):
+        """
+        Retorna en una sola consulta el costo total y el de cada periodo
+        ({nombre: (desde, hasta)}, ambos días inclusive).
+        """
+        valores = self.aggregate(**self.agregados_totales(periodos))
+        return {nombre: valor or 0 for nombre, valor in valores.items()}
+
+    async def atotales(self, periodos: dict[str, tuple[datetime.date, datetime.date]]):
+        valores = await self.aaggregate(**self.agregados_totales(periodos))
+        return {nombre: valor or 0 for nombre, valor in valores.items()}
+
+    def agregados_totales(self, periodos):
+        """
+        Agregados de totales(): Sum("costo") total y filtrado por cada periodo.
+        """
+        agregados = {"total": Sum("costo")}
+        for nombre, (desde, hasta) in periodos.items():
+            agregados[nombre] = Sum("costo", filter=Q(fecha__range=(desde, hasta)))
+        return agregados
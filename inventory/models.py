@@ -1,16 +1,21 @@
+import datetime
 from os import path
 from decimal import Decimal
 
 from django.conf import settings
 from django.utils import timezone
 from django.db import models, transaction
-from django.db.models import Sum
 from django.db.models.signals import post_delete
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 
 from core.models import AuditModel
-from inventory.managers import LoteManager, ProductoManager
+from inventory.managers import (
+    LoteCompraDiariaManager,
+    LoteManager,
+    ProductoManager,
+    ProductoStockManager,
+)
 
 
 class ProductoTipo(AuditModel):
@@ -66,6 +71,7 @@ class Producto(AuditModel):
     - usos_est: El número de usos estimados del producto (IntegerField, valor predeterminado: 0).
     Métodos:
     - __str__: Devuelve una representación en cadena del producto.
+    - get_stock: Devuelve el ProductoStock del producto, calculándolo si aún no existe.
     - get_posee_existencias: Devuelve True si el producto tiene existencias disponibles, False en caso contrario.
     - get_existencias: Devuelve la cantidad total de existencias del producto.
     - get_usos_restantes: Devuelve el número total de usos restantes del producto.
@@ -85,37 +91,38 @@ class Producto(AuditModel):
     maximo = models.PositiveIntegerField(default=0)
     minimo = models.PositiveIntegerField(default=0)
 
+    class Meta(AuditModel.Meta):
+        indexes = [
+            models.Index(fields=["deleted_at", "created_at"], name="producto_activo_creado_idx"),
+        ]
+
     def __str__(self):
         return self.nombre
     
     objects = ProductoManager()
     
+    @property
+    def get_stock(self):
+        try:
+            return self.stock
+        except ProductoStock.DoesNotExist:
+            return ProductoStock.objects.recalcular([self.pk])[0]
+
     @property
     def get_posee_existencias(self):
-        lotes = self.lotes.active().filter(retirado=False, fe_exp__gt=timezone.now())
-        for lote in lotes:
-            if lote.get_servicios_restantes > 0:
-                return True
-    
-        return False
+        return self.get_stock.posee_existencias
     
     @property
     def get_existencias(self):
-        lotes = self.lotes.active().filter(retirado=False, fe_exp__gt=timezone.now())
-        return sum([lote.cant if not lote.get_consumido else 0 for lote in lotes])
+        return self.get_stock.existencias
     
     @property
     def get_usos_restantes(self):
-        lotes = self.lotes.active().filter(retirado=False, fe_exp__gt=timezone.now())
-        return sum([lote.get_servicios_restantes for lote in lotes])
+        return self.get_stock.usos_restantes
     
     @property
     def get_lote_to_use(self):
-        lotes = self.lotes.active().filter(retirado=False, fe_exp__gt=timezone.now()).order_by('fe_exp').all()
-        
-        for lote in lotes:
-            if lote.get_servicios_restantes > 0:
-                return lote
+        return self.get_stock.lote_fefo
 
     @transaction.atomic
     def delete(self, using=None, keep_parents=False):
@@ -178,6 +185,13 @@ class ProductoImg(AuditModel):
             return ""
 
 
+class LoteEstado(models.IntegerChoices):
+    ACTIVO = 0, "Activo"
+    CONSUMIDO = 1, "Consumido"
+    RETIRADO = 2, "Retirado"
+    VENCIDO = 3, "Vencido"
+
+
 class Lote(AuditModel):
     """
     Clase que representa un lote de productos.
@@ -189,13 +203,19 @@ class Lote(AuditModel):
     - costo: Costo del lote (por defecto: 0.00).
     - motivo: Motivo de la eliminación del lote (opcional).
     - retirado: Indica si el lote ha sido retirado (por defecto: False).
+    - servicios_realizados: Total de usos consumidos del lote, mantenido por las señales de ServicioRealizadoProducto.
+    - estado: Estado guardado del lote (LoteEstado). Se recalcula al guardar el lote, al registrar consumos
+      y con el comando expire_lotes para los lotes que vencen.
     Métodos:
     - __str__(): Devuelve una representación en cadena del lote.
     - clean(): Valida que el costo del lote sea menor al precio del producto asociado.
+    - save(): Guarda el lote recalculando su estado; el contador de consumo nunca se sobrescribe.
     - delete(using=None, keep_parents=False): Elimina el lote y envía una señal de eliminación.
     - is_expired(): Verifica si el lote ha expirado.
     - get_consumido: Propiedad que indica si el lote ha sido completamente consumido.
-    - get_state: Propiedad que devuelve el estado del lote (0: Activo, 1: Consumido, 2: Retirado, 3: Vencido).
+    - get_state: Propiedad que devuelve el estado del lote (0: Activo, 1: Consumido, 2: Retirado, 3: Vencido);
+      un lote activo cuya fe_exp ya pasó se informa como vencido aunque expire_lotes no lo haya barrido.
+    - calcular_estado(consumido): Devuelve el estado del lote a partir de si está consumido.
     - get_servicios_Realizados: Propiedad que devuelve la cantidad de servicios realizados con el lote.
     - get_servicios_restantes: Propiedad que devuelve la cantidad de servicios restantes para el lote.
     """    
@@ -206,8 +226,22 @@ class Lote(AuditModel):
     cant = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
     costo = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal("0.00"))
     motivo = models.CharField(max_length=225, blank=True, null=True)
-    #TODO: Definir como un campo de estado
     retirado = models.BooleanField(default=False)
+    servicios_realizados = models.PositiveIntegerField(default=0, editable=False)
+    estado = models.PositiveSmallIntegerField(
+        choices=LoteEstado.choices, default=LoteEstado.ACTIVO, editable=False, db_index=True
+    )
+
+    class Meta(AuditModel.Meta):
+        indexes = [
+            models.Index(fields=["deleted_at", "created_at"], name="lote_activo_creado_idx"),
+            models.Index(
+                fields=["producto", "deleted_at", "estado", "fe_exp"],
+                name="lote_producto_estado_idx",
+            ),
+            models.Index(fields=["deleted_at", "fe_exp"], name="lote_activo_exp_idx"),
+            models.Index(fields=["deleted_at", "fe_compra"], name="lote_activo_compra_idx"),
+        ]
 
     def __str__(self):
         return f"Lote de {self.producto.nombre}"
@@ -219,6 +253,29 @@ class Lote(AuditModel):
             raise ValidationError(
                 "El costo del lote debe ser menor que el precio del producto asociado."
             )
+
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # El contador lo mantienen los consumos; se lee el valor actual en lugar
+            # de sobrescribirlo con el que se cargó en memoria.
+            self.servicios_realizados = (
+                Lote.objects.filter(pk=self.pk)
+                .values_list("servicios_realizados", flat=True)
+                .first()
+                or 0
+            )
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "servicios_realizados"
+            ]
+        elif kwargs.get("update_fields") is not None and "estado" not in kwargs["update_fields"]:
+            # El estado se recalcula siempre, por lo que se guarda junto con los campos pedidos.
+            kwargs["update_fields"] = [*kwargs["update_fields"], "estado"]
+
+        self.estado = self.calcular_estado(self.get_consumido)
+        super().save(*args, **kwargs)
             
     @transaction.atomic
     def delete(self, using=None, keep_parents=False):
@@ -235,23 +292,84 @@ class Lote(AuditModel):
     
     @property
     def get_consumido(self):
-        return self.get_servicios_restantes == 0
+        return self.get_servicios_restantes <= 0
 
     @property
     def get_state(self):
-        if self.get_consumido:
-            return 1 #"Consumido"
+        if self.estado == LoteEstado.ACTIVO and self.is_expired():
+            # Vencido, pero expire_lotes aún no actualizó el estado guardado.
+            return LoteEstado.VENCIDO
+        return self.estado
+
+    def calcular_estado(self, consumido: bool):
+        if consumido:
+            return LoteEstado.CONSUMIDO
         elif self.retirado:
-            return 2 #"Retirado"
+            return LoteEstado.RETIRADO
         elif self.is_expired():
-            return 3 #"Vencido"
-        return 0 #"Activo"
+            return LoteEstado.VENCIDO
+        return LoteEstado.ACTIVO
 
     @property
     def get_servicios_Realizados(self):
-        from services.models import ServicioRealizadoProducto
-        return ServicioRealizadoProducto.objects.active().filter(lote=self).aggregate(Sum('cantidad', default=0))["cantidad__sum"] or 0
+        return self.servicios_realizados
     
     @property
     def get_servicios_restantes(self):
         return self.producto.usos_est * self.cant - self.get_servicios_Realizados
+
+
+class ProductoStock(models.Model):
+    """
+    Modelo que guarda una fotografía del stock disponible de un producto.
+    Se recalcula con ProductoStock.objects.recalcular cada vez que se escribe un lote o un consumo
+    del producto, por lo que los filtros de stock se resuelven sin subconsultas.
+    Atributos:
+    - producto: Producto al que pertenece la fotografía.
+    - existencias: Cantidad de productos en lotes activos que aún tienen usos.
+    - usos_restantes: Usos restantes sumando todos los lotes activos.
+    - posee_existencias: Indica si el producto tiene al menos un lote activo con usos.
+    - lote_fefo: Siguiente lote a consumir (el primero en expirar que tenga usos).
+    - fe_exp_proxima: Fecha de expiración del lote_fefo.
+    - actualizado: Fecha y hora del último recálculo.
+    """
+
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name="stock")
+    existencias = models.PositiveIntegerField(default=0, db_index=True)
+    usos_restantes = models.IntegerField(default=0)
+    posee_existencias = models.BooleanField(default=False, db_index=True)
+    lote_fefo = models.ForeignKey(Lote, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    fe_exp_proxima = models.DateTimeField(null=True, blank=True, db_index=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    objects = ProductoStockManager()
+
+    def __str__(self):
+        return f"Stock de {self.producto_id}: {self.existencias}"
+
+
+class LoteCompraDiaria(models.Model):
+    """
+    Modelo que acumula por día el costo de los lotes activos comprados.
+    Cada escritura de un lote suma su diferencia con LoteCompraDiaria.objects.sumar, por lo
+    que las estadísticas de valor del inventario leen una fila por día en lugar de recorrer
+    la tabla de lotes.
+    Atributos:
+    - fecha: Día de compra (SIN_FECHA para los lotes sin fecha de compra).
+    - costo: Suma del costo de los lotes comprados ese día.
+    - cantidad: Cantidad de lotes comprados ese día.
+    """
+
+    # Clave de los lotes sin fecha de compra. fecha no admite nulos porque la restricción
+    # única no impide dos filas con NULL, y dos escrituras concurrentes podrían crear ambas.
+    # Es el primer día del rango de DATE en MySQL y queda fuera de cualquier periodo.
+    SIN_FECHA = datetime.date(1000, 1, 1)
+
+    fecha = models.DateField(unique=True)
+    costo = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    cantidad = models.PositiveIntegerField(default=0)
+
+    objects = LoteCompraDiariaManager()
+
+    def __str__(self):
+        return f"Compras del {self.fecha}: {self.costo}"
@@ -0,0 +1,143 @@
+import datetime
+
+import numpy as np
+from django.db.models import F
+from django.utils import timezone
+
+from core import periodos
+from .models import Lote, Producto
+
+METODOS = ("ewma", "media")
+
+
+def _dias_hasta(fechas, ahora) -> np.ndarray:
+    """
+    Retorna los días (fraccionarios) desde ahora hasta cada fecha; las fechas nulas son infinito.
+    """
+    marcas = np.fromiter((fecha.timestamp() if fecha else np.inf for fecha in fechas), dtype=np.float64)
+    return (marcas - ahora.timestamp()) / 86400
+
+
+def _indices(ids: np.ndarray, valores) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Retorna la posición de cada valor en ids (ordenado, no vacío) y la máscara de los que existen.
+    """
+    valores = np.asarray(valores, dtype=np.int64)
+    posiciones = np.clip(np.searchsorted(ids, valores), 0, len(ids) - 1)
+    return posiciones, ids[posiciones] == valores
+
+
+def pronosticar_stock(dias_historial: int = 90, metodo: str = "ewma", alpha: float = 0.3):
+    """
+    Estima para cada producto activo su consumo diario, los días que faltan para
+    agotar sus usos restantes y los días hasta que un lote venza con usos sin consumir.
+    - El historial se lee en una sola consulta del acumulado diario de usos (ProductoUsoDiario)
+      y se arma una matriz productos × días.
+    - metodo "media" promedia la ventana; "ewma" aplica suavizado exponencial con pesos
+      normalizados (los días recientes pesan más).
+    - Los lotes se consumen en orden FEFO al ritmo estimado: los usos que no alcanzan a
+      consumirse antes de la expiración de su lote se reportan como usos en riesgo.
+    Todos los cálculos son vectoriales sobre los arreglos de NumPy.
+    """
+    from services.models import ProductoUsoDiario
+
+    ahora = timezone.now()
+    hoy = periodos.hoy()
+    inicio = hoy - datetime.timedelta(days=dias_historial)
+
+    productos = list(Producto.objects.active().order_by("id").values_list("id", "nombre"))
+    if not productos:
+        return []
+    ids = np.fromiter((producto_id for producto_id, _ in productos), dtype=np.int64)
+
+    # Historial: matriz productos × días.
+    matriz = np.zeros((len(ids), dias_historial), dtype=np.float64)
+    historial = list(
+        ProductoUsoDiario.objects.filter(fecha__gte=inicio, fecha__lt=hoy).values_list(
+            "producto_id", "fecha", "usos"
+        )
+    )
+    if historial:
+        producto_ids, fechas, usos = zip(*historial)
+        filas, existe = _indices(ids, producto_ids)
+        columnas = (np.array(fechas, dtype="datetime64[D]") - np.datetime64(inicio, "D")).astype(np.int64)
+        np.add.at(matriz, (filas[existe], columnas[existe]), np.array(usos, dtype=np.float64)[existe])
+
+    if metodo == "media":
+        consumo = matriz.mean(axis=1)
+    else:
+        pesos = alpha * (1 - alpha) ** np.arange(dias_historial - 1, -1, -1, dtype=np.float64)
+        consumo = matriz @ (pesos / pesos.sum())
+
+    # Lotes disponibles en orden FEFO por producto.
+    lotes = list(
+        Lote.objects.disponibles()
+        .with_servicios_restantes()
+        .filter(servicios_restantes__gt=0)
+        .order_by("producto_id", F("fe_exp").asc(nulls_last=True), "id")
+        .values_list("producto_id", "fe_exp", "servicios_restantes")
+    )
+    restantes = np.zeros(len(ids), dtype=np.float64)
+    usos_en_riesgo = np.zeros(len(ids), dtype=np.float64)
+    dias_desperdicio = np.full(len(ids), np.inf)
+
+    if lotes:
+        lote_producto_ids, fe_exps, lote_restantes = zip(*lotes)
+        posiciones, existe = _indices(ids, lote_producto_ids)
+        posiciones = posiciones[existe]
+        dias_exp = _dias_hasta(fe_exps, ahora)[existe]
+        lote_restantes = np.array(lote_restantes, dtype=np.float64)[existe]
+
+        np.add.at(restantes, posiciones, lote_restantes)
+
+        # Todo se mide en usos consumidos desde ahora (días × consumo diario). Cada lote se
+        # empieza a consumir cuando el anterior termina: al agotarse o al vencer, lo que
+        # ocurra primero; los usos que vencen sin consumirse no retrasan a los siguientes.
+        # Con A los usos acumulados del producto y E el consumo hasta el vencimiento, el fin
+        # del lote i es A_i + D_i, donde D_i = min(0, E_j - A_j para j <= i) es un mínimo
+        # acumulado por producto.
+        acumulado = np.cumsum(lote_restantes)
+        inicio_grupo = np.r_[True, posiciones[1:] != posiciones[:-1]][: len(posiciones)]
+        grupo = np.cumsum(inicio_grupo) - 1
+        acumulado_producto = acumulado - (acumulado - lote_restantes)[inicio_grupo][grupo]
+
+        vence = np.isfinite(dias_exp)
+        consumido_al_vencer = np.where(
+            vence, consumo[posiciones] * np.maximum(np.where(vence, dias_exp, 0), 0), np.inf
+        )
+        holgura = np.minimum(consumido_al_vencer - acumulado_producto, 0)
+        # Desplazar cada producto por debajo del anterior hace que el mínimo acumulado
+        # no cruce de un producto a otro.
+        desplazamiento = grupo * (acumulado_producto.max() + 1)
+        minimo = np.minimum.accumulate(holgura - desplazamiento) + desplazamiento
+        minimo_anterior = np.where(inicio_grupo, 0, np.r_[0, minimo[:-1]])
+        inicio_lote = minimo_anterior + acumulado_producto - lote_restantes
+
+        sobrante = np.where(
+            vence,
+            np.clip(lote_restantes - (consumido_al_vencer - inicio_lote), 0, lote_restantes),
+            0,
+        )
+
+        np.add.at(usos_en_riesgo, posiciones, sobrante)
+        en_riesgo = sobrante > 0
+        np.minimum.at(dias_desperdicio, posiciones[en_riesgo], np.maximum(dias_exp[en_riesgo], 0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dias_agotar = np.where(consumo > 0, restantes / consumo, np.inf)
+
+    orden = np.lexsort((ids, dias_agotar))
+    return [
+        {
+            "id": productos[i][0],
+            "nombre": productos[i][1],
+            "usos_restantes": int(restantes[i]),
+            "consumo_diario": round(float(consumo[i]), 2),
+            "dias_para_agotar": round(float(dias_agotar[i]), 1) if np.isfinite(dias_agotar[i]) else None,
+            "dias_para_desperdicio": (
+                round(float(dias_desperdicio[i]), 1) if np.isfinite(dias_desperdicio[i]) else None
+            ),
+            "usos_en_riesgo": int(round(usos_en_riesgo[i])),
+        }
+        for i in orden
+    ]
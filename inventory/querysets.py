@@ -1,7 +1,12 @@
+import datetime
+
 from django.utils import timezone
 from django.db import models
-from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.db.models import (
+    Count,
+    FloatField,
     OuterRef,
     Subquery,
     Sum,
@@ -10,77 +15,178 @@ from django.db.models import (
     ExpressionWrapper,
     Case,
     When,
-    Exists,
-    BooleanField
+    BooleanField,
+    Value,
+    Q,
 )
 
+from core.concurrency import ConflictoConcurrencia
+from core.stats_cache import invalidar
 from core.models import AuditQuerySet
 
 
 class LoteQuerySet(AuditQuerySet):
     def with_servicios_restantes(self):
-        from services.models import ServicioRealizadoProducto
-
-        servicios_realizados_subquery = (
-            ServicioRealizadoProducto.objects.active()
-            .filter(lote=OuterRef("pk"))
-            .values("lote")
-            .annotate(total=Sum("cantidad", default=0))
-            .values("total")
-        )
-
         return self.annotate(
-            servicios_realizados=Coalesce(
-                Subquery(
-                    servicios_realizados_subquery,
-                    output_field=IntegerField(),
-                ),
-                0,
-            ),
             servicios_restantes=ExpressionWrapper(
                 F("producto__usos_est") * F("cant") - F("servicios_realizados"),
                 output_field=IntegerField(),
             ),
         )
 
+    def horizonte_expiracion(self, horizontes: tuple[int, ...] = (7, 30, 60, 90)):
+        """
+        Agrupa por tipo de producto los lotes disponibles que vencen dentro del mayor
+        horizonte (días, ascendentes) y calcula para cada tramo (hasta 7 días, de 7 a 30...)
+        la cantidad de lotes, los usos restantes y el costo en riesgo (la parte del costo
+        proporcional a los usos sin consumir). Es una sola consulta agregada por rango de fe_exp.
+        Columnas: tipo_id, tipo, lotes_<dias>, usos_<dias> y costo_<dias> por horizonte.
+        """
+        ahora = timezone.now()
+        limites = [ahora + datetime.timedelta(days=dias) for dias in horizontes]
 
-class ProductoQuerySet(AuditQuerySet):
-    def with_posee_existencias(self):
-        from .models import Lote
+        usos_totales = F("producto__usos_est") * F("cant")
+        costo_en_riesgo = Coalesce(
+            F("costo") * F("servicios_restantes") / Cast(NullIf(usos_totales, 0), FloatField()),
+            Cast("costo", FloatField()),
+            output_field=FloatField(),
+        )
 
-        posee_existencias_subquery = (
-            Lote.objects.active()
+        agregados = {}
+        desde = ahora
+        for dias, hasta in zip(horizontes, limites):
+            tramo = Q(fe_exp__gt=desde, fe_exp__lte=hasta)
+            agregados[f"lotes_{dias}"] = Count("id", filter=tramo)
+            agregados[f"usos_{dias}"] = Sum("servicios_restantes", filter=tramo, default=0)
+            agregados[f"costo_{dias}"] = Sum(costo_en_riesgo, filter=tramo, default=0.0)
+            desde = hasta
+
+        return (
+            self.disponibles()
+            .filter(fe_exp__gt=ahora, fe_exp__lte=limites[-1])
             .with_servicios_restantes()
-            .filter(
-                producto=OuterRef("pk"),
-                retirado=False,
-                fe_exp__gt=timezone.now(),
-                servicios_restantes__gt=0,
+            .values(tipo_id=F("producto__tipo_id"), tipo=F("producto__tipo__nombre"))
+            .annotate(**agregados)
+            .order_by("tipo")
+        )
+
+    def registrar_consumo(self, cambios: dict[int, int], esperados: dict[int, int] = None):
+        """
+        Aplica en una sola sentencia los cambios de consumo ({lote_id: usos}) sobre
+        el contador servicios_realizados de cada lote.
+        Si se indican los contadores esperados ({lote_id: servicios_realizados leído}),
+        la escritura solo se aplica si ningún lote cambió desde la lectura; en caso
+        contrario se lanza ConflictoConcurrencia (control optimista).
+        """
+        cambios = {lote_id: usos for lote_id, usos in cambios.items() if usos}
+        if not cambios:
+            return 0
+
+        lotes = self.filter(pk__in=cambios.keys())
+        if esperados is not None:
+            version = Q()
+            for lote_id in cambios:
+                version |= Q(pk=lote_id, servicios_realizados=esperados[lote_id])
+            lotes = lotes.filter(version)
+
+        actualizados = lotes.update(
+            servicios_realizados=F("servicios_realizados")
+            + Case(
+                *[When(pk=lote_id, then=Value(usos)) for lote_id, usos in cambios.items()],
+                default=Value(0),
+                output_field=IntegerField(),
             )
-            .values("producto")
         )
+        if esperados is not None and actualizados != len(cambios):
+            raise ConflictoConcurrencia("Los lotes fueron modificados por otra transacción")
 
-        return self.annotate(
-            posee_existencias=Case(
-                When(Exists(posee_existencias_subquery), then=True),
-                default=False,
-                output_field=BooleanField(),
+        self.filter(pk__in=cambios.keys()).actualizar_estado()
+        return actualizados
+
+    def actualizar_estado(self):
+        """
+        Recalcula en la base de datos el estado guardado de los lotes con las
+        mismas reglas que Lote.calcular_estado.
+        """
+        from .models import LoteEstado, Producto
+
+        usos_totales = ExpressionWrapper(
+            Subquery(
+                Producto.objects.filter(pk=OuterRef("producto_id")).values("usos_est")[:1]
             )
+            * F("cant"),
+            output_field=IntegerField(),
         )
 
-    def with_existencias(self):
-        from .models import Lote
+        invalidar("inventory.lote")
+        return self.update(
+            estado=Case(
+                When(
+                    GreaterThanOrEqual(F("servicios_realizados"), usos_totales),
+                    then=Value(LoteEstado.CONSUMIDO),
+                ),
+                When(retirado=True, then=Value(LoteEstado.RETIRADO)),
+                When(fe_exp__lte=timezone.now(), then=Value(LoteEstado.VENCIDO)),
+                default=Value(LoteEstado.ACTIVO),
+            )
+        )
 
-        existencias_subquery = (
-            Lote.objects.active()
-            .filter(producto=OuterRef("pk"), retirado=False, fe_exp__gt=timezone.now())
-            .values("producto")
-            .annotate(total=Sum("cant", default=0))
+    def con_estado(self, estados):
+        """
+        Lotes en alguno de los estados (LoteEstado). Los lotes activos cuya fe_exp ya pasó
+        (los que expire_lotes no ha barrido todavía) cuentan como vencidos. Solo se compara
+        estado y fe_exp, que están indexados.
+        """
+        from .models import LoteEstado
+
+        ahora = timezone.now()
+        condicion = Q(estado__in=[estado for estado in estados if estado != LoteEstado.ACTIVO])
+        if LoteEstado.ACTIVO in estados:
+            condicion |= Q(estado=LoteEstado.ACTIVO) & (
+                Q(fe_exp__isnull=True) | Q(fe_exp__gt=ahora)
+            )
+        if LoteEstado.VENCIDO in estados:
+            condicion |= Q(estado=LoteEstado.ACTIVO, fe_exp__lte=ahora)
+        return self.filter(condicion)
+
+    def disponibles(self):
+        """
+        Lotes que pueden consumirse: estado activo y aún sin vencer (los lotes
+        vencidos que expire_lotes no ha barrido todavía se excluyen).
+        """
+        from .models import LoteEstado
+
+        return self.active().filter(estado=LoteEstado.ACTIVO).exclude(
+            fe_exp__lte=timezone.now()
+        )
+
+    def with_consumo_real(self):
+        from services.models import ServicioRealizadoProducto
+
+        consumo_subquery = (
+            ServicioRealizadoProducto.objects.active()
+            .filter(lote=OuterRef("pk"))
+            .values("lote")
+            .annotate(total=Sum("cantidad", default=0))
             .values("total")
         )
 
         return self.annotate(
-            existencias=Coalesce(
-                Subquery(existencias_subquery, output_field=IntegerField()), 0
+            consumo_real=Coalesce(
+                Subquery(consumo_subquery, output_field=IntegerField()), 0
+            )
+        )
+
+
+class ProductoQuerySet(AuditQuerySet):
+    def with_posee_existencias(self):
+        return self.annotate(
+            posee_existencias=Coalesce(
+                F("stock__posee_existencias"), Value(False), output_field=BooleanField()
             )
         )
+
+    def with_existencias(self):
+        return self.annotate(
+            existencias=Coalesce(F("stock__existencias"), 0, output_field=IntegerField())
+        )
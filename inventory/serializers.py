@@ -1,7 +1,8 @@
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 
 from core.mixin import ExcludeAbstractFieldsMixin
-from .models import Producto, ProductoImg, ProductoMarca, ProductoTipo, Lote
+from .models import Producto, ProductoImg, ProductoMarca, ProductoTipo, Lote, LoteEstado
 
 
 class ProductoImgSerializer(ExcludeAbstractFieldsMixin, serializers.ModelSerializer):
@@ -101,7 +102,32 @@ class ProductoWithExistenciasSerializer(ExcludeAbstractFieldsMixin, serializers.
     def get_existencias(self, obj):
         return obj.existencias
 
-class ProductoAllSerializer(ExcludeAbstractFieldsMixin, serializers.ModelSerializer):
+class ProductoStockListSerializer(serializers.ListSerializer):
+    """
+    Lee el stock de todos los productos de la lista con una sola consulta
+    (Producto.objects.stock_for) antes de serializarlos.
+    """
+
+    def to_representation(self, data):
+        productos = list(data.all() if isinstance(data, BaseManager) else data)
+        self.stock = Producto.objects.stock_for([producto.pk for producto in productos])
+        return super().to_representation(productos)
+
+
+class ProductoStockMixin:
+    def get_stock(self, obj):
+        stock = getattr(self.parent, "stock", None)
+        if stock is None or obj.pk not in stock:
+            # Serialización individual: se calcula una vez por instancia.
+            stock = getattr(self, "_stock", None)
+            if stock is None or obj.pk not in stock:
+                stock = self._stock = Producto.objects.stock_for([obj.pk])
+        return stock[obj.pk]
+
+
+class ProductoAllSerializer(
+    ProductoStockMixin, ExcludeAbstractFieldsMixin, serializers.ModelSerializer
+):
     tipo = ProductoTipoSerializer()
     marca = ProductoMarcaSerializer()
     posee_existencias = serializers.SerializerMethodField()
@@ -124,15 +150,16 @@ class ProductoAllSerializer(ExcludeAbstractFieldsMixin, serializers.ModelSeriali
             "existencias",
             "usos_restantes",
         ]
+        list_serializer_class = ProductoStockListSerializer
 
     def get_posee_existencias(self, obj):
-        return obj.get_posee_existencias
+        return self.get_stock(obj)["posee_existencias"]
     
     def get_existencias(self, obj):
-        return obj.get_existencias
+        return self.get_stock(obj)["existencias"]
     
     def get_usos_restantes(self, obj):
-        return obj.get_usos_restantes
+        return self.get_stock(obj)["usos_restantes"]
 
 class ProductoSelectorSerializer(
     ExcludeAbstractFieldsMixin, serializers.ModelSerializer
@@ -142,27 +169,29 @@ class ProductoSelectorSerializer(
         fields = ["id", "nombre", "sku"]
         
 class ProductoOfServicioSerializer(
-    ExcludeAbstractFieldsMixin, serializers.ModelSerializer
+    ProductoStockMixin, ExcludeAbstractFieldsMixin, serializers.ModelSerializer
 ):
     existencias = serializers.SerializerMethodField()
     class Meta:
         model = Producto
         fields = ["id", "nombre", "sku", "existencias"]
+        list_serializer_class = ProductoStockListSerializer
 
     def get_existencias(self, obj):
-        return obj.get_existencias
+        return self.get_stock(obj)["existencias"]
 
 class ProductosServicioGridSerializer(
-    ExcludeAbstractFieldsMixin, serializers.ModelSerializer
+    ProductoStockMixin, ExcludeAbstractFieldsMixin, serializers.ModelSerializer
 ):
     usos_restantes = serializers.SerializerMethodField()
     
     class Meta:
         model = Producto
         fields = ["id", "nombre", "sku", "usos_restantes"]
+        list_serializer_class = ProductoStockListSerializer
         
     def get_usos_restantes(self, obj):
-        return obj.get_usos_restantes
+        return self.get_stock(obj)["usos_restantes"]
 
 class LoteAllSerializer(ExcludeAbstractFieldsMixin, serializers.ModelSerializer):
     producto = ProductoSelectorSerializer()
@@ -183,9 +212,9 @@ class LoteAllSerializer(ExcludeAbstractFieldsMixin, serializers.ModelSerializer)
             "retirado",
             "state",
         ]
-        
+
     def get_consumido(self, obj):
-        return obj.get_consumido
+        return obj.estado == LoteEstado.CONSUMIDO
 
     def get_state(self, obj):
         return obj.get_state
@@ -230,4 +259,8 @@ class ProductosMasUsadosSerializer(serializers.Serializer):
     id = serializers.IntegerField(source='producto__id')
     nombre = serializers.CharField(source='producto__nombre')
     sku = serializers.CharField(source='producto__sku')
-    usos = serializers.IntegerField()
\ No newline at end of file
+    usos = serializers.IntegerField()
+
+
+class ProductosMasUsadosPorPeriodoSerializer(ProductosMasUsadosSerializer):
+    period = serializers.DateField()
@@ -1,12 +1,89 @@
 import os
-from django.dispatch import receiver
-from django.db.models.signals import post_delete
+from django.db.models import QuerySet
+from django.dispatch import Signal
 
-from .models import ProductoImg
+from .models import Lote, LoteCompraDiaria, Producto, ProductoStock
+
+# Se envía con producto_ids cuando cambia si esos productos poseen existencias.
+existencias_cambiadas = Signal()
 
 
-@receiver(post_delete, sender=ProductoImg)
 def eliminar_imagen(sender, instance, **kwargs):
     if instance.imagen and instance.imagen.name:
         if os.path.isfile(instance.imagen.path):
             os.remove(instance.imagen.path)
+
+
+def eliminando_productos(origin) -> bool:
+    """
+    Indica si la eliminación en curso proviene de productos, en cuyo caso su
+    fotografía de stock se elimina junto con ellos y no debe recalcularse.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is Producto
+    return isinstance(origin, Producto)
+
+
+def lote_guardar_producto_anterior(sender, instance, **kwargs):
+    """
+    Guarda el producto y los datos de compra previos del lote para recalcular
+    el stock y las compras diarias de ambos lados del cambio.
+    """
+    instance._producto_anterior = None
+    instance._compra_anterior = None
+    if instance.pk is not None and not instance._state.adding:
+        anterior = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("producto_id", "fe_compra", "costo", "deleted_at")
+            .first()
+        )
+        if anterior is not None:
+            instance._producto_anterior = anterior[0]
+            instance._compra_anterior = anterior[1:]
+
+
+def producto_update_stock_on_lote_save(sender, instance, **kwargs):
+    ProductoStock.objects.recalcular(
+        [instance.producto_id, getattr(instance, "_producto_anterior", None)]
+    )
+
+
+def _sumar_compra(diferencias, fe_compra, costo, signo: int):
+    actual = diferencias.setdefault(
+        LoteCompraDiaria.objects.clave(fe_compra), {"cantidad": 0, "costo": 0}
+    )
+    actual["cantidad"] += signo
+    actual["costo"] += signo * (costo or 0)
+
+
+def lote_compra_diaria_on_lote_save(sender, instance, created, **kwargs):
+    anterior = getattr(instance, "_compra_anterior", None)
+    if not created and anterior == (instance.fe_compra, instance.costo, instance.deleted_at):
+        return
+
+    diferencias = {}
+    if anterior is not None and anterior[2] is None:
+        _sumar_compra(diferencias, anterior[0], anterior[1], -1)
+    if instance.deleted_at is None:
+        _sumar_compra(diferencias, instance.fe_compra, instance.costo, 1)
+    LoteCompraDiaria.objects.sumar(diferencias)
+
+
+def lote_compra_diaria_on_lote_delete(sender, instance, **kwargs):
+    if instance.deleted_at is None:
+        diferencias = {}
+        _sumar_compra(diferencias, instance.fe_compra, instance.costo, -1)
+        LoteCompraDiaria.objects.sumar(diferencias)
+
+
+def producto_update_stock_on_lote_delete(sender, instance, origin=None, **kwargs):
+    if eliminando_productos(origin):
+        return
+    ProductoStock.objects.recalcular([instance.producto_id])
+
+
+def producto_update_stock_on_producto_save(sender, instance, created, **kwargs):
+    if not created:
+        # Cambiar usos_est puede consumir o reactivar lotes del producto.
+        Lote.objects.filter(producto=instance).actualizar_estado()
+    ProductoStock.objects.recalcular([instance.pk])
@@ -1,6 +1,17 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
 from django.test import TestCase
 from django.utils import timezone
-from inventory.models import Producto, Lote, ProductoTipo, ProductoMarca
+from inventory.models import (
+    Producto,
+    Lote,
+    LoteCompraDiaria,
+    LoteEstado,
+    ProductoTipo,
+    ProductoMarca,
+    ProductoStock,
+)
 
 class ProductoUpdatePoseeExistenciasTests(TestCase):
     def setUp(self):
@@ -39,4 +50,479 @@ class ProductoUpdatePoseeExistenciasTests(TestCase):
         
         lote.delete()
         self.producto.refresh_from_db()
-        self.assertFalse(self.producto.get_posee_existencias)
\ No newline at end of file
+        self.assertFalse(self.producto.get_posee_existencias)
+
+class LoteServiciosRealizadosTests(TestCase):
+    def setUp(self):
+        from customers.models import Cliente
+        from services.models import Servicio, ServicioRealizado
+
+        self.producto = Producto.objects.create(nombre="Test Producto", usos_est=5)
+        self.lote = Lote.objects.create(
+            producto=self.producto,
+            cant=2,
+            fe_exp=timezone.now() + timezone.timedelta(days=10),
+        )
+        self.servicio_realizado = ServicioRealizado.objects.create(
+            cliente=Cliente.objects.create(nombre="John", apellido="Doe"),
+            servicio=Servicio.objects.create(nombre="Service 1"),
+        )
+
+    def crear_consumo(self, cantidad):
+        from services.models import ServicioRealizadoProducto
+
+        return ServicioRealizadoProducto.objects.create(
+            servicio_realizado=self.servicio_realizado,
+            producto=self.producto,
+            lote=self.lote,
+            cantidad=cantidad,
+        )
+
+    def test_creating_consumo_updates_counter(self):
+        self.crear_consumo(3)
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.servicios_realizados, 3)
+        self.assertEqual(self.lote.get_servicios_restantes, 7)
+
+    def test_soft_and_hard_delete_update_counter(self):
+        consumo = self.crear_consumo(3)
+        self.crear_consumo(2)
+
+        consumo.delete()
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.servicios_realizados, 2)
+
+        self.servicio_realizado.productos_utilizados.all().delete()
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.servicios_realizados, 0)
+
+    def test_reconcile_lote_counters_fixes_drift(self):
+        from django.core.management import call_command
+
+        self.crear_consumo(4)
+        Lote.objects.filter(pk=self.lote.pk).update(servicios_realizados=9)
+
+        call_command("reconcile_lote_counters", stdout=StringIO())
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.servicios_realizados, 4)
+        self.assertEqual(
+            Lote.objects.with_servicios_restantes().get(pk=self.lote.pk).servicios_restantes, 6
+        )
+
+
+class ProductoStockTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Test Producto", usos_est=4)
+
+    def test_lote_writes_update_snapshot(self):
+        lejano = Lote.objects.create(
+            producto=self.producto, cant=2, fe_exp=timezone.now() + timezone.timedelta(days=30)
+        )
+        cercano = Lote.objects.create(
+            producto=self.producto, cant=1, fe_exp=timezone.now() + timezone.timedelta(days=5)
+        )
+
+        stock = ProductoStock.objects.get(producto=self.producto)
+        self.assertTrue(stock.posee_existencias)
+        self.assertEqual(stock.existencias, 3)
+        self.assertEqual(stock.usos_restantes, 12)
+        self.assertEqual(stock.lote_fefo_id, cercano.id)
+
+        cercano.delete()
+        stock.refresh_from_db()
+        self.assertEqual(stock.existencias, 2)
+        self.assertEqual(stock.lote_fefo_id, lejano.id)
+
+    def test_status_filter_reads_snapshot(self):
+        Lote.objects.create(
+            producto=self.producto, cant=1, fe_exp=timezone.now() + timezone.timedelta(days=5)
+        )
+        sin_stock = Producto.objects.create(nombre="Sin stock", usos_est=4)
+
+        con_existencias = Producto.objects.filter(stock__posee_existencias=True)
+        self.assertQuerySetEqual(con_existencias, [self.producto])
+        self.assertFalse(
+            Producto.objects.with_posee_existencias().get(pk=sin_stock.pk).posee_existencias
+        )
+
+    def test_rebuild_vencidos_refreshes_expired_products(self):
+        lote = Lote.objects.create(
+            producto=self.producto, cant=1, fe_exp=timezone.now() + timezone.timedelta(days=5)
+        )
+        ayer = timezone.now() - timezone.timedelta(days=1)
+        Lote.objects.filter(pk=lote.pk).update(fe_exp=ayer)
+        ProductoStock.objects.filter(producto=self.producto).update(fe_exp_proxima=ayer)
+
+        from django.core.management import call_command
+
+        call_command("rebuild_producto_stock", vencidos=True, stdout=StringIO())
+        self.assertFalse(ProductoStock.objects.get(producto=self.producto).posee_existencias)
+
+    def test_upsert_omits_unique_fields_without_conflict_target(self):
+        from unittest import mock
+        from django.db import connection
+
+        with mock.patch.object(ProductoStock.objects, "bulk_create") as bulk_create:
+            ProductoStock.objects.recalcular([self.producto.id])
+        self.assertEqual(bulk_create.call_args.kwargs["unique_fields"], ["producto"])
+
+        # Como en MySQL: ON DUPLICATE KEY UPDATE sin columnas de conflicto.
+        with mock.patch.object(
+            connection.features, "supports_update_conflicts_with_target", False
+        ), mock.patch.object(ProductoStock.objects, "bulk_create") as bulk_create:
+            ProductoStock.objects.recalcular([self.producto.id])
+        self.assertNotIn("unique_fields", bulk_create.call_args.kwargs)
+        self.assertTrue(bulk_create.call_args.kwargs["update_conflicts"])
+
+
+class ProductoStockForTests(TestCase):
+    def test_stock_for_groups_active_lotes(self):
+        con_stock = Producto.objects.create(nombre="Con stock", usos_est=3)
+        sin_stock = Producto.objects.create(nombre="Sin stock", usos_est=3)
+        for cant in (1, 2):
+            Lote.objects.create(
+                producto=con_stock, cant=cant, fe_exp=timezone.now() + timezone.timedelta(days=5)
+            )
+
+        stock = Producto.objects.stock_for([con_stock.id, sin_stock.id])
+
+        self.assertEqual(
+            stock[con_stock.id], {"existencias": 3, "usos_restantes": 9, "posee_existencias": True}
+        )
+        self.assertFalse(stock[sin_stock.id]["posee_existencias"])
+
+        # Se lee la fotografía de stock; sin ella el producto no tiene stock.
+        ProductoStock.objects.filter(producto=con_stock).delete()
+        stock = Producto.objects.stock_for([con_stock.id])
+        self.assertEqual(
+            stock[con_stock.id], {"existencias": 0, "usos_restantes": 0, "posee_existencias": False}
+        )
+
+    def test_many_serializer_uses_one_stock_query(self):
+        from inventory.serializers import ProductoOfServicioSerializer
+
+        for i in range(5):
+            producto = Producto.objects.create(nombre=f"P{i}", usos_est=1)
+            Lote.objects.create(
+                producto=producto, cant=2, fe_exp=timezone.now() + timezone.timedelta(days=5)
+            )
+        productos = list(Producto.objects.all())
+
+        with self.assertNumQueries(1):
+            data = ProductoOfServicioSerializer(productos, many=True).data
+        self.assertEqual([item["existencias"] for item in data], [2] * 5)
+
+
+class LoteAllSerializerTests(TestCase):
+    def test_grid_queryset_serializes_without_extra_queries(self):
+        from inventory.serializers import LoteAllSerializer
+
+        producto = Producto.objects.create(nombre="Test Producto", usos_est=1)
+        for _ in range(20):
+            Lote.objects.create(
+                producto=producto, cant=1, fe_exp=timezone.now() + timezone.timedelta(days=5)
+            )
+        Lote.objects.registrar_consumo({Lote.objects.first().pk: 1})
+
+        queryset = Lote.objects.active().select_related("producto").with_servicios_restantes()
+        with self.assertNumQueries(1):
+            data = LoteAllSerializer(queryset, many=True).data
+
+        self.assertEqual(sorted(item["state"] for item in data), [0] * 19 + [1])
+
+
+class LoteEstadoTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Test Producto", usos_est=2)
+        self.lote = Lote.objects.create(
+            producto=self.producto, cant=1, fe_exp=timezone.now() + timezone.timedelta(days=5)
+        )
+
+    def test_consumption_and_retire_update_estado(self):
+        self.assertEqual(self.lote.estado, LoteEstado.ACTIVO)
+
+        Lote.objects.registrar_consumo({self.lote.pk: 2})
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.estado, LoteEstado.CONSUMIDO)
+
+        Lote.objects.registrar_consumo({self.lote.pk: -1})
+        self.lote.retirado = True
+        self.lote.save()
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.estado, LoteEstado.RETIRADO)
+        self.assertEqual(self.lote.servicios_realizados, 1)
+
+    def test_save_with_update_fields_persists_estado(self):
+        self.lote.retirado = True
+        self.lote.save(update_fields=["retirado"])
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.estado, LoteEstado.RETIRADO)
+
+    def test_expired_lote_reads_as_vencido_before_expire_lotes(self):
+        from inventory.serializers import LoteAllSerializer
+
+        Lote.objects.filter(pk=self.lote.pk).update(
+            fe_exp=timezone.now() - timezone.timedelta(days=1)
+        )
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.estado, LoteEstado.ACTIVO)
+
+        self.assertFalse(Lote.objects.con_estado([LoteEstado.ACTIVO]).exists())
+        self.assertQuerySetEqual(Lote.objects.con_estado([LoteEstado.VENCIDO]), [self.lote])
+        self.assertEqual(LoteAllSerializer(self.lote).data["state"], LoteEstado.VENCIDO)
+
+    def test_expire_lotes_marks_expired_and_refreshes_stock(self):
+        from django.core.management import call_command
+
+        Lote.objects.filter(pk=self.lote.pk).update(
+            fe_exp=timezone.now() - timezone.timedelta(days=1)
+        )
+        call_command("expire_lotes", stdout=StringIO())
+
+        self.lote.refresh_from_db()
+        self.assertEqual(self.lote.estado, LoteEstado.VENCIDO)
+        self.assertFalse(ProductoStock.objects.get(producto=self.producto).posee_existencias)
+
+
+class LoteCompraDiariaTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Test Producto", precio=Decimal("50.00"))
+
+    def compras(self):
+        return dict(LoteCompraDiaria.objects.values_list("fecha", "costo"))
+
+    def crear_lote(self, fecha, costo):
+        return Lote.objects.create(
+            producto=self.producto,
+            costo=Decimal(costo),
+            fe_compra=timezone.make_aware(datetime.datetime.combine(fecha, datetime.time(10))),
+        )
+
+    def test_rollup_follows_lote_writes(self):
+        dia = datetime.date(2024, 3, 4)
+        otro_dia = datetime.date(2024, 3, 5)
+        lote = self.crear_lote(dia, "10.00")
+        self.crear_lote(dia, "5.50")
+        Lote.objects.create(producto=self.producto, costo=Decimal("1.00"))
+
+        self.assertEqual(
+            self.compras(), {dia: Decimal("15.50"), LoteCompraDiaria.SIN_FECHA: Decimal("1.00")}
+        )
+
+        lote.fe_compra = lote.fe_compra + datetime.timedelta(days=1)
+        lote.save()
+        self.assertEqual(
+            self.compras(),
+            {dia: Decimal("5.50"), otro_dia: Decimal("10.00"), LoteCompraDiaria.SIN_FECHA: Decimal("1.00")},
+        )
+
+        lote.delete()
+        self.assertEqual(self.compras(), {dia: Decimal("5.50"), LoteCompraDiaria.SIN_FECHA: Decimal("1.00")})
+
+    def test_lotes_without_purchase_date_share_one_row(self):
+        from unittest import mock
+        from core.models import AcumuladoManager
+
+        sumar = AcumuladoManager._sumar
+        fallos = [0, 0]
+
+        def sin_fila(manager, filtro, valores):
+            # Las dos escrituras no encuentran la fila, como si fueran concurrentes.
+            if fallos:
+                return fallos.pop()
+            return sumar(manager, filtro, valores)
+
+        with mock.patch.object(AcumuladoManager, "_sumar", sin_fila):
+            Lote.objects.create(producto=self.producto, costo=Decimal("1.00"))
+            Lote.objects.create(producto=self.producto, costo=Decimal("2.00"))
+
+        fila = LoteCompraDiaria.objects.get()
+        self.assertEqual(
+            (fila.fecha, fila.costo, fila.cantidad), (LoteCompraDiaria.SIN_FECHA, Decimal("3.00"), 2)
+        )
+
+    def test_writes_apply_deltas_to_the_existing_row(self):
+        dia = datetime.date(2024, 3, 4)
+        lote = self.crear_lote(dia, "10.00")
+        LoteCompraDiaria.objects.update(costo=Decimal("100.00"), cantidad=4)
+
+        lote.costo = Decimal("12.00")
+        lote.save()
+        self.assertEqual(self.compras(), {dia: Decimal("102.00")})
+        self.assertEqual(LoteCompraDiaria.objects.get().cantidad, 4)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        from django.core.management import call_command
+
+        self.crear_lote(datetime.date(2024, 3, 4), "10.00")
+        self.crear_lote(datetime.date(2024, 2, 1), "3.00")
+        esperado = self.compras()
+
+        LoteCompraDiaria.objects.all().delete()
+        call_command("rebuild_lote_compra_diaria", stdout=StringIO())
+
+        self.assertEqual(self.compras(), esperado)
+
+    def test_valor_inventario_previous_month_in_january(self):
+        from inventory.views import periodos_valor_inventario
+
+        self.crear_lote(datetime.date(2023, 12, 20), "7.00")
+        self.crear_lote(datetime.date(2024, 1, 10), "4.00")
+        self.crear_lote(datetime.date(2024, 1, 15), "2.00")
+
+        periodos = periodos_valor_inventario(datetime.date(2024, 1, 15))
+        self.assertEqual(
+            periodos["mensual_anterior"], (datetime.date(2023, 12, 1), datetime.date(2023, 12, 31))
+        )
+
+        with self.assertNumQueries(1):
+            valores = LoteCompraDiaria.objects.totales(periodos)
+
+        self.assertEqual(valores["total"], Decimal("13.00"))
+        self.assertEqual(valores["semanal_actual"], Decimal("2.00"))
+        self.assertEqual(valores["semanal_anterior"], Decimal("4.00"))
+        self.assertEqual(valores["mensual_actual"], Decimal("6.00"))
+        self.assertEqual(valores["mensual_anterior"], Decimal("7.00"))
+        self.assertEqual(valores["anual_anterior"], Decimal("7.00"))
+
+
+class PronosticoStockTests(TestCase):
+    def usos_diarios(self, producto, usos, dias):
+        from services.models import ProductoUsoDiario
+
+        hoy = timezone.localdate()
+        ProductoUsoDiario.objects.bulk_create(
+            ProductoUsoDiario(fecha=hoy - datetime.timedelta(days=dia), producto=producto, usos=usos)
+            for dia in range(1, dias + 1)
+        )
+
+    def test_dias_para_agotar_y_desperdicio(self):
+        from inventory.pronosticos import pronosticar_stock
+
+        producto = Producto.objects.create(nombre="Tinte", precio=Decimal("10.00"), usos_est=10)
+        sin_uso = Producto.objects.create(nombre="Laca", precio=Decimal("5.00"), usos_est=4)
+        Lote.objects.create(
+            producto=producto, cant=1, fe_exp=timezone.now() + datetime.timedelta(days=3)
+        )
+        Lote.objects.create(producto=sin_uso, cant=1)
+        self.usos_diarios(producto, 2, 10)
+
+        for metodo in ("media", "ewma"):
+            with self.assertNumQueries(3):
+                pronostico = pronosticar_stock(dias_historial=10, metodo=metodo)
+            self.assertEqual(
+                pronostico,
+                [
+                    {
+                        "id": producto.id,
+                        "nombre": "Tinte",
+                        "usos_restantes": 10,
+                        "consumo_diario": 2.0,
+                        "dias_para_agotar": 5.0,
+                        "dias_para_desperdicio": 3.0,
+                        "usos_en_riesgo": 4,
+                    },
+                    {
+                        "id": sin_uso.id,
+                        "nombre": "Laca",
+                        "usos_restantes": 4,
+                        "consumo_diario": 0.0,
+                        "dias_para_agotar": None,
+                        "dias_para_desperdicio": None,
+                        "usos_en_riesgo": 0,
+                    },
+                ],
+            )
+
+    def test_usos_vencidos_no_retrasan_el_siguiente_lote(self):
+        from inventory.pronosticos import pronosticar_stock
+
+        producto = Producto.objects.create(nombre="Tinte", precio=Decimal("10.00"), usos_est=10)
+        ahora = timezone.now()
+        Lote.objects.create(producto=producto, cant=1, fe_exp=ahora + datetime.timedelta(days=2))
+        Lote.objects.create(producto=producto, cant=1, fe_exp=ahora + datetime.timedelta(days=15))
+        self.usos_diarios(producto, 1, 10)
+
+        (pronostico,) = pronosticar_stock(dias_historial=10, metodo="media")
+
+        # El primer lote pierde 8 usos; el segundo se empieza al día 2 y se agota al día 12.
+        self.assertEqual(pronostico["usos_restantes"], 20)
+        self.assertEqual(pronostico["usos_en_riesgo"], 8)
+        self.assertEqual(pronostico["dias_para_desperdicio"], 2.0)
+
+    def test_miles_de_productos(self):
+        from inventory.pronosticos import pronosticar_stock
+
+        productos = Producto.objects.bulk_create(
+            Producto(nombre=f"Producto {i}", precio=Decimal("1.00"), usos_est=20) for i in range(3000)
+        )
+        vencimiento = timezone.now() + datetime.timedelta(days=15)
+        Lote.objects.bulk_create(
+            Lote(producto=producto, cant=1, fe_exp=vencimiento) for producto in productos
+        )
+        for producto in productos[::3]:
+            self.usos_diarios(producto, 1, 30)
+
+        # El tiempo se mide con el comando benchmark_pronostico; aquí se acota que la
+        # cantidad de consultas no dependa de la cantidad de productos.
+        with self.assertNumQueries(3):
+            pronostico = pronosticar_stock(dias_historial=30, metodo="media")
+
+        self.assertEqual(len(pronostico), 3000)
+        self.assertEqual(pronostico[0]["dias_para_agotar"], 20.0)
+        self.assertEqual(pronostico[0]["usos_en_riesgo"], 5)
+
+
+class HorizonteExpiracionTests(TestCase):
+    def test_buckets_by_days_and_type_in_one_query(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from inventory.views import StatisticsViewSet
+
+        tintes = ProductoTipo.objects.create(nombre="Tintes")
+        lacas = ProductoTipo.objects.create(nombre="Lacas")
+        tinte = Producto.objects.create(nombre="Tinte", tipo=tintes, precio=Decimal("20.00"), usos_est=10)
+        laca = Producto.objects.create(nombre="Laca", tipo=lacas, precio=Decimal("20.00"), usos_est=4)
+        ahora = timezone.now()
+
+        lote = Lote.objects.create(
+            producto=tinte, costo=Decimal("8.00"), fe_exp=ahora + datetime.timedelta(days=3)
+        )
+        Lote.objects.filter(pk=lote.pk).update(servicios_realizados=5)
+        Lote.objects.create(
+            producto=tinte, costo=Decimal("2.00"), fe_exp=ahora + datetime.timedelta(days=45)
+        )
+        Lote.objects.create(
+            producto=laca, cant=2, costo=Decimal("6.00"), fe_exp=ahora + datetime.timedelta(days=20)
+        )
+        # Fuera del horizonte, retirado o vencido: no se cuentan.
+        Lote.objects.create(producto=laca, fe_exp=ahora + datetime.timedelta(days=120))
+        Lote.objects.create(producto=laca, retirado=True, fe_exp=ahora + datetime.timedelta(days=5))
+        Lote.objects.create(producto=laca, fe_exp=ahora - datetime.timedelta(days=1))
+
+        with self.assertNumQueries(1):
+            filas = list(Lote.objects.horizonte_expiracion((7, 30, 60)))
+        self.assertEqual([fila["tipo"] for fila in filas], ["Lacas", "Tintes"])
+
+        request = APIRequestFactory().get("/", {"horizontes": "7,30,60"})
+        force_authenticate(request, user=User.objects.create(username="admin"))
+        data = StatisticsViewSet.as_view({"get": "horizonte_expiracion"})(request).data
+
+        self.assertEqual(data["horizontes"], [7, 30, 60])
+        self.assertEqual(
+            data["tipos"][1]["tramos"],
+            [
+                {"hasta_dias": 7, "lotes": 1, "usos_restantes": 5, "costo_en_riesgo": 4.0},
+                {"hasta_dias": 30, "lotes": 0, "usos_restantes": 0, "costo_en_riesgo": 0.0},
+                {"hasta_dias": 60, "lotes": 1, "usos_restantes": 10, "costo_en_riesgo": 2.0},
+            ],
+        )
+        self.assertEqual(
+            data["totales"][1],
+            {"hasta_dias": 30, "lotes": 1, "usos_restantes": 8, "costo_en_riesgo": 6.0},
+        )
+
+        request = APIRequestFactory().get("/", {"horizontes": "30,7"})
+        force_authenticate(request, user=User.objects.get(username="admin"))
+        response = StatisticsViewSet.as_view({"get": "horizonte_expiracion"})(request)
+        self.assertEqual(response.status_code, 400)
@@ -1,5 +1,6 @@
 from django.urls import include, path
 from rest_framework import routers
+from . import async_views
 from .views import (
     ProductoView,
     ProductoImgView,
@@ -17,4 +18,23 @@ router.register(r"producto_tipo", ProductoTipoView, "producto_tipo")
 router.register(r"lote", LoteView, "lote")
 router.register(r"stats", StatisticsViewSet, "stats")
 
-urlpatterns = [path("api/v1/", include(router.urls))]
+# Variantes asíncronas (ASGI) de las acciones de StatisticsViewSet.
+ASYNC_STATS = (
+    "total_productos_por_tipo",
+    "productos_por_marca",
+    "valor_inventario",
+    "cantidad_usos_estimados",
+    "productos_mas_utilizados",
+    "lotes_cerca_de_expirar",
+    "horizonte_expiracion",
+    "productos_cerca_de_agotar",
+    "pronostico_agotamiento",
+)
+
+urlpatterns = [
+    path("api/v1/", include(router.urls)),
+    *(
+        path(f"api/v1/async/stats/{nombre}/", getattr(async_views, nombre), name=f"async-{nombre}")
+        for nombre in ASYNC_STATS
+    ),
+]
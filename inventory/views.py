@@ -1,25 +1,40 @@
-import calendar
 import datetime
+import math
+import time
 from decimal import Decimal
 from dateutil import parser
 from django.utils import timezone
 from django.db import transaction
 from django.db.models import (
+    F,
     Sum,
     Count,
-    Q,
     Prefetch,
 )
 from django.db.models.manager import BaseManager
 from rest_framework.request import Request
 from rest_framework import viewsets, status, serializers
 from rest_framework.response import Response
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.decorators import action, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import AllowAny
 
-from .models import Producto, ProductoImg, ProductoMarca, ProductoTipo, Lote
+from core import busqueda, periodos
+from core.condicional import get_condicional
+from core.grids import (
+    Booleano,
+    Contiene,
+    EnLista,
+    FiltrosGrid,
+    GridMixin,
+    Igual,
+    Indexado,
+    RangoFechas,
+)
+from core.dashboard import MAX_WIDGETS, WIDGETS, calcular, registrar_widget
+from core.stats_cache import cache_estadistica
+from .models import Producto, ProductoImg, ProductoMarca, ProductoTipo, Lote, LoteCompraDiaria
+from .pronosticos import METODOS, pronosticar_stock
 from .serializers import (
     AssociateImgWithProductSerializer,
     LoteAllSerializer,
@@ -35,14 +50,21 @@ from .serializers import (
     LoteSerializer,
     ProductoWithExistenciasSerializer,
     ProductosMasUsadosSerializer,
+    ProductosMasUsadosPorPeriodoSerializer,
     SimpleProductoImgSerializer,
 )
 
 
 @permission_classes([AllowAny])
-class ProductoView(viewsets.ModelViewSet):
+class ProductoView(GridMixin, viewsets.ModelViewSet):
     queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
+    grid_filtros = FiltrosGrid(
+        Indexado("nombre"),
+        Indexado("sku"),
+        Booleano("status", "stock__posee_existencias"),
+        Contiene("tipo", "tipo__nombre"),
+    )
 
     @action(methods=["post"], detail=False)
     def get_by_ids(self, request: Request):
@@ -56,16 +78,8 @@ class ProductoView(viewsets.ModelViewSet):
         serializer = self.get_serializer(productos, many=True)
         return Response(serializer.data)
 
-    @action(methods=["get"], detail=False)
-    def grid(self, request: Request):
-        hasOffset = bool(request.query_params.get("offset"))
-
-        p_nombre = request.query_params.get("nombre")
-        p_status = request.query_params.get("status")
-        p_sku = request.query_params.get("sku")
-        p_tipo = request.query_params.get("tipo")
-
-        productos_queryset: BaseManager[Producto] = (
+    def get_grid_queryset(self):
+        return (
             Producto.objects.select_related("tipo", "marca")
             .prefetch_related(
                 Prefetch(
@@ -76,26 +90,18 @@ class ProductoView(viewsets.ModelViewSet):
                     to_attr="covers",
                 )
             )
-            # .only("tipo__nombre", "marca__nombre" "nombre", "sku", "created_at")
             .with_posee_existencias()
             .active()
         )
 
-        if p_nombre:
-            productos_queryset = productos_queryset.filter(nombre__icontains=p_nombre)
-        if p_sku:
-            productos_queryset = productos_queryset.filter(sku__icontains=p_sku)
-        if p_status:
-            productos_queryset = productos_queryset.filter(
-                posee_existencias=p_status == "true"
-            )
-        if p_tipo:
-            productos_queryset = productos_queryset.filter(
-                tipo__nombre__icontains=p_tipo
-            )
+    def get_grid_conteo_queryset(self):
+        # Sin el join de with_posee_existencias ni los select_related; el filtro status
+        # agrega su propio join.
+        return Producto.objects.active()
 
-        if not hasOffset:
-            data = [
+    def serializar_grid(self, productos, paginado: bool = True) -> list[dict]:
+        if not paginado:
+            return [
                 {
                     "id": prod.id,
                     "tipo": prod.tipo.nombre,
@@ -107,51 +113,32 @@ class ProductoView(viewsets.ModelViewSet):
                     "status": 1 if prod.posee_existencias else 0,
                     "cover": prod.covers[0].url if len(prod.covers) > 0 else "",
                 }
-                for prod in productos_queryset
-            ]
-
-            return Response(
-                {"count": len(data), "next": None, "previous": None, "results": data},
-                status=status.HTTP_200_OK,
-            )
-
-        page = self.paginate_queryset(productos_queryset)
-        if page is not None:
-            data = [
-                {
-                    "id": prod.id,
-                    "tipo": prod.tipo.nombre,
-                    "marca": prod.marca.nombre,
-                    "nombre": prod.nombre,
-                    "sku": prod.sku,
-                    "precio": prod.precio,
-                    "usos_est": prod.usos_est,
-                    "maximo": prod.maximo,
-                    "minimo": prod.minimo,
-                    "status": 1 if prod.posee_existencias else 0,
-                    "cover": (
-                        request.build_absolute_uri(prod.covers[0].url)
-                        if len(prod.covers) > 0
-                        else ""
-                    ),
-                }
-                for prod in page
+                for prod in productos
             ]
 
-            if isinstance(self.paginator, LimitOffsetPagination):
-                offset = int(self.paginator.get_offset(request))
-
-                for i, item in enumerate(data):
-                    item["row_number"] = int(offset) + (i + 1)
-
-            return self.get_paginated_response(data)
-
-        return Response(
-            {"msg": "No se pudo paginar el resultado"},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+        return [
+            {
+                "id": prod.id,
+                "tipo": prod.tipo.nombre,
+                "marca": prod.marca.nombre,
+                "nombre": prod.nombre,
+                "sku": prod.sku,
+                "precio": prod.precio,
+                "usos_est": prod.usos_est,
+                "maximo": prod.maximo,
+                "minimo": prod.minimo,
+                "status": 1 if prod.posee_existencias else 0,
+                "cover": (
+                    self.request.build_absolute_uri(prod.covers[0].url)
+                    if len(prod.covers) > 0
+                    else ""
+                ),
+            }
+            for prod in productos
+        ]
 
     @action(methods=["get"], detail=False)
+    @get_condicional("inventory.producto")
     def selector(self, request: Request):
         queryset = Producto.objects.only("id", "nombre", "sku").active().all()
         serializer = ProductoSelectorSerializer(queryset, many=True)
@@ -211,10 +198,8 @@ class ProductoView(viewsets.ModelViewSet):
     @action(methods=["get"], detail=False)
     def search(self, request: Request):
         query = request.query_params.get("q", "")
-        queryset = self.get_queryset().filter(
-            Q(nombre__icontains=query) | Q(sku__icontains=query)
-        )
-        serializer = self.get_serializer(queryset, many=True)
+        productos = busqueda.buscar(self.get_queryset(), query)
+        serializer = self.get_serializer(productos, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -270,170 +255,51 @@ class ProductoImgView(viewsets.ModelViewSet):
         )
 
 
-class ProductoMarcaView(viewsets.ModelViewSet):
+class ProductoMarcaView(GridMixin, viewsets.ModelViewSet):
     queryset = ProductoMarca.objects.active().all()
     serializer_class = ProductoMarcaSerializer
+    grid_filtros = FiltrosGrid(Contiene("nombre"))
 
     @action(methods=["get"], detail=False)
-    def grid(self, request: Request):
-        hasOffset = bool(request.query_params.get("offset"))
-        queryset = self.filter_queryset(self.get_queryset())
-
-        strNombre = request.query_params.get("nombre")
-
-        if strNombre:
-            queryset = queryset.filter(nombre__icontains=strNombre)
-
-        page = self.paginate_queryset(queryset)
-        if hasOffset and page is not None:
-            serializer = self.get_serializer(page, many=True)
-            data = serializer.data
-
-            if isinstance(self.paginator, LimitOffsetPagination):
-                offset = int(self.paginator.get_offset(request))
-
-                for i, item in enumerate(data):
-                    item["row_number"] = int(offset) + (i + 1)
-
-            return self.get_paginated_response(data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"count": len(serializer.data), "results": serializer.data})
-
-    @action(methods=["get"], detail=False)
+    @get_condicional("inventory.productomarca")
     def selector(self, request: Request):
         queryset = ProductoMarca.objects.active().only("id", "nombre").all()
         serializer = ProductoMarcaSelectorSerializer(queryset, many=True)
         return Response(serializer.data)
 
 
-class ProductoTipoView(viewsets.ModelViewSet):
+class ProductoTipoView(GridMixin, viewsets.ModelViewSet):
     queryset = ProductoTipo.objects.active().all()
     serializer_class = ProductoTipoSerializer
+    grid_filtros = FiltrosGrid(Contiene("nombre"), Contiene("descripcion"))
 
     @action(methods=["get"], detail=False)
-    def grid(self, request: Request):
-        hasOffset = bool(request.query_params.get("offset"))
-        queryset = self.filter_queryset(self.get_queryset())
-
-        strNombre = request.query_params.get("nombre")
-        strDescripcion = request.query_params.get("descripcion")
-
-        if strNombre:
-            queryset = queryset.filter(nombre__icontains=strNombre)
-        if strDescripcion:
-            queryset = queryset.filter(descripcion__icontains=strDescripcion)
-
-        page = self.paginate_queryset(queryset)
-        if hasOffset and page is not None:
-            serializer = self.get_serializer(page, many=True)
-            data = serializer.data
-
-            if isinstance(self.paginator, LimitOffsetPagination):
-                offset = int(self.paginator.get_offset(request))
-
-                for i, item in enumerate(data):
-                    item["row_number"] = int(offset) + (i + 1)
-
-            return self.get_paginated_response(data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"count": len(serializer.data), "results": serializer.data})
-
-    @action(methods=["get"], detail=False)
+    @get_condicional("inventory.productotipo")
     def selector(self, request: Request):
         queryset = ProductoTipo.objects.active().only("id", "nombre").all()
         serializer = ProductoTipoSelectorSerializer(queryset, many=True)
         return Response(serializer.data)
 
 
-class LoteView(viewsets.ModelViewSet):
+class LoteView(GridMixin, viewsets.ModelViewSet):
     queryset = Lote.objects.active().all()
     serializer_class = LoteSerializer
-
-    @action(methods=["get"], detail=False)
-    def grid(self, request: Request):
-        hasOffset = bool(request.query_params.get("offset"))
-        # Filters Params
-        strFeCompraInicio = request.query_params.get("fe_compra_inicio")
-        strFeCompraFin = request.query_params.get("fe_compra_fin")
-        strFeExpInicio = request.query_params.get("fe_exp_inicio")
-        strFeExpFin = request.query_params.get("fe_exp_fin")
-        strProducto = request.query_params.get("producto")
-        strCant = request.query_params.get("cant")
-        strCosto = request.query_params.get("costo")
-        strStates = request.query_params.get("state")
-
-        queryset = self.filter_queryset(self.get_queryset())
-
-        if strFeCompraInicio and strFeCompraFin:
-            DateFeCompraInicio = parser.isoparse(strFeCompraInicio)
-            DateFeCompraFin = parser.isoparse(strFeCompraFin)
-
-            queryset = queryset.filter(
-                fe_compra__range=[DateFeCompraInicio, DateFeCompraFin]
-            )
-
-        if strFeExpInicio and strFeExpFin:
-            DateFeExpInicio = parser.isoparse(strFeExpInicio)
-            DateFeExpFin = parser.isoparse(strFeExpFin)
-
-            queryset = queryset.filter(fe_exp__range=[DateFeExpInicio, DateFeExpFin])
-
-        if strProducto:
-            queryset = queryset.filter(
-                Q(producto__nombre__icontains=strProducto)
-                | Q(producto__sku__icontains=strProducto)
-            )
-
-        if strCant:
-            queryset = queryset.filter(cant=int(strCant))
-
-        if strCosto:
-            queryset = queryset.filter(costo=Decimal(strCosto))
-
-        if strStates:
-            arrayStatesfilters = []
-
-            for strState in strStates.split(","):
-                if strState == "0":
-                    arrayStatesfilters.append(
-                        Q(
-                            servicios_restantes__gt=0,
-                            retirado=False,
-                            fe_exp__gt=timezone.now(),
-                        )
-                    )
-                elif strState == "1":
-                    arrayStatesfilters.append(Q(servicios_restantes=0))
-                elif strState == "2":
-                    arrayStatesfilters.append(Q(retirado=True))
-                elif strState == "3":
-                    arrayStatesfilters.append(
-                        Q(retirado=False, fe_exp__lte=timezone.now())
-                    )
-
-            combined_condition = Q()
-            for condition in arrayStatesfilters:
-                combined_condition |= condition
-
-            queryset = queryset.with_servicios_restantes().filter(combined_condition)
-
-        page = self.paginate_queryset(queryset)
-        if (page is not None) and hasOffset:
-            serializer = LoteAllSerializer(page, many=True)
-            data = serializer.data
-
-            if isinstance(self.paginator, LimitOffsetPagination):
-                offset = int(self.paginator.get_offset(request))
-
-                for i, item in enumerate(data):
-                    item["row_number"] = int(offset) + (i + 1)
-
-            return self.get_paginated_response(data)
-
-        serializer = LoteAllSerializer(queryset, many=True)
-        return Response({"count": len(serializer.data), "results": serializer.data})
+    grid_serializer_class = LoteAllSerializer
+    grid_filtros = FiltrosGrid(
+        RangoFechas("fe_compra_inicio", "fe_compra_fin", "fe_compra"),
+        RangoFechas("fe_exp_inicio", "fe_exp_fin", "fe_exp"),
+        Indexado("producto", ("nombre", "sku"), relacion="producto"),
+        Igual("cant", tipo=int),
+        Igual("costo", tipo=Decimal),
+        EnLista("state", tipo=int, metodo="con_estado"),
+    )
+
+    def get_grid_queryset(self):
+        return (
+            self.filter_queryset(self.get_queryset())
+            .select_related("producto")
+            .with_servicios_restantes()
+        )
 
     @action(methods=["get"], detail=True)
     def view(self, request: Request, pk=None):
@@ -505,153 +371,253 @@ class LoteView(viewsets.ModelViewSet):
         instance.delete()
 
 
+def periodos_valor_inventario(hoy: datetime.date):
+    """
+    Retorna los rangos de días (inclusive) de la semana, el mes y el año actuales
+    y anteriores a la fecha indicada.
+    """
+    return {
+        f"{nombre}_{momento}": periodos.rango(hoy, granularidad, desplazamiento)
+        for nombre, granularidad in (("semanal", "week"), ("mensual", "month"), ("anual", "year"))
+        for momento, desplazamiento in (("actual", 0), ("anterior", -1))
+    }
+
+
+# Las consultas de las estadísticas se arman en estas funciones para que las vistas
+# síncronas (StatisticsViewSet) y las asíncronas (async_views) compartan la lógica.
+# Los parámetros inválidos se reportan con ValueError.
+
+
+def consulta_total_productos_por_tipo():
+    return Producto.objects.values("tipo__nombre").annotate(total=Count("id"))
+
+
+def consulta_productos_por_marca():
+    return Producto.objects.active().values("marca__nombre").annotate(total=Count("id"))
+
+
+def respuesta_valor_inventario(valores: dict) -> dict:
+    return {
+        "total": valores["total"],
+        "semanal": {
+            "actual": valores["semanal_actual"],
+            "anterior": valores["semanal_anterior"],
+        },
+        "mensual": {
+            "actual": valores["mensual_actual"],
+            "anterior": valores["mensual_anterior"],
+        },
+        "anual": {
+            "actual": valores["anual_actual"],
+            "anterior": valores["anual_anterior"],
+        },
+    }
+
+
+def consulta_productos_mas_utilizados(params):
+    """
+    Retorna el queryset de usos por producto (y por periodo si se indica granularity),
+    la granularidad y el límite.
+    """
+    from services.models import ProductoUsoDiario
+
+    period = params.get("period", "month")
+    strLimit = params.get("limit")
+    strFechaInicio = params.get("fecha_inicio")
+    strFechaFin = params.get("fecha_fin")
+    granularity = params.get("granularity")
+
+    if strFechaInicio or strFechaFin:
+        start_date = parser.isoparse(strFechaInicio).date() if strFechaInicio else None
+        end_date = parser.isoparse(strFechaFin).date() if strFechaFin else None
+        if start_date and end_date and start_date > end_date:
+            raise ValueError("La fecha de inicio no puede ser mayor a la fecha de fin")
+    else:
+        start_date, end_date = periodos.periodo_actual(period)
+
+    if granularity is not None and granularity not in periodos.GRANULARIDADES:
+        raise ValueError("Granularidad no válida, use 'day', 'week', 'month' o 'year'")
+
+    usos_diarios = periodos.filtrar_rango(
+        ProductoUsoDiario.objects.all(), "fecha", start_date, end_date
+    )
+
+    limite = int(strLimit) if strLimit else None
+
+    if granularity is None:
+        productos_usados = (
+            usos_diarios.values("producto__id", "producto__nombre", "producto__sku")
+            .annotate(usos=Sum("usos"))
+            .order_by("-usos")
+        )
+        if limite:
+            productos_usados = productos_usados[:limite]
+        return productos_usados, granularity, limite
+
+    productos_usados = (
+        usos_diarios.annotate(period=periodos.truncar(ProductoUsoDiario, "fecha", granularity))
+        .values("period", "producto__id", "producto__nombre", "producto__sku")
+        .annotate(usos=Sum("usos"))
+        .order_by("period", "-usos")
+    )
+    return productos_usados, granularity, limite
+
+
+def serializar_productos_mas_utilizados(filas: list, granularity, limite):
+    if granularity is None:
+        return ProductosMasUsadosSerializer(filas, many=True).data
+
+    # El límite se aplica al ranking de cada periodo.
+    por_periodo: dict[datetime.date, list] = {}
+    for fila in filas:
+        filas_periodo = por_periodo.setdefault(fila["period"], [])
+        if not limite or len(filas_periodo) < limite:
+            filas_periodo.append(fila)
+
+    return ProductosMasUsadosPorPeriodoSerializer(
+        [fila for filas_periodo in por_periodo.values() for fila in filas_periodo], many=True
+    ).data
+
+
+def consulta_lotes_cerca_de_expirar(params):
+    umbral_dias = int(params.get("umbral", 10))
+    fecha_actual = timezone.now()
+    fecha_limite = fecha_actual + datetime.timedelta(days=umbral_dias)
+
+    return (
+        Lote.objects.active()
+        .select_related("producto")
+        .with_servicios_restantes()
+        .filter(retirado=False, fe_exp__range=[fecha_actual, fecha_limite])
+        .order_by("fe_exp")
+    )
+
+
+def consulta_horizonte_expiracion(params):
+    """
+    Retorna los horizontes (días, por defecto 7,30,60,90) y la consulta agregada por tipo.
+    """
+    try:
+        horizontes = tuple(int(dias) for dias in params.get("horizontes", "7,30,60,90").split(","))
+    except ValueError:
+        raise ValueError("Los horizontes deben ser días separados por comas")
+    if not 1 <= len(horizontes) <= 10 or horizontes[0] < 1 or list(horizontes) != sorted(set(horizontes)):
+        raise ValueError("Indique de 1 a 10 horizontes distintos, positivos y ascendentes")
+
+    return horizontes, Lote.objects.horizonte_expiracion(horizontes)
+
+
+def respuesta_horizonte_expiracion(horizontes, filas: list[dict]) -> dict:
+    def tramos(fila):
+        return [
+            {
+                "hasta_dias": dias,
+                "lotes": fila[f"lotes_{dias}"],
+                "usos_restantes": fila[f"usos_{dias}"],
+                "costo_en_riesgo": round(fila[f"costo_{dias}"], 2),
+            }
+            for dias in horizontes
+        ]
+
+    totales = {
+        columna: sum(fila[columna] for fila in filas)
+        for dias in horizontes
+        for columna in (f"lotes_{dias}", f"usos_{dias}", f"costo_{dias}")
+    }
+    return {
+        "horizontes": list(horizontes),
+        "tipos": [
+            {"tipo": {"id": fila["tipo_id"], "nombre": fila["tipo"]}, "tramos": tramos(fila)}
+            for fila in filas
+        ],
+        "totales": tramos(totales),
+    }
+
+
+def consulta_productos_cerca_de_agotar(params):
+    umbral_existencias = int(params.get("umbral", 10))
+
+    return (
+        Producto.objects.active()
+        .filter(stock__existencias__range=[1, umbral_existencias])
+        .with_existencias()
+    )
+
+
+def parametros_pronostico(params):
+    """
+    Retorna los días de historial, el método, alpha y el límite del pronóstico.
+    """
+    try:
+        dias = int(params.get("dias", 90))
+        alpha = float(params.get("alpha", 0.3))
+    except ValueError:
+        raise ValueError("Los parámetros dias y alpha deben ser numéricos")
+    metodo = params.get("metodo", "ewma")
+    strLimit = params.get("limit")
+
+    if not 1 <= dias <= 730:
+        raise ValueError("El historial debe estar entre 1 y 730 días")
+    if metodo not in METODOS:
+        raise ValueError("Método no válido, use 'ewma' o 'media'")
+    if not 0 < alpha <= 1:
+        raise ValueError("alpha debe estar entre 0 y 1")
+
+    return dias, metodo, alpha, int(strLimit) if strLimit else None
+
+
 class StatisticsViewSet(viewsets.ModelViewSet):
     queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
 
     @action(detail=False, methods=["get"])
+    @cache_estadistica(
+        "total_productos_por_tipo",
+        tags=("inventory.producto", "inventory.productotipo"),
+    )
     def total_productos_por_tipo(self, request):
         """
         Retorna el total de productos por tipo.
         """
-        CountbyType = Producto.objects.values("tipo__nombre").annotate(
-            total=Count("id")
-        )
         return Response(
             [
                 {"tipo": data["tipo__nombre"], "total": data["total"]}
-                for data in CountbyType
+                for data in consulta_total_productos_por_tipo()
             ],
             status=status.HTTP_200_OK,
         )
 
     @action(detail=False, methods=["get"])
+    @cache_estadistica(
+        "productos_por_marca",
+        tags=("inventory.producto", "inventory.productomarca"),
+    )
     def productos_por_marca(self, request):
         """
         Retorna el total de productos por marca.
         """
-        CountbyMarca = (
-            Producto.objects.active()
-            .values("marca__nombre")
-            .annotate(total=Count("id"))
-        )
         return Response(
             [
                 {"marca": data["marca__nombre"], "total": data["total"]}
-                for data in CountbyMarca
+                for data in consulta_productos_por_marca()
             ],
             status=status.HTTP_200_OK,
         )
 
     @action(detail=False, methods=["get"])
+    @cache_estadistica("valor_inventario", tags=("inventory.lotecompradiaria",))
     def valor_inventario(self, request):
         """
-        Retorna el valor total del inventario.
+        Retorna el valor total del inventario y el de la semana, el mes y el año
+        actuales y anteriores, en una sola consulta sobre las compras diarias.
         """
-        data = {
-            "total": 0,
-            "semanal": {"actual": 0, "anterior": 0},
-            "mensual": {"actual": 0, "anterior": 0},
-            "anual": {"actual": 0, "anterior": 0},
-        }
-
-        total_data = Lote.objects.active().aggregate(total=Sum("costo"))
-        if total_data is not None and total_data["total"] is not None:
-            data["total"] = total_data["total"]
-
-        today = timezone.now()
-        today_date = today.date()
-
-        # Week data
-        start_current_week = today_date - datetime.timedelta(days=today_date.weekday())
-        end_current_week = datetime.datetime.combine(
-            start_current_week + datetime.timedelta(days=6), datetime.time.max
+        valores = LoteCompraDiaria.objects.totales(
+            periodos_valor_inventario(periodos.hoy())
         )
-        start_last_week = start_current_week - datetime.timedelta(days=7)
-        end_last_week = datetime.datetime.combine(
-            start_last_week + datetime.timedelta(days=6), datetime.time.max
-        )
-
-        current_week_data = (
-            Lote.objects.active()
-            .filter(fe_compra__range=[start_current_week, end_current_week])
-            .aggregate(total=Sum("costo"))
-        )
-        last_week_data = (
-            Lote.objects.active()
-            .filter(fe_compra__range=[start_last_week, end_last_week])
-            .aggregate(total=Sum("costo"))
-        )
-
-        if current_week_data is not None and current_week_data["total"] is not None:
-            data["semanal"]["actual"] = current_week_data["total"]
-        if last_week_data is not None and last_week_data["total"] is not None:
-            data["semanal"]["anterior"] = last_week_data["total"]
-
-        # Month data
-        start_current_month = today_date.replace(day=1)
-        end_current_month = datetime.datetime.combine(
-            today_date.replace(
-                day=calendar.monthrange(today_date.year, today_date.month)[1]
-            ),
-            datetime.time.max,
-        )
-        start_last_month = start_current_month - datetime.timedelta(
-            days=calendar.monthrange(today_date.year, today_date.month - 1)[1]
-        )
-        end_last_month = datetime.datetime.combine(
-            start_last_month.replace(
-                day=calendar.monthrange(today_date.year, today_date.month - 1)[1]
-            ),
-            datetime.time.max,
-        )
-
-        current_month_data = (
-            Lote.objects.active()
-            .filter(fe_compra__range=[start_current_month, end_current_month])
-            .aggregate(total=Sum("costo"))
-        )
-        last_month_data = (
-            Lote.objects.active()
-            .filter(fe_compra__range=[start_last_month, end_last_month])
-            .aggregate(total=Sum("costo"))
-        )
-
-        if current_month_data is not None and current_month_data["total"] is not None:
-            data["mensual"]["actual"] = current_month_data["total"]
-        if last_month_data is not None and last_month_data["total"] is not None:
-            data["mensual"]["anterior"] = last_month_data["total"]
-
-        # Year data
-        start_current_year = today_date.replace(month=1, day=1)
-        end_current_year = datetime.datetime.combine(
-            today_date.replace(month=12, day=31), datetime.time.max
-        )
-        start_last_year = start_current_year.replace(year=today_date.year - 1)
-        end_last_year = datetime.datetime.combine(
-            today_date.replace(year=today_date.year - 1, month=12, day=31),
-            datetime.time.max,
-        )
-
-        current_year_data = (
-            Lote.objects.active()
-            .filter(fe_compra__range=[start_current_year, end_current_year])
-            .aggregate(total=Sum("costo"))
-        )
-        last_year_data = (
-            Lote.objects.active()
-            .filter(fe_compra__range=[start_last_year, end_last_year])
-            .aggregate(total=Sum("costo"))
-        )
-
-        if current_year_data is not None and current_year_data["total"] is not None:
-            data["anual"]["actual"] = current_year_data["total"]
-        if last_year_data is not None and last_year_data["total"] is not None:
-            data["anual"]["anterior"] = last_year_data["total"]
-
-        return Response(data)
+        return Response(respuesta_valor_inventario(valores))
 
     @action(detail=False, methods=["get"])
+    @cache_estadistica("cantidad_usos_estimados", tags=("inventory.producto",))
     def cantidad_usos_estimados(self, request):
         """
         Retorna la cantidad total de usos estimados de todos los productos.
@@ -660,87 +626,165 @@ class StatisticsViewSet(viewsets.ModelViewSet):
         return Response(data)
 
     @action(detail=False, methods=["get"])
+    @cache_estadistica(
+        "productos_mas_utilizados",
+        tags=("services.productousodiario", "inventory.producto"),
+    )
     def productos_mas_utilizados(self, request):
-        from services.models import ServicioRealizadoProducto
-
         """
         Retorna una lista de los productos más utilizados (ordenados por usos).
+        El rango puede indicarse con fecha_inicio/fecha_fin (días inclusive) o con
+        period (week, month, year) para el periodo actual. Con granularity (day, week,
+        month, year) se retorna el ranking de cada periodo dentro del rango.
         """
-        period = request.query_params.get("period", "month")
-        strLimit = request.query_params.get("limit")
-
-        today = timezone.now()
-        today_date = today.date()
-
-        if period == "week":
-            start_date = today_date - datetime.timedelta(days=today_date.weekday())
-            end_date = datetime.datetime.combine(
-                start_date + datetime.timedelta(days=6), datetime.time.max
-            )
-        elif period == "month":
-            start_date = today_date.replace(day=1)
-            end_date = datetime.datetime.combine(
-                today_date.replace(
-                    day=calendar.monthrange(today_date.year, today_date.month)[1]
-                ),
-                datetime.time.max,
-            )
-        elif period == "year":
-            start_date = today_date.replace(month=1, day=1)
-            end_date = datetime.datetime.combine(
-                today_date.replace(month=12, day=31), datetime.time.max
-            )
-        else:
-            return Response(
-                {"error": "Periodo no válido, use 'week', 'month' o 'year'"},
-                status=status.HTTP_400_BAD_REQUEST,
+        try:
+            productos_usados, granularity, limite = consulta_productos_mas_utilizados(
+                request.query_params
             )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        productos_usados = (
-            ServicioRealizadoProducto.objects.active()
-            .filter(servicio_realizado__fecha__range=[start_date, end_date])
-            .values("producto__id", "producto__nombre", "producto__sku")
-            .annotate(usos=Sum("cantidad"))
-            .order_by("-usos")
+        return Response(
+            serializar_productos_mas_utilizados(list(productos_usados), granularity, limite)
         )
 
-        if strLimit:
-            productos_usados = productos_usados[: int(strLimit)]
-
-        serializer = ProductosMasUsadosSerializer(productos_usados, many=True)
-        return Response(serializer.data)
-
     @action(detail=False, methods=["get"])
+    @cache_estadistica(
+        "lotes_cerca_de_expirar",
+        tags=("inventory.lote", "inventory.producto"),
+    )
     def lotes_cerca_de_expirar(self, request):
         """
         Retorna una lista de los lotes que están cerca de expirar.
         """
-        umbral_dias = int(request.query_params.get("umbral", 10))
-        fecha_actual = timezone.now()
-        fecha_limite = fecha_actual + datetime.timedelta(days=umbral_dias)
-
-        data = (
-            Lote.objects.active()
-            .filter(retirado=False, fe_exp__range=[fecha_actual, fecha_limite])
-            .order_by("fe_exp")
-        )
+        data = consulta_lotes_cerca_de_expirar(request.query_params)
         serializer = LoteAllSerializer(data, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
-    def productos_cerca_de_agotar(self, request):
+    @cache_estadistica(
+        "horizonte_expiracion",
+        tags=("inventory.lote", "inventory.producto", "inventory.productotipo"),
+    )
+    def horizonte_expiracion(self, request):
         """
-        Retorna una lista de los productos que están cerca de agotar sus existencias.
+        Retorna por tipo de producto y en total los lotes disponibles que vencen en cada
+        tramo de días (horizontes, por defecto 7,30,60,90), con sus usos restantes y el
+        costo en riesgo, calculados en una sola consulta agregada.
         """
-        umbral_existencias = int(request.query_params.get("umbral", 10))
+        try:
+            horizontes, filas = consulta_horizonte_expiracion(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        productos_cerca_de_agotar = (
-            Producto.objects.active()
-            .with_existencias()
-            .filter(existencias__range=[1, umbral_existencias])
-        )
+        return Response(respuesta_horizonte_expiracion(horizontes, list(filas)))
 
+    @action(detail=False, methods=["get"])
+    @cache_estadistica(
+        "productos_cerca_de_agotar",
+        tags=("inventory.productostock", "inventory.producto"),
+    )
+    def productos_cerca_de_agotar(self, request):
+        """
+        Retorna una lista de los productos que están cerca de agotar sus existencias.
+        """
         serializer = ProductoWithExistenciasSerializer(
-            productos_cerca_de_agotar, many=True
+            consulta_productos_cerca_de_agotar(request.query_params), many=True
         )
         return Response(serializer.data)
+
+    @action(detail=False, methods=["get"])
+    @cache_estadistica(
+        "pronostico_agotamiento",
+        tags=("services.productousodiario", "inventory.lote", "inventory.producto"),
+    )
+    def pronostico_agotamiento(self, request):
+        """
+        Retorna para cada producto su consumo diario estimado, los días para agotar sus
+        usos restantes y los días hasta que un lote venza con usos sin consumir
+        (ordenados por días para agotar).
+        - dias: Días de historial a considerar (por defecto 90).
+        - metodo: "ewma" (suavizado exponencial, por defecto) o "media" (promedio móvil).
+        - alpha: Factor de suavizado para "ewma" (0 < alpha <= 1, por defecto 0.3).
+        """
+        try:
+            dias, metodo, alpha, limite = parametros_pronostico(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(pronosticar_stock(dias, metodo, alpha)[:limite])
+
+    @action(detail=False, methods=["get", "post"])
+    def dashboard(self, request):
+        """
+        Calcula varios widgets de estadísticas en una sola petición.
+        GET: ?widgets=valor_inventario,productos_por_marca
+        POST: {"widgets": [{"nombre": "productos_mas_utilizados", "params": {"period": "week"}, "timeout": 5}]}
+        Retorna el resultado, el estado y el tiempo (ms) de cada widget.
+        """
+        if request.method == "GET":
+            widgets = [
+                {"nombre": nombre}
+                for nombre in request.query_params.get("widgets", "").split(",")
+                if nombre
+            ]
+        else:
+            widgets = request.data.get("widgets", [])
+
+        if not isinstance(widgets, list) or not widgets:
+            return Response(
+                {"error": "Debe enviar al menos un widget"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(widgets) > MAX_WIDGETS:
+            return Response(
+                {"error": f"No se pueden pedir más de {MAX_WIDGETS} widgets"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        desconocidos = [
+            widget.get("nombre") if isinstance(widget, dict) else widget
+            for widget in widgets
+            if not isinstance(widget, dict) or widget.get("nombre") not in WIDGETS
+        ]
+        if desconocidos:
+            return Response(
+                {"error": f"Widgets no válidos: {desconocidos}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        timeouts_no_validos = []
+        for widget in widgets:
+            if "timeout" not in widget:
+                continue
+            try:
+                timeout = float(widget["timeout"])
+            except (TypeError, ValueError):
+                timeout = None
+            if timeout is None or not math.isfinite(timeout) or timeout <= 0:
+                timeouts_no_validos.append(widget["nombre"])
+        if timeouts_no_validos:
+            return Response(
+                {"error": f"Tiempo de espera no válido en los widgets: {timeouts_no_validos}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        inicio = time.perf_counter()
+        resultados = calcular(request, widgets)
+        return Response(
+            {"widgets": resultados, "ms": round((time.perf_counter() - inicio) * 1000, 2)}
+        )
+
+
+for nombre in (
+    "total_productos_por_tipo",
+    "productos_por_marca",
+    "valor_inventario",
+    "cantidad_usos_estimados",
+    "productos_mas_utilizados",
+    "lotes_cerca_de_expirar",
+    "horizonte_expiracion",
+    "productos_cerca_de_agotar",
+    "pronostico_agotamiento",
+):
+    registrar_widget(nombre, StatisticsViewSet.as_view({"get": nombre}))
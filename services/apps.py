@@ -1,15 +1,34 @@
 import uuid
 from django.apps import AppConfig
-from django.db.models.signals import post_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 
 
 class ServicesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "services"
 
-    """ def ready(self) -> None:
+    def ready(self) -> None:
+        from inventory.models import Producto
+        from inventory.signals import existencias_cambiadas
         from . import signals
-        from .models import ServicioRealizadoProducto
+        from .models import Servicio, ServicioRealizado, ServicioRealizadoProducto
+
+        pre_save.connect(
+            signals.servicio_realizado_producto_guardar_anterior,
+            sender=ServicioRealizadoProducto,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "servicio_realizado_producto_guardar_anterior",
+                )
+            ),
+        )
 
         post_save.connect(
             signals.lote_update_consumido_on_servicio_realizado_producto_save,
@@ -20,4 +39,118 @@ class ServicesConfig(AppConfig):
                     "lote_update_consumido_on_servicio_realizado_producto_save",
                 )
             ),
-        ) """
+        )
+
+        post_delete.connect(
+            signals.lote_update_consumido_on_servicio_realizado_producto_delete,
+            sender=ServicioRealizadoProducto,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "lote_update_consumido_on_servicio_realizado_producto_delete",
+                )
+            ),
+        )
+
+        existencias_cambiadas.connect(
+            signals.servicio_update_disponibilidad_on_existencias,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "servicio_update_disponibilidad_on_existencias",
+                )
+            ),
+        )
+
+        m2m_changed.connect(
+            signals.servicio_update_disponibilidad_on_productos_change,
+            sender=Servicio.productos.through,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "servicio_update_disponibilidad_on_productos_change",
+                )
+            ),
+        )
+
+        pre_delete.connect(
+            signals.producto_guardar_servicios_anteriores,
+            sender=Producto,
+            dispatch_uid=str(
+                uuid.uuid3(uuid.NAMESPACE_OID, "producto_guardar_servicios_anteriores")
+            ),
+        )
+
+        post_delete.connect(
+            signals.servicio_update_disponibilidad_on_producto_delete,
+            sender=Producto,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "servicio_update_disponibilidad_on_producto_delete",
+                )
+            ),
+        )
+
+        pre_save.connect(
+            signals.servicio_realizado_guardar_anterior,
+            sender=ServicioRealizado,
+            dispatch_uid=str(
+                uuid.uuid3(uuid.NAMESPACE_OID, "servicio_realizado_guardar_anterior")
+            ),
+        )
+
+        post_save.connect(
+            signals.servicio_realizado_diario_on_servicio_realizado_save,
+            sender=ServicioRealizado,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "servicio_realizado_diario_on_servicio_realizado_save",
+                )
+            ),
+        )
+
+        post_delete.connect(
+            signals.servicio_realizado_diario_on_servicio_realizado_delete,
+            sender=ServicioRealizado,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "servicio_realizado_diario_on_servicio_realizado_delete",
+                )
+            ),
+        )
+
+        post_save.connect(
+            signals.producto_uso_diario_on_servicio_realizado_producto_save,
+            sender=ServicioRealizadoProducto,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "producto_uso_diario_on_servicio_realizado_producto_save",
+                )
+            ),
+        )
+
+        post_delete.connect(
+            signals.producto_uso_diario_on_servicio_realizado_producto_delete,
+            sender=ServicioRealizadoProducto,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "producto_uso_diario_on_servicio_realizado_producto_delete",
+                )
+            ),
+        )
+
+        post_save.connect(
+            signals.producto_uso_diario_on_servicio_realizado_save,
+            sender=ServicioRealizado,
+            dispatch_uid=str(
+                uuid.uuid3(
+                    uuid.NAMESPACE_OID,
+                    "producto_uso_diario_on_servicio_realizado_save",
+                )
+            ),
+        )
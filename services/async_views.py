@@ -0,0 +1,58 @@
+from rest_framework import status
+
+from core.async_views import RespuestaAsincrona, vista_asincrona
+from core.stats_cache import cache_estadistica
+from .views import (
+    consulta_most_performed_services,
+    consulta_performance_services_products,
+    consulta_service_per_months,
+    fila_performance_services_products,
+    fila_service_per_months,
+)
+
+# Variantes asíncronas de las estadísticas de servicios (ver inventory.async_views).
+
+
+@vista_asincrona
+@cache_estadistica("service_per_months", tags=("services.serviciorealizadodiario",))
+async def service_per_months(request):
+    try:
+        serie = consulta_service_per_months(request.GET)
+    except ValueError as e:
+        return RespuestaAsincrona({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return RespuestaAsincrona([fila_service_per_months(fila) for fila in await serie.afilas()])
+
+
+@vista_asincrona
+@cache_estadistica(
+    "most_performed_services",
+    tags=("services.serviciorealizadodiario", "services.servicio"),
+)
+async def most_performed_services(request):
+    try:
+        servicios = consulta_most_performed_services(request.GET)
+    except ValueError as e:
+        return RespuestaAsincrona({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return RespuestaAsincrona([servicio async for servicio in servicios])
+
+
+@vista_asincrona
+@cache_estadistica(
+    "performance_services_products",
+    tags=(
+        "services.servicio",
+        "services.serviciorealizado",
+        "services.serviciorealizadoproducto",
+    ),
+)
+async def performance_services_products(request):
+    try:
+        top_servicios = consulta_performance_services_products(request.GET)
+    except ValueError as e:
+        return RespuestaAsincrona({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return RespuestaAsincrona(
+        [fila_performance_services_products(servicio) async for servicio in top_servicios]
+    )
@@ -0,0 +1,60 @@
+import datetime
+from django.utils import timezone
+
+from core.query_plans import consulta_caliente, queryset_de_grid
+from inventory.views import consulta_productos_mas_utilizados
+from .models import ServicioRealizadoProducto
+from .views import (
+    ServicioRealizadoView,
+    ServicioView,
+    consulta_most_performed_services,
+    consulta_service_per_months,
+)
+
+
+@consulta_caliente("servicio_realizado.grid", tablas=("services_serviciorealizado",))
+def servicio_realizado_grid():
+    return queryset_de_grid(ServicioRealizadoView)
+
+
+@consulta_caliente("servicio_realizado.grid?fecha", tablas=("services_serviciorealizado",))
+def servicio_realizado_grid_fecha():
+    hoy = timezone.now()
+    return queryset_de_grid(
+        ServicioRealizadoView,
+        fecha_inicio=(hoy - datetime.timedelta(days=7)).isoformat(),
+        fecha_fin=hoy.isoformat(),
+    )
+
+
+@consulta_caliente("servicio_realizado_producto.by_lote", tablas=("services_serviciorealizadoproducto",))
+def servicio_realizado_producto_by_lote():
+    return ServicioRealizadoProducto.objects.active().filter(lote_id=1)
+
+
+@consulta_caliente(
+    "servicio_realizado_producto.by_servicio_realizado",
+    tablas=("services_serviciorealizadoproducto",),
+)
+def servicio_realizado_producto_by_servicio_realizado():
+    return ServicioRealizadoProducto.objects.active().filter(servicio_realizado=1)
+
+
+@consulta_caliente("stats.service_per_months", tablas=("services_serviciorealizadodiario",))
+def service_per_months():
+    return consulta_service_per_months({}).consulta
+
+
+@consulta_caliente("stats.most_performed_services", tablas=("services_serviciorealizadodiario",))
+def most_performed_services():
+    return consulta_most_performed_services({"period": "week"})
+
+
+@consulta_caliente("stats.productos_mas_utilizados", tablas=("services_productousodiario",))
+def productos_mas_utilizados():
+    return consulta_productos_mas_utilizados({"period": "week"})[0]
+
+
+@consulta_caliente("servicio.grid?disponibilidad", tablas=("services_servicio",))
+def servicio_grid_disponibilidad():
+    return queryset_de_grid(ServicioView, disponibilidad="true")
@@ -0,0 +1,113 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from customers.models import Cliente
+from inventory.models import Lote, Producto
+from services.models import Servicio, ServicioRealizado, ServicioRealizadoProducto
+
+
+def _rendimiento_anidado():
+    """
+    Implementación anterior de performance_services_products (consultas anidadas por
+    servicio y por servicio realizado), se conserva solo para comparar.
+    """
+    data = []
+    for servicio in Servicio.objects.active().annotate(
+        num_realizados=Count("servicios_realizados")
+    ).order_by("-num_realizados"):
+        variacion_total = 0
+        for servicio_realizado in ServicioRealizado.objects.active().filter(servicio=servicio):
+            for producto_utilizado in ServicioRealizadoProducto.objects.active().filter(
+                servicio_realizado=servicio_realizado
+            ):
+                variacion_total += producto_utilizado.cantidad - 1
+        data.append((servicio.nombre, servicio.num_realizados, variacion_total))
+    return data
+
+
+def _rendimiento_agrupado():
+    return list(
+        Servicio.objects.active()
+        .with_rendimiento()
+        .order_by("-num_realizados", "id")
+        .values("nombre", "num_realizados", "variacion_uso")
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tiempo de performance_services_products con datos sintéticos. "
+        "Los datos se crean dentro de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--realizados", type=int, default=100_000)
+        parser.add_argument("--servicios", type=int, default=50)
+        parser.add_argument(
+            "--anidado",
+            action="store_true",
+            help="También mide la implementación anterior (puede tardar varios minutos).",
+        )
+
+    def medir(self, nombre, funcion):
+        consultas = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal consultas
+            consultas += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            funcion()
+            duracion = time.perf_counter() - inicio
+        self.stdout.write(f"{nombre}: {duracion:.3f}s, {consultas} consultas")
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        self.stdout.write("Generando datos...")
+        cliente = Cliente.objects.create(nombre="Benchmark")
+        Servicio.objects.bulk_create(
+            Servicio(nombre=f"Benchmark {i}") for i in range(options["servicios"])
+        )
+        servicios = list(Servicio.objects.filter(nombre__startswith="Benchmark "))
+        producto = Producto.objects.create(nombre="Benchmark", usos_est=options["realizados"] * 3)
+        lote = Lote.objects.create(producto=producto)
+
+        ahora = timezone.now()
+        ServicioRealizado.objects.bulk_create(
+            (
+                ServicioRealizado(
+                    cliente=cliente,
+                    servicio=random.choice(servicios),
+                    fecha=ahora - timezone.timedelta(days=random.randint(0, 730)),
+                )
+                for _ in range(options["realizados"])
+            ),
+            batch_size=5000,
+        )
+        ServicioRealizadoProducto.objects.bulk_create(
+            (
+                ServicioRealizadoProducto(
+                    servicio_realizado_id=servicio_realizado_id,
+                    producto=producto,
+                    lote=lote,
+                    cantidad=random.randint(1, 3),
+                )
+                for servicio_realizado_id in ServicioRealizado.objects.filter(
+                    cliente=cliente
+                ).values_list("id", flat=True)
+            ),
+            batch_size=5000,
+        )
+
+        self.medir("Consulta agrupada", _rendimiento_agrupado)
+        if options["anidado"]:
+            self.medir("Consultas anidadas", _rendimiento_anidado)
+
+        transaction.set_rollback(True)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.concurrency import con_reintentos
+from customers.models import Cliente
+from inventory.models import Lote, Producto
+from services.models import Servicio, ServicioRealizado, ServicioRealizadoProducto
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántos servicios realizados por segundo se registran en paralelo sobre los "
+        "mismos lotes (asignar_fefo con reintentos) para cada cantidad de hilos. "
+        "Usa la base configurada (cada hilo abre su conexión); los datos sintéticos se "
+        "eliminan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, nargs="+", default=[1, 2, 4, 8])
+        parser.add_argument("--registros-por-hilo", type=int, default=20)
+        parser.add_argument("--usos", type=int, default=2, help="Usos por registro.")
+
+    def handle(self, *args, **options):
+        cliente = Cliente.objects.create(nombre="Benchmark")
+        servicio = Servicio.objects.create(nombre="Benchmark registro concurrente")
+        productos = []
+        try:
+            for hilos in options["hilos"]:
+                producto = Producto.objects.create(nombre=f"Benchmark {hilos}", usos_est=1)
+                productos.append(producto)
+                # Stock suficiente para que ningún registro falle por falta de usos.
+                Lote.objects.create(
+                    producto=producto,
+                    cant=hilos * options["registros_por_hilo"] * options["usos"],
+                    fe_exp=timezone.now() + timezone.timedelta(days=30),
+                )
+                exitos, errores, duracion = self.registrar_en_paralelo(
+                    cliente, servicio, producto.id, hilos, options
+                )
+                self.stdout.write(
+                    f"{hilos} hilo(s): {exitos} registros en {duracion:.3f}s "
+                    f"({exitos / duracion:.1f} registros/s), {errores} errores"
+                )
+        finally:
+            ServicioRealizado.objects.filter(servicio=servicio).delete()
+            for producto in productos:
+                producto.hard_delete()
+            servicio.hard_delete()
+            cliente.hard_delete()
+
+    def registrar_en_paralelo(self, cliente, servicio, producto_id, hilos, options):
+        exitos, errores = [], []
+
+        @con_reintentos(intentos=10, espera=0.005)
+        @transaction.atomic
+        def registrar():
+            servicio_realizado = ServicioRealizado.objects.create(
+                cliente=cliente, servicio=servicio
+            )
+            ServicioRealizadoProducto.objects.asignar_fefo(
+                servicio_realizado, {producto_id: options["usos"]}
+            )
+
+        def trabajador():
+            try:
+                for _ in range(options["registros_por_hilo"]):
+                    try:
+                        registrar()
+                        exitos.append(1)
+                    except Exception as e:
+                        errores.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=trabajador) for _ in range(hilos)]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(exitos), len(errores), time.perf_counter() - inicio
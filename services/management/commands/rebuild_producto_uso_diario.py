@@ -0,0 +1,21 @@
+from dateutil import parser
+from django.core.management.base import BaseCommand
+from services.models import ProductoUsoDiario
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el acumulado diario de usos por producto (ProductoUsoDiario)."
+
+    def add_arguments(self, parser_):
+        parser_.add_argument(
+            "--desde",
+            help="Fecha (YYYY-MM-DD) desde la que se reconstruye; por defecto todo el historial.",
+        )
+
+    def handle(self, *args, **options):
+        desde = parser.parse(options["desde"]).date() if options["desde"] else None
+        filas = ProductoUsoDiario.objects.reconstruir(desde)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Se reconstruyeron {len(filas)} filas diarias de usos")
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from services.models import Servicio
+
+
+class Command(BaseCommand):
+    help = "Recalcula la disponibilidad guardada de todos los servicios."
+
+    def handle(self, *args, **options):
+        actualizados = Servicio.objects.actualizar_disponibilidad()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Se recalculó la disponibilidad de {actualizados} servicios")
+        )
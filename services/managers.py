@@ -1,4 +1,11 @@
-from core.models import AuditManager
+import datetime
+from django.db import connections, models, transaction
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+
+from core.models import AcumuladoManager, AuditManager
+from core.periodos import dia, inicio_del_dia
+from core.stats_cache import invalidar
 from .querysets import ServicioQuerySet
 
 
@@ -6,11 +13,181 @@ class ServicioManager(AuditManager):
     def get_queryset(self):
         return ServicioQuerySet(self.model, using=self._db)
 
-    def with_disponibilidad(self):
-        return self.get_queryset().with_disponibilidad()
+    def actualizar_disponibilidad(self):
+        return self.get_queryset().actualizar_disponibilidad()
+
+    def with_rendimiento(self, desde=None, hasta=None):
+        return self.get_queryset().with_rendimiento(desde, hasta)
 
     def prefetch_imagenes(self):
         return self.get_queryset().prefetch_imagenes()
     
     def prefetch_cover(self):
-        return self.get_queryset().prefetch_cover()
\ No newline at end of file
+        return self.get_queryset().prefetch_cover()
+
+
+class ServicioRealizadoProductoManager(AuditManager):
+    @transaction.atomic
+    def asignar_fefo(self, servicio_realizado, cantidades: dict[int, int]):
+        """
+        Reparte las cantidades solicitadas ({producto_id: usos}) entre los lotes
+        activos de cada producto, consumiendo primero el que expira antes (FEFO).
+        Los lotes candidatos se bloquean y se leen en una sola consulta, y las
+        asignaciones se guardan con un único bulk_create, por lo que el número de
+        consultas no depende de la cantidad de lotes.
+        Donde la base de datos no soporta bloqueo de filas (SQLite) el contador de
+        cada lote actúa como versión: si otro registro lo cambió entre la lectura y
+        la escritura se lanza ConflictoConcurrencia y la transacción se revierte.
+        Los productos inexistentes, las cantidades no válidas y la falta de stock lanzan
+        ValidationError (respuesta 400).
+        """
+        from inventory.models import Lote, Producto, ProductoStock
+        from .models import ProductoUsoDiario
+
+        # Los ids y cantidades llegan tal como vienen en la petición (pueden ser cadenas).
+        try:
+            cantidades = {
+                int(producto_id): int(cantidad) for producto_id, cantidad in cantidades.items()
+            }
+        except (TypeError, ValueError):
+            raise ValidationError("Los productos y sus cantidades deben ser números enteros")
+
+        productos = list(
+            Producto.objects.filter(id__in=cantidades.keys()).only("id", "nombre")
+        )
+
+        faltantes = cantidades.keys() - {producto.id for producto in productos}
+        if faltantes:
+            raise ValidationError(
+                f"No existen los productos: {', '.join(map(str, sorted(faltantes)))}"
+            )
+
+        for producto in productos:
+            if cantidades[producto.id] < 1:
+                raise ValidationError(
+                    f"La cantidad del producto {producto.nombre} debe ser mayor a 0"
+                )
+
+        lotes = Lote.objects.disponibles()
+        if connections[self.db].features.has_select_for_update_of:
+            lotes = lotes.select_for_update(of=("self",))
+        else:
+            lotes = lotes.select_for_update()
+
+        lotes_por_producto: dict[int, list] = {}
+        for lote in (
+            lotes.with_servicios_restantes()
+            .filter(
+                producto_id__in=[producto.id for producto in productos],
+                servicios_restantes__gt=0,
+            )
+            .order_by("producto_id", F("fe_exp").asc(nulls_last=True), "id")
+            .only("id", "producto_id", "fe_exp", "servicios_realizados")
+        ):
+            lotes_por_producto.setdefault(lote.producto_id, []).append(lote)
+
+        asignaciones = []
+        consumo: dict[int, int] = {}
+        esperados: dict[int, int] = {}
+
+        for producto in productos:
+            cantidad = cantidades[producto.id]
+            candidatos = lotes_por_producto.get(producto.id, [])
+
+            if sum(lote.servicios_restantes for lote in candidatos) < cantidad:
+                raise ValidationError(
+                    f"El producto {producto.nombre} no tiene suficiente stock"
+                )
+
+            for lote in candidatos:
+                if cantidad == 0:
+                    break
+
+                usos = min(cantidad, lote.servicios_restantes)
+                asignaciones.append(
+                    self.model(
+                        servicio_realizado=servicio_realizado,
+                        producto_id=producto.id,
+                        lote_id=lote.id,
+                        cantidad=usos,
+                    )
+                )
+                consumo[lote.id] = usos
+                esperados[lote.id] = lote.servicios_realizados
+                cantidad -= usos
+
+        # bulk_create no emite señales: se actualizan aquí los contadores y el stock.
+        Lote.objects.registrar_consumo(consumo, esperados)
+        self.bulk_create(asignaciones)
+        invalidar(self.model._meta.label_lower)
+        ProductoStock.objects.recalcular([producto.id for producto in productos])
+        fecha = dia(servicio_realizado.fecha)
+        ProductoUsoDiario.objects.sumar(
+            {(fecha, producto.id): {"usos": cantidades[producto.id]} for producto in productos}
+        )
+
+        return asignaciones
+
+
+class ServicioRealizadoDiarioManager(AcumuladoManager):
+    campos_clave = ("fecha", "servicio_id")
+    contador = "cantidad"
+
+    def reconstruir(self, desde: datetime.date = None):
+        """
+        Reemplaza las filas (desde la fecha indicada, o todas) acumulando los servicios
+        realizados activos.
+        """
+        from .models import ServicioRealizado
+
+        filas = self.all()
+        servicios_realizados = ServicioRealizado.objects.active()
+        if desde is not None:
+            filas = filas.filter(fecha__gte=desde)
+            servicios_realizados = servicios_realizados.filter(
+                fecha__gte=inicio_del_dia(desde)
+            )
+
+        filas.delete()
+        return self._crear(servicios_realizados)
+
+    def _crear(self, servicios_realizados):
+        # El día se calcula en Python (periodos.dia) y no con TruncDate: en MySQL la conversión
+        # de zona horaria (CONVERT_TZ) retorna NULL si no están cargadas las tablas de zonas.
+        filas = servicios_realizados.values_list("fecha", "servicio_id", "pagado")
+        return self.crear_acumulados(
+            ((dia(fecha), servicio_id), {"cantidad": 1, "pagado": pagado})
+            for fecha, servicio_id, pagado in filas.order_by().iterator(chunk_size=2000)
+        )
+
+
+class ProductoUsoDiarioManager(AcumuladoManager):
+    campos_clave = ("fecha", "producto_id")
+    contador = "usos"
+
+    def reconstruir(self, desde: datetime.date = None):
+        """
+        Reemplaza las filas (desde la fecha indicada, o todas) acumulando los productos
+        utilizados activos.
+        """
+        from .models import ServicioRealizadoProducto
+
+        filas = self.all()
+        utilizados = ServicioRealizadoProducto.objects.active()
+        if desde is not None:
+            filas = filas.filter(fecha__gte=desde)
+            utilizados = utilizados.filter(
+                servicio_realizado__fecha__gte=inicio_del_dia(desde)
+            )
+
+        filas.delete()
+        return self._crear(utilizados)
+
+    def _crear(self, utilizados):
+        filas = utilizados.filter(servicio_realizado__deleted_at__isnull=True).values_list(
+            "servicio_realizado__fecha", "producto_id", "cantidad"
+        )
+        return self.crear_acumulados(
+            ((dia(fecha), producto_id), {"usos": cantidad})
+            for fecha, producto_id, cantidad in filas.order_by().iterator(chunk_size=2000)
+        )
@@ -8,7 +8,12 @@ from core.models import AuditModel, ServicioEspecialidad
 from inventory.models import Lote, Producto
 from staff.models import Personal
 from customers.models import Cliente
-from .managers import ServicioManager
+from .managers import (
+    ServicioManager,
+    ServicioRealizadoDiarioManager,
+    ServicioRealizadoProductoManager,
+    ProductoUsoDiarioManager,
+)
 
 class ServicioEstado(AuditModel):
     """
@@ -50,10 +55,11 @@ class Servicio(AuditModel):
     - productos: Los productos asociados al servicio (ManyToManyField a Producto, relacionados como "servicios", opcional).
     - estado: El estado del servicio (ForeignKey a ServicioEstado, cuando se elimina se establece como NULL, opcional).
     - especialidades: Las especialidades del servicio (ManyToManyField a ServicioEspecialidad, relacionados como "servicios", opcional).
+    - disponibilidad: Indica si todos los productos asociados tienen existencias (se mantiene con señales, no editable).
     Métodos:
     - __str__: Retorna el nombre del servicio.
     - save: Guarda el servicio en la base de datos. Si el estado es None, se establece como "ACTIVO".
-    - get_disponibilidad: Retorna True si todos los productos asociados al servicio tienen existencias, False de lo contrario.
+    - get_disponibilidad: Retorna la disponibilidad guardada del servicio.
     """
     
     nombre = models.CharField(max_length=100)
@@ -68,9 +74,16 @@ class Servicio(AuditModel):
     productos = models.ManyToManyField(Producto, related_name="servicios", null=True, blank=True)
     estado = models.ForeignKey(ServicioEstado, on_delete=models.SET_NULL, null=True, related_name="servicios")
     especialidades = models.ManyToManyField(ServicioEspecialidad, related_name="servicios", null=True, blank=True)
+    disponibilidad = models.BooleanField(default=True, editable=False)
 
     objects = ServicioManager()
 
+    class Meta(AuditModel.Meta):
+        indexes = [
+            models.Index(fields=["deleted_at", "disponibilidad"], name="servicio_activo_disp_idx"),
+            models.Index(fields=["deleted_at", "created_at"], name="servicio_activo_creado_idx"),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -82,11 +95,7 @@ class Servicio(AuditModel):
 
     @property
     def get_disponibilidad(self):
-        if all(
-            producto.get_posee_existencias for producto in self.productos.active().all()
-        ):
-            return True
-        return False
+        return self.disponibilidad
 
     @transaction.atomic
     def delete(self, using=None, keep_parents=False):
@@ -147,6 +156,15 @@ class ServicioRealizado(AuditModel):
     )
     finalizado = models.BooleanField(default=False)
 
+    class Meta(AuditModel.Meta):
+        indexes = [
+            models.Index(fields=["deleted_at", "created_at"], name="srealizado_activo_creado_idx"),
+            models.Index(fields=["deleted_at", "fecha"], name="srealizado_activo_fecha_idx"),
+            models.Index(
+                fields=["servicio", "deleted_at", "fecha"], name="srealizado_servicio_fecha_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.cliente} - {self.servicio}"
 
@@ -156,6 +174,34 @@ class ServicioRealizado(AuditModel):
         
         super().delete(using, keep_parents)
 
+class ServicioRealizadoDiario(models.Model):
+    """
+    Modelo que acumula por día y servicio los servicios realizados activos.
+    Cada escritura suma su diferencia con ServicioRealizadoDiario.objects.sumar (señales de
+    ServicioRealizado), por lo que las estadísticas leen una fila por día y servicio.
+    Atributos:
+    - fecha: Día en que se realizaron los servicios.
+    - servicio: Servicio realizado.
+    - cantidad: Cantidad de servicios realizados ese día.
+    - pagado: Suma de lo pagado por esos servicios.
+    """
+
+    fecha = models.DateField()
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name="diarios")
+    cantidad = models.PositiveIntegerField(default=0)
+    pagado = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    objects = ServicioRealizadoDiarioManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["fecha", "servicio"], name="srdiario_fecha_servicio_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.servicio_id} el {self.fecha}: {self.cantidad}"
+
+
 class ServicioRealizadoProducto(AuditModel):
     """
     Modelo que representa un producto utilizado en un servicio realizado.
@@ -166,6 +212,8 @@ class ServicioRealizadoProducto(AuditModel):
     - cantidad: La cantidad utilizada del producto (usos).
     Métodos:
     - __str__: Devuelve una representación en cadena del objeto.
+    - save / hard_delete: Se ejecutan en una transacción para que el contador de consumo del lote
+      (actualizado por señales) se guarde junto con el registro.
     """
     
     servicio_realizado = models.ForeignKey(
@@ -175,5 +223,50 @@ class ServicioRealizadoProducto(AuditModel):
     lote = models.ForeignKey(Lote, on_delete=models.CASCADE, related_name="servicio_realizado_productos")
     cantidad = models.PositiveIntegerField() # Cantidad utilizada del producto (usos)
 
+    objects = ServicioRealizadoProductoManager()
+
+    class Meta(AuditModel.Meta):
+        indexes = [
+            models.Index(fields=["lote", "deleted_at"], name="srproducto_lote_activo_idx"),
+            models.Index(
+                fields=["servicio_realizado", "deleted_at"], name="srproducto_srealizado_idx"
+            ),
+            models.Index(fields=["producto", "deleted_at"], name="srproducto_producto_idx"),
+        ]
+
     def __str__(self):
         return f"{self.servicio_realizado} - {self.producto} - {self.cantidad}"
+
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+    @transaction.atomic
+    def hard_delete(self):
+        super().hard_delete()
+
+
+class ProductoUsoDiario(models.Model):
+    """
+    Modelo que acumula por día y producto los usos registrados en servicios realizados.
+    Cada escritura suma su diferencia con ProductoUsoDiario.objects.sumar (asignar_fefo y
+    señales), por lo que las estadísticas de uso leen una fila por día y producto.
+    Atributos:
+    - fecha: Día del servicio realizado.
+    - producto: Producto utilizado.
+    - usos: Suma de los usos del producto ese día.
+    """
+
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="usos_diarios")
+    usos = models.PositiveIntegerField(default=0)
+
+    objects = ProductoUsoDiarioManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["fecha", "producto"], name="pudiario_fecha_producto_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} el {self.fecha}: {self.usos}"
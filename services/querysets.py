@@ -1,11 +1,17 @@
 from typing import Any
-from django.db.models import OuterRef, Case, When, Exists, BooleanField, Prefetch
+from django.db.models import OuterRef, Exists, Prefetch, Count, Sum, F, Q, Value
+from django.db.models.functions import Coalesce
 
 from core.models import AuditQuerySet
+from core.stats_cache import invalidar
 
 
 class ServicioQuerySet(AuditQuerySet):
-    def with_disponibilidad(self):
+    def actualizar_disponibilidad(self):
+        """
+        Recalcula en una sola sentencia la disponibilidad guardada de los servicios:
+        un servicio está disponible si ninguno de sus productos activos está sin existencias.
+        """
         from inventory.models import Producto
 
         noTieneExistenciasQuery = (
@@ -14,12 +20,31 @@ class ServicioQuerySet(AuditQuerySet):
             .filter(servicios__id=OuterRef("pk"), posee_existencias=False)
             .values("id")
         )
+        invalidar(self.model._meta.label_lower)
+        return self.update(disponibilidad=~Exists(noTieneExistenciasQuery))
+
+    def with_rendimiento(self, desde=None, hasta=None):
+        """
+        Anota por servicio, en una sola consulta agrupada, la cantidad de servicios
+        realizados activos (num_realizados) y la suma de (cantidad - 1) de los productos
+        utilizados en ellos (variacion_uso), opcionalmente dentro de un rango de fechas.
+        """
+        realizados = Q(servicios_realizados__deleted_at__isnull=True)
+        if desde is not None:
+            realizados &= Q(servicios_realizados__fecha__gte=desde)
+        if hasta is not None:
+            realizados &= Q(servicios_realizados__fecha__lte=hasta)
+
         return self.annotate(
-            disponibilidad=Case(
-                When(~Exists(noTieneExistenciasQuery), then=True),
-                default=False,
-                output_field=BooleanField(),
-            )
+            num_realizados=Count("servicios_realizados", filter=realizados, distinct=True),
+            variacion_uso=Coalesce(
+                Sum(
+                    F("servicios_realizados__productos_utilizados__cantidad") - 1,
+                    filter=realizados
+                    & Q(servicios_realizados__productos_utilizados__deleted_at__isnull=True),
+                ),
+                Value(0),
+            ),
         )
 
     def prefetch_imagenes(self):
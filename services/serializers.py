@@ -65,9 +65,7 @@ class ServicioGridSerializer(ExcludeAbstractFieldsMixin, serializers.ModelSerial
         ]
 
     def get_disponibilidad(self, obj):
-        if hasattr(obj, "disponibilidad"):
-            return obj.disponibilidad
-        return None
+        return obj.disponibilidad
 
     def get_cover(self, obj):
         if hasattr(obj, "cover") and len(obj.cover) > 0:
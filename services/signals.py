@@ -1,2 +1,232 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models import Sum
+
+from core.periodos import dia
+from inventory.models import Lote, ProductoStock
+from inventory.signals import eliminando_productos
+from .models import (
+    ProductoUsoDiario,
+    Servicio,
+    ServicioRealizado,
+    ServicioRealizadoDiario,
+)
+
+
+def servicio_realizado_producto_guardar_anterior(sender, instance, **kwargs):
+    """
+    Guarda el lote, la cantidad y el estado de eliminación previos del registro
+    para poder calcular la diferencia de consumo en el post_save, y el día y estado
+    del servicio realizado previo para la diferencia del uso diario del producto.
+    """
+    instance._consumo_anterior = None
+    instance._uso_anterior = None
+    if instance.pk is not None and not instance._state.adding:
+        anterior = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list(
+                "lote_id",
+                "producto_id",
+                "cantidad",
+                "deleted_at",
+                "servicio_realizado__fecha",
+                "servicio_realizado__deleted_at",
+            )
+            .first()
+        )
+        if anterior is not None:
+            lote_id, producto_id, cantidad, deleted_at, fecha, servicio_eliminado = anterior
+            instance._consumo_anterior = (lote_id, producto_id, cantidad, deleted_at)
+            if deleted_at is None and servicio_eliminado is None:
+                instance._uso_anterior = (dia(fecha), producto_id, cantidad)
+
+
+def lote_update_consumido_on_servicio_realizado_producto_save(
+    sender, instance, created, **kwargs
+):
+    cambios: dict[int, int] = {}
+    productos = {instance.producto_id}
+
+    anterior = getattr(instance, "_consumo_anterior", None)
+    if anterior is not None:
+        lote_id, producto_id, cantidad, deleted_at = anterior
+        productos.add(producto_id)
+        if deleted_at is None:
+            cambios[lote_id] = cambios.get(lote_id, 0) - cantidad
+
+    if instance.deleted_at is None:
+        cambios[instance.lote_id] = cambios.get(instance.lote_id, 0) + instance.cantidad
+
+    Lote.objects.registrar_consumo(cambios)
+    ProductoStock.objects.recalcular(productos)
+    instance._consumo_anterior = None
+
+
+def lote_update_consumido_on_servicio_realizado_producto_delete(
+    sender, instance, origin=None, **kwargs
+):
+    if instance.deleted_at is None:
+        Lote.objects.registrar_consumo({instance.lote_id: -instance.cantidad})
+    if not eliminando_productos(origin):
+        ProductoStock.objects.recalcular([instance.producto_id])
+
+
+def servicio_update_disponibilidad_on_existencias(sender, producto_ids, **kwargs):
+    Servicio.objects.filter(productos__in=producto_ids).actualizar_disponibilidad()
+
+
+def servicio_update_disponibilidad_on_productos_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Recalcula la disponibilidad de los servicios afectados al agregar, quitar o
+    limpiar productos. En clear no se recibe pk_set, por lo que los servicios de
+    un producto se guardan en pre_clear.
+    """
+    if action == "pre_clear":
+        if reverse:
+            instance._servicios_anteriores = list(
+                instance.servicios.values_list("id", flat=True)
+            )
+        return
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        servicio_ids = [instance.pk]
+    elif action == "post_clear":
+        servicio_ids = getattr(instance, "_servicios_anteriores", [])
+    else:
+        servicio_ids = pk_set
+
+    Servicio.objects.filter(pk__in=servicio_ids).actualizar_disponibilidad()
+
+
+def producto_guardar_servicios_anteriores(sender, instance, **kwargs):
+    """
+    Al eliminar físicamente un producto sus relaciones con servicios se borran en
+    cascada sin emitir m2m_changed; se guardan para recalcularlos en el post_delete.
+    """
+    instance._servicios_anteriores = list(instance.servicios.values_list("id", flat=True))
+
+
+def servicio_update_disponibilidad_on_producto_delete(sender, instance, **kwargs):
+    Servicio.objects.filter(
+        pk__in=getattr(instance, "_servicios_anteriores", [])
+    ).actualizar_disponibilidad()
+
+
+def servicio_realizado_guardar_anterior(sender, instance, **kwargs):
+    """
+    Guarda (fecha, servicio_id, pagado, deleted_at) previos del servicio realizado en
+    instance._servicio_realizado_anterior (None al crearlo). Es la única lectura previa al
+    guardado y la usan los dos acumulados: servicio_realizado_diario_on_servicio_realizado_save
+    y producto_uso_diario_on_servicio_realizado_save.
+    """
+    instance._servicio_realizado_anterior = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._servicio_realizado_anterior = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("fecha", "servicio_id", "pagado", "deleted_at")
+            .first()
+        )
+
+
+def _sumar_diario(diferencias, fecha, servicio_id, pagado, signo: int):
+    clave = (dia(fecha), servicio_id)
+    actual = diferencias.setdefault(clave, {"cantidad": 0, "pagado": 0})
+    actual["cantidad"] += signo
+    actual["pagado"] += signo * (pagado or 0)
+
+
+def servicio_realizado_diario_on_servicio_realizado_save(
+    sender, instance, created, **kwargs
+):
+    anterior = getattr(instance, "_servicio_realizado_anterior", None)
+    actual = (instance.fecha, instance.servicio_id, instance.pagado, instance.deleted_at)
+    if not created and anterior == actual:
+        return
+
+    diferencias = {}
+    if anterior is not None and anterior[3] is None:
+        _sumar_diario(diferencias, *anterior[:3], -1)
+    if instance.deleted_at is None:
+        _sumar_diario(diferencias, *actual[:3], 1)
+    ServicioRealizadoDiario.objects.sumar(diferencias)
+
+
+def servicio_realizado_diario_on_servicio_realizado_delete(sender, instance, **kwargs):
+    if instance.deleted_at is None:
+        diferencias = {}
+        _sumar_diario(diferencias, instance.fecha, instance.servicio_id, instance.pagado, -1)
+        ServicioRealizadoDiario.objects.sumar(diferencias)
+
+
+def _uso_actual(instance):
+    """
+    (día, producto_id, cantidad) con que cuenta el registro en el uso diario, o None si no
+    cuenta (el registro o su servicio realizado están eliminados).
+    """
+    servicio_realizado = (
+        ServicioRealizado.objects.filter(pk=instance.servicio_realizado_id)
+        .values_list("fecha", "deleted_at")
+        .first()
+    )
+    if instance.deleted_at is not None or servicio_realizado is None:
+        return None
+    fecha, deleted_at = servicio_realizado
+    if deleted_at is not None:
+        return None
+    return (dia(fecha), instance.producto_id, instance.cantidad)
+
+
+def _sumar_usos(diferencias, uso, signo: int):
+    if uso is not None:
+        fecha, producto_id, cantidad = uso
+        actual = diferencias.setdefault((fecha, producto_id), {"usos": 0})
+        actual["usos"] += signo * cantidad
+
+
+def producto_uso_diario_on_servicio_realizado_producto_save(
+    sender, instance, created, **kwargs
+):
+    diferencias = {}
+    _sumar_usos(diferencias, getattr(instance, "_uso_anterior", None), -1)
+    _sumar_usos(diferencias, _uso_actual(instance), 1)
+    ProductoUsoDiario.objects.sumar(diferencias)
+    instance._uso_anterior = None
+
+
+def producto_uso_diario_on_servicio_realizado_producto_delete(
+    sender, instance, origin=None, **kwargs
+):
+    if eliminando_productos(origin):
+        return
+    diferencias = {}
+    _sumar_usos(diferencias, _uso_actual(instance), -1)
+    ProductoUsoDiario.objects.sumar(diferencias)
+
+
+def producto_uso_diario_on_servicio_realizado_save(sender, instance, created, **kwargs):
+    """
+    Al cambiar la fecha o eliminar un servicio realizado, sus productos pasan a
+    contar en otro día (o en ninguno).
+    """
+    anterior = getattr(instance, "_servicio_realizado_anterior", None)
+    if created or anterior is None:
+        return
+    if (anterior[0], anterior[3]) == (instance.fecha, instance.deleted_at):
+        return
+
+    usos = (
+        instance.productos_utilizados.filter(deleted_at__isnull=True)
+        .order_by()
+        .values("producto_id")
+        .annotate(total=Sum("cantidad"))
+    )
+    diferencias = {}
+    for fila in usos:
+        if anterior[3] is None:
+            _sumar_usos(diferencias, (dia(anterior[0]), fila["producto_id"], fila["total"]), -1)
+        if instance.deleted_at is None:
+            _sumar_usos(diferencias, (dia(instance.fecha), fila["producto_id"], fila["total"]), 1)
+    ProductoUsoDiario.objects.sumar(diferencias)
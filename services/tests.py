@@ -1,7 +1,26 @@
+import datetime
+import threading
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
 from django.utils import timezone
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from core.concurrency import con_reintentos
 from customers.models import Cliente
-from services.models import Servicio, ServicioRealizado
+from inventory.models import Lote, Producto, ProductoStock
+from services.models import (
+    ProductoUsoDiario,
+    Servicio,
+    ServicioRealizado,
+    ServicioRealizadoDiario,
+    ServicioRealizadoProducto,
+)
 
 
 class ServicioRealizadoTestCase(TestCase):
@@ -25,3 +44,547 @@ class ServicioRealizadoTestCase(TestCase):
         self.assertEqual(self.servicio_realizado.pagado, True)
         self.assertEqual(self.servicio_realizado.finalizado, False)
 
+
+
+class AsignacionFefoTestCase(TestCase):
+    def setUp(self):
+        self.servicio_realizado = ServicioRealizado.objects.create(
+            cliente=Cliente.objects.create(nombre="John Doe"),
+            servicio=Servicio.objects.create(nombre="Service 1"),
+        )
+
+    def crear_producto(self, nombre, lotes):
+        producto = Producto.objects.create(nombre=nombre, usos_est=2)
+        for dias in lotes:
+            Lote.objects.create(
+                producto=producto, cant=1, fe_exp=timezone.now() + timezone.timedelta(days=dias)
+            )
+        return producto
+
+    def test_splits_quantity_following_fefo(self):
+        producto = self.crear_producto("P1", [30, 5, 10])
+
+        asignaciones = ServicioRealizadoProducto.objects.asignar_fefo(
+            self.servicio_realizado, {producto.id: 5}
+        )
+
+        lotes = list(producto.lotes.order_by("fe_exp"))
+        self.assertEqual(
+            [(a.lote_id, a.cantidad) for a in asignaciones],
+            [(lotes[0].id, 2), (lotes[1].id, 2), (lotes[2].id, 1)],
+        )
+        self.assertEqual(producto.lotes.get(pk=lotes[2].id).servicios_realizados, 1)
+        self.assertEqual(ProductoStock.objects.get(producto=producto).usos_restantes, 1)
+
+    def test_query_count_does_not_grow_with_lotes(self):
+        pocos = self.crear_producto("P1", [5])
+        muchos = self.crear_producto("P2", range(1, 21))
+
+        with CaptureQueriesContext(connection) as pocos_ctx:
+            ServicioRealizadoProducto.objects.asignar_fefo(
+                self.servicio_realizado, {pocos.id: 1}
+            )
+        with CaptureQueriesContext(connection) as muchos_ctx:
+            ServicioRealizadoProducto.objects.asignar_fefo(
+                self.servicio_realizado, {muchos.id: 39}
+            )
+
+        self.assertEqual(len(pocos_ctx.captured_queries), len(muchos_ctx.captured_queries))
+
+    def test_insufficient_stock_writes_nothing(self):
+        producto = self.crear_producto("P1", [5])
+
+        with self.assertRaisesMessage(ValidationError, "no tiene suficiente stock"):
+            ServicioRealizadoProducto.objects.asignar_fefo(
+                self.servicio_realizado, {producto.id: 3}
+            )
+        self.assertFalse(ServicioRealizadoProducto.objects.exists())
+
+    def test_payload_ids_are_normalized_and_validated(self):
+        producto = self.crear_producto("P1", [5])
+
+        asignaciones = ServicioRealizadoProducto.objects.asignar_fefo(
+            self.servicio_realizado, {str(producto.id): "1"}
+        )
+        self.assertEqual([a.producto_id for a in asignaciones], [producto.id])
+
+        with self.assertRaisesMessage(ValidationError, "No existen los productos"):
+            ServicioRealizadoProducto.objects.asignar_fefo(
+                self.servicio_realizado, {producto.id + 100: 1}
+            )
+
+
+    def test_create_responds_errors_as_text(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from services.views import ServicioRealizadoView
+
+        producto = self.crear_producto("P1", [5])
+        user = User.objects.create(username="admin")
+
+        def crear(data):
+            request = APIRequestFactory().post("/", data, format="json")
+            force_authenticate(request, user=user)
+            return ServicioRealizadoView.as_view({"post": "create"})(request)
+
+        response = crear(
+            {
+                "cliente": self.servicio_realizado.cliente_id,
+                "servicio": self.servicio_realizado.servicio_id,
+                "productos": [{"producto": producto.id, "cantidad": 3}],
+            }
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, "El producto P1 no tiene suficiente stock")
+        self.assertEqual(ServicioRealizado.objects.count(), 1)
+
+        response = crear({"servicio": self.servicio_realizado.servicio_id})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsInstance(response.data, str)
+        self.assertIn("cliente", response.data)
+
+
+class ServicioDisponibilidadTestCase(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="P1", usos_est=1)
+        self.servicio = Servicio.objects.create(nombre="Service 1")
+
+    def crear_lote(self, dias=30):
+        return Lote.objects.create(
+            producto=self.producto,
+            cant=1,
+            fe_exp=timezone.now() + timezone.timedelta(days=dias),
+        )
+
+    def disponibilidad(self):
+        return Servicio.objects.values_list("disponibilidad", flat=True).get(
+            pk=self.servicio.pk
+        )
+
+    def test_follows_product_stock(self):
+        self.assertTrue(self.disponibilidad())
+
+        self.servicio.productos.add(self.producto)
+        self.assertFalse(self.disponibilidad())
+
+        lote = self.crear_lote()
+        self.assertTrue(self.disponibilidad())
+
+        ServicioRealizadoProducto.objects.asignar_fefo(
+            ServicioRealizado.objects.create(
+                cliente=Cliente.objects.create(nombre="John Doe"), servicio=self.servicio
+            ),
+            {self.producto.id: 1},
+        )
+        self.assertFalse(self.disponibilidad())
+
+        lote.delete()
+        self.assertFalse(self.disponibilidad())
+
+    def test_follows_productos_relation(self):
+        self.servicio.productos.add(self.producto)
+        self.assertFalse(self.disponibilidad())
+
+        self.producto.servicios.remove(self.servicio)
+        self.assertTrue(self.disponibilidad())
+
+        self.producto.servicios.add(self.servicio)
+        self.producto.delete()
+        self.assertTrue(self.disponibilidad())
+
+    def test_hard_deleting_product_updates_services(self):
+        self.servicio.productos.add(self.producto)
+        self.assertFalse(self.disponibilidad())
+
+        Producto.objects.filter(pk=self.producto.pk).delete()
+        self.assertTrue(self.disponibilidad())
+
+    def test_only_products_whose_stock_changed_touch_services(self):
+        self.crear_lote()
+        self.servicio.productos.add(self.producto)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.crear_lote(dias=60)
+
+        self.assertFalse(
+            any("services_servicio" in q["sql"] for q in ctx.captured_queries)
+        )
+
+
+class ServicioRealizadoDiarioTestCase(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre="John Doe")
+        self.servicio = Servicio.objects.create(nombre="Service 1")
+        self.otro = Servicio.objects.create(nombre="Service 2")
+        self.dia = timezone.localdate()
+
+    def registrar(self, servicio, dias=0, pagado="10.00"):
+        return ServicioRealizado.objects.create(
+            cliente=self.cliente,
+            servicio=servicio,
+            fecha=timezone.now() - timezone.timedelta(days=dias),
+            pagado=Decimal(pagado),
+        )
+
+    def diarios(self):
+        return {
+            (fila.fecha, fila.servicio_id): (fila.cantidad, fila.pagado)
+            for fila in ServicioRealizadoDiario.objects.all()
+        }
+
+    def test_rollup_follows_recording_editing_and_deleting(self):
+        primero = self.registrar(self.servicio)
+        self.registrar(self.servicio, pagado="5.00")
+        self.assertEqual(
+            self.diarios(), {(self.dia, self.servicio.id): (2, Decimal("15.00"))}
+        )
+
+        primero.servicio = self.otro
+        primero.save()
+        self.assertEqual(
+            self.diarios(),
+            {
+                (self.dia, self.servicio.id): (1, Decimal("5.00")),
+                (self.dia, self.otro.id): (1, Decimal("10.00")),
+            },
+        )
+
+        primero.delete()
+        self.assertEqual(
+            self.diarios(), {(self.dia, self.servicio.id): (1, Decimal("5.00"))}
+        )
+
+    def test_writes_apply_deltas_to_the_existing_row(self):
+        self.registrar(self.servicio)
+        # Una fila que otra transacción ya incrementó no se recalcula desde cero.
+        ServicioRealizadoDiario.objects.update(cantidad=5, pagado=Decimal("50.00"))
+
+        segundo = self.registrar(self.servicio, pagado="5.00")
+        self.assertEqual(
+            self.diarios(), {(self.dia, self.servicio.id): (6, Decimal("55.00"))}
+        )
+
+        segundo.hard_delete()
+        self.assertEqual(
+            self.diarios(), {(self.dia, self.servicio.id): (5, Decimal("50.00"))}
+        )
+
+    def test_rebuild_matches_incremental_rollup(self):
+        from django.core.management import call_command
+
+        self.registrar(self.servicio, dias=40)
+        self.registrar(self.otro, dias=2)
+        esperado = self.diarios()
+
+        ServicioRealizadoDiario.objects.all().delete()
+        call_command("rebuild_servicio_realizado_diario", stdout=StringIO())
+        self.assertEqual(self.diarios(), esperado)
+
+    def test_stats_endpoints_read_the_rollup(self):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from core import periodos
+        from services.views import most_performed_services, service_per_months
+
+        self.registrar(self.servicio)
+        self.registrar(self.servicio)
+        self.registrar(self.otro)
+
+        factory = APIRequestFactory()
+        user = User.objects.create(username="admin")
+
+        request = factory.get("/", {"period": "year"})
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = service_per_months(request)
+        self.assertEqual([fila["total_servicios"] for fila in response.data], [3])
+        self.assertFalse(
+            any("services_serviciorealizado\"" in q["sql"] for q in ctx.captured_queries)
+        )
+
+        request = factory.get("/", {"period": "month"})
+        force_authenticate(request, user=user)
+        response = service_per_months(request)
+        # Un periodo por mes hasta el actual, sin meses futuros.
+        self.assertEqual(len(response.data), periodos.hoy().month)
+        self.assertEqual(response.data[-1]["total_servicios"], 3)
+
+        request = factory.get("/", {"period": "week"})
+        force_authenticate(request, user=user)
+        response = most_performed_services(request)
+        self.assertEqual(
+            list(response.data),
+            [
+                {"servicio__nombre": "Service 1", "total_servicios": 2},
+                {"servicio__nombre": "Service 2", "total_servicios": 1},
+            ],
+        )
+
+
+class PerformanceServicesProductsTestCase(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(nombre="John Doe")
+        self.servicio = Servicio.objects.create(nombre="Service 1")
+        self.otro = Servicio.objects.create(nombre="Service 2")
+        producto = Producto.objects.create(nombre="P1", usos_est=100)
+        lote = Lote.objects.create(producto=producto, fe_exp=timezone.now() + timezone.timedelta(days=30))
+
+        for servicio, dias, cantidades in [
+            (self.servicio, 1, [3, 1]),
+            (self.servicio, 40, [2]),
+            (self.otro, 1, []),
+        ]:
+            servicio_realizado = ServicioRealizado.objects.create(
+                cliente=cliente,
+                servicio=servicio,
+                fecha=timezone.now() - timezone.timedelta(days=dias),
+            )
+            for cantidad in cantidades:
+                ServicioRealizadoProducto.objects.create(
+                    servicio_realizado=servicio_realizado,
+                    producto=producto,
+                    lote=lote,
+                    cantidad=cantidad,
+                )
+
+        eliminado = ServicioRealizado.objects.create(cliente=cliente, servicio=self.otro)
+        eliminado.delete()
+        self.user = User.objects.create(username="admin")
+
+    def get(self, **params):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from services.views import performance_services_products
+
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=self.user)
+        return performance_services_products(request).data
+
+    def test_single_grouped_query(self):
+        with self.assertNumQueries(1):
+            data = self.get()
+
+        self.assertEqual(
+            data,
+            [
+                {"servicio": "Service 1", "num_realizados": 2, "variacion_uso": 3},
+                {"servicio": "Service 2", "num_realizados": 1, "variacion_uso": 0},
+            ],
+        )
+
+    def test_date_range_and_limit(self):
+        desde = (timezone.now() - timezone.timedelta(days=7)).isoformat()
+
+        self.assertEqual(
+            self.get(fecha_inicio=desde, limit=1),
+            [{"servicio": "Service 1", "num_realizados": 1, "variacion_uso": 2}],
+        )
+
+
+class ProductoUsoDiarioTestCase(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre="John Doe")
+        self.servicio = Servicio.objects.create(nombre="Service 1")
+        self.p1 = Producto.objects.create(nombre="P1", sku="P1", usos_est=100)
+        self.p2 = Producto.objects.create(nombre="P2", sku="P2", usos_est=100)
+        for producto in (self.p1, self.p2):
+            Lote.objects.create(
+                producto=producto, fe_exp=timezone.now() + timezone.timedelta(days=365)
+            )
+        self.user = User.objects.create(username="admin")
+
+    def registrar(self, fecha, cantidades):
+        servicio_realizado = ServicioRealizado.objects.create(
+            cliente=self.cliente,
+            servicio=self.servicio,
+            fecha=timezone.make_aware(datetime.datetime.combine(fecha, datetime.time(12))),
+        )
+        ServicioRealizadoProducto.objects.asignar_fefo(servicio_realizado, cantidades)
+        return servicio_realizado
+
+    def usos(self):
+        return {
+            (fila.fecha, fila.producto_id): fila.usos
+            for fila in ProductoUsoDiario.objects.all()
+        }
+
+    def get(self, **params):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from inventory.views import StatisticsViewSet
+
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=self.user)
+        view = StatisticsViewSet.as_view({"get": "productos_mas_utilizados"})
+        return view(request).data
+
+    def test_rollup_follows_recording_moving_and_deleting(self):
+        dia = datetime.date(2024, 3, 4)
+        otro_dia = datetime.date(2024, 3, 9)
+        servicio_realizado = self.registrar(dia, {self.p1.id: 2, self.p2.id: 1})
+        self.registrar(dia, {self.p1.id: 3})
+        self.assertEqual(self.usos(), {(dia, self.p1.id): 5, (dia, self.p2.id): 1})
+
+        servicio_realizado.fecha = servicio_realizado.fecha + datetime.timedelta(days=5)
+        servicio_realizado.save()
+        self.assertEqual(
+            self.usos(),
+            {(dia, self.p1.id): 3, (otro_dia, self.p1.id): 2, (otro_dia, self.p2.id): 1},
+        )
+
+        servicio_realizado.delete()
+        self.assertEqual(self.usos(), {(dia, self.p1.id): 3})
+
+        esperado = self.usos()
+        ProductoUsoDiario.objects.all().delete()
+        call_command("rebuild_producto_uso_diario", stdout=StringIO())
+        self.assertEqual(self.usos(), esperado)
+
+    def test_writes_apply_deltas_to_the_existing_row(self):
+        dia = datetime.date(2024, 3, 4)
+        servicio_realizado = self.registrar(dia, {self.p1.id: 2})
+        ProductoUsoDiario.objects.update(usos=10)
+
+        utilizado = servicio_realizado.productos_utilizados.get()
+        utilizado.cantidad = 3
+        utilizado.save()
+        self.assertEqual(self.usos(), {(dia, self.p1.id): 11})
+
+        servicio_realizado.delete()
+        self.assertEqual(self.usos(), {(dia, self.p1.id): 8})
+
+    def test_arbitrary_range_with_granularity(self):
+        self.registrar(datetime.date(2024, 1, 30), {self.p1.id: 1, self.p2.id: 4})
+        self.registrar(datetime.date(2024, 2, 2), {self.p1.id: 2})
+        self.registrar(datetime.date(2024, 3, 1), {self.p1.id: 7})
+
+        with self.assertNumQueries(1):
+            data = self.get(fecha_inicio="2024-01-15", fecha_fin="2024-02-20")
+        self.assertEqual([(d["nombre"], d["usos"]) for d in data], [("P2", 4), ("P1", 3)])
+
+        data = self.get(
+            fecha_inicio="2024-01-01", fecha_fin="2024-03-31", granularity="month", limit=1
+        )
+        self.assertEqual(
+            [(d["period"], d["nombre"], d["usos"]) for d in data],
+            [("2024-01-01", "P2", 4), ("2024-02-01", "P1", 2), ("2024-03-01", "P1", 7)],
+        )
+
+
+class RegistroConcurrenteTestCase(TransactionTestCase):
+    """
+    Registra servicios en paralelo sobre los mismos lotes y comprueba que el
+    stock nunca se sobrevende. El rendimiento se mide con el comando
+    benchmark_registro_concurrente.
+    """
+
+    USOS_POR_REGISTRO = 2
+    REGISTROS_POR_HILO = 6
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre="John Doe")
+        self.servicio = Servicio.objects.create(nombre="Service 1")
+
+    @con_reintentos(intentos=10, espera=0.005)
+    @transaction.atomic
+    def registrar(self, producto_id):
+        servicio_realizado = ServicioRealizado.objects.create(
+            cliente=self.cliente, servicio=self.servicio
+        )
+        ServicioRealizadoProducto.objects.asignar_fefo(
+            servicio_realizado, {producto_id: self.USOS_POR_REGISTRO}
+        )
+
+    def registrar_en_paralelo(self, producto_id, hilos):
+        exitos, errores = [], []
+
+        def trabajador():
+            try:
+                for _ in range(self.REGISTROS_POR_HILO):
+                    try:
+                        self.registrar(producto_id)
+                        exitos.append(1)
+                    except ValidationError:
+                        pass
+                    except Exception as e:
+                        errores.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=trabajador) for _ in range(hilos)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(exitos), errores
+
+    def test_parallel_recordings_never_oversell(self):
+        for hilos in (1, 2, 4, 8):
+            with self.subTest(hilos=hilos):
+                producto = Producto.objects.create(nombre=f"P{hilos}", usos_est=5)
+                for dias in (5, 10, 15):
+                    Lote.objects.create(
+                        producto=producto,
+                        cant=2,
+                        fe_exp=timezone.now() + timezone.timedelta(days=dias),
+                    )
+                # 30 usos disponibles; la demanda los supera a partir de 4 hilos.
+                disponibles = 30
+
+                exitos, errores = self.registrar_en_paralelo(producto.id, hilos)
+
+                self.assertEqual(errores, [])
+                demanda = hilos * self.REGISTROS_POR_HILO * self.USOS_POR_REGISTRO
+                consumido = exitos * self.USOS_POR_REGISTRO
+                self.assertEqual(consumido, min(demanda, disponibles))
+
+                asignado = ServicioRealizadoProducto.objects.filter(
+                    producto=producto
+                ).aggregate(total=Sum("cantidad"))["total"]
+                self.assertEqual(asignado, consumido)
+                for lote in producto.lotes.with_servicios_restantes():
+                    self.assertGreaterEqual(lote.servicios_restantes, 0)
+                self.assertEqual(
+                    ProductoStock.objects.get(producto=producto).usos_restantes,
+                    disponibles - consumido,
+                )
+
+
+class ServicioGridTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="admin")
+        self.corte = Servicio.objects.create(nombre="Corte", precio=Decimal("10.00"))
+        self.tinte = Servicio.objects.create(nombre="Tinte", precio=Decimal("30.00"))
+        self.corte.productos.add(
+            Producto.objects.create(nombre="Shampoo A", sku="SHA"),
+            Producto.objects.create(nombre="Shampoo B", sku="SHB"),
+        )
+
+    def get(self, vista, **params):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from services.views import ServicioRealizadoView, ServicioView
+
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=self.user)
+        clase = {"servicio": ServicioView, "realizado": ServicioRealizadoView}[vista]
+        return clase.as_view({"get": "grid"})(request)
+
+    def test_many_to_many_filter_does_not_duplicate_rows(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.get("servicio", productos="shampoo", offset=0)
+
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual([fila["id"] for fila in response.data["results"]], [self.corte.id])
+        self.assertEqual(response.data["results"][0]["row_number"], 1)
+        self.assertIn("EXISTS", consultas.captured_queries[0]["sql"].upper())
+
+        # Sin el filtro no se consulta la relación.
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.get("servicio", offset=0, precio="30.00")
+        self.assertEqual([fila["id"] for fila in response.data["results"]], [self.tinte.id])
+        self.assertNotIn("servicio_productos", consultas.captured_queries[0]["sql"])
+
+    def test_invalid_params_return_400(self):
+        self.assertEqual(self.get("servicio", precio="caro").status_code, 400)
+        response = self.get("realizado", fecha_inicio="2024-02-01", fecha_fin="2024-01-01")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data, {"error": "La fecha de inicio no puede ser mayor a la fecha de fin"}
+        )
@@ -1,6 +1,6 @@
 from django.urls import include, path
 from rest_framework import routers
-from . import views
+from . import async_views, views
 
 router = routers.DefaultRouter()
 router.register(r"servicio", views.ServicioView, "servicio")
@@ -35,4 +35,20 @@ urlpatterns = [
         views.performance_services_products,
         name="performance-services-products",
     ),
+    # Variantes asíncronas (ASGI) de las estadísticas.
+    path(
+        "api/v1/async/stats/servicios-realizados/",
+        async_views.service_per_months,
+        name="async-servicios-realizados",
+    ),
+    path(
+        "api/v1/async/stats/most-performed-services/",
+        async_views.most_performed_services,
+        name="async-most-performed-services",
+    ),
+    path(
+        "api/v1/async/stats/performance-services-products/",
+        async_views.performance_services_products,
+        name="async-performance-services-products",
+    ),
 ]
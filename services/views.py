@@ -1,26 +1,37 @@
-import calendar
-import datetime
 from decimal import Decimal
 from dateutil import parser
 from django.db import transaction
-from django.utils import timezone
-from django.db.models import Count, Q
-from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+from django.db.models import Sum
 from rest_framework import status, viewsets
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
 
+from core import periodos
+from core.dashboard import registrar_widget
+from core.grids import (
+    Booleano,
+    Contiene,
+    Existe,
+    FiltrosGrid,
+    GridMixin,
+    Igual,
+    Indexado,
+    RangoFechas,
+)
+from core.concurrency import con_reintentos
+from core.condicional import get_condicional
 from core.serializers import ServicioEspecialidadSerializer
-from inventory.models import Producto
+from core.stats_cache import cache_estadistica
 from .models import (
     Servicio,
     ServicioEspecialidad,
     ServicioRealizado,
+    ServicioRealizadoDiario,
     ServicioRealizadoProducto,
     ServicioEstado,
     ServicioImg,
@@ -38,9 +49,28 @@ from .serializers import (
 
 
 @permission_classes([AllowAny])
-class ServicioView(viewsets.ModelViewSet):
+class ServicioView(GridMixin, viewsets.ModelViewSet):
     queryset = Servicio.objects.active().all()
     serializer_class = ServicioSerializer
+    grid_serializer_class = ServicioGridSerializer
+    grid_filtros = FiltrosGrid(
+        Contiene("nombre"),
+        Contiene("descripcion"),
+        Igual("precio", tipo=Decimal),
+        Contiene("tiempo_est"),
+        Contiene("encargado", "encargado__nombre"),
+        Existe("productos", "productos", ("nombre", "sku")),
+        Booleano("disponibilidad"),
+        Contiene("state", "estado__nombre"),
+    )
+
+    def get_grid_queryset(self):
+        return (
+            self.filter_queryset(self.get_queryset())
+            .select_related("encargado", "estado")
+            .prefetch_related("productos")
+            .prefetch_cover()
+        )
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -51,76 +81,18 @@ class ServicioView(viewsets.ModelViewSet):
         return super().update(request, *args, **kwargs)
 
     @action(methods=["get"], detail=False)
+    @get_condicional("services.servicio")
     def selector(self, request: Request):
         queryset = Servicio.objects.active().values("id", "nombre")
         return Response(queryset, status=status.HTTP_200_OK)
 
     @action(methods=["get"], detail=False)
+    @get_condicional("services.servicioestado")
     def state(self, request: Request):
         states = ServicioEstado.objects.active().all()
         serializer = ServicioEstadoSimpleSerializer(states, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-    @action(methods=["get"], detail=False)
-    def grid(self, request: Request):
-        hasOffset = bool(request.query_params.get("offset"))
-        queryset = self.filter_queryset(self.get_queryset())
-        queryset = (
-            queryset.select_related("encargado", "estado")
-            .prefetch_related("productos")
-            .prefetch_cover()
-            .with_disponibilidad()
-        )
-
-        strNombre = request.query_params.get("nombre")
-        strDescripcion = request.query_params.get("descripcion")
-        strPrecio = request.query_params.get("precio")
-        strTiempoEst = request.query_params.get("tiempo_est")
-        strEncargado = request.query_params.get("encargado")
-        strProductos = request.query_params.get("productos")
-        strDisponibilidad = request.query_params.get("disponibilidad")
-        strState = request.query_params.get("state")
-
-        if strNombre:
-            queryset = queryset.filter(nombre__icontains=strNombre)
-        if strDescripcion:
-            queryset = queryset.filter(descripcion__icontains=strDescripcion)
-        if strPrecio:
-            queryset = queryset.filter(precio=Decimal(strPrecio))
-        if strTiempoEst:
-            queryset = queryset.filter(tiempo_est__icontains=strTiempoEst)
-        if strEncargado:
-            queryset = queryset.filter(encargado__nombre__icontains=strEncargado)
-        if strProductos:
-            queryset = queryset.filter(
-                Q(productos__nombre__icontains=strProductos)
-                | Q(productos__sku__icontains=strProductos)
-            )
-        if strDisponibilidad:
-            queryset = queryset.filter(disponibilidad=strDisponibilidad == "true")
-        if strState:
-            queryset = queryset.filter(estado__nombre__icontains=strState)
-
-        page = self.paginate_queryset(queryset)
-        if hasOffset and page is not None:
-            serializer = ServicioGridSerializer(
-                page, many=True, context=self.get_serializer_context()
-            )
-            data = serializer.data
-
-            if isinstance(self.paginator, LimitOffsetPagination):
-                offset = int(self.paginator.get_offset(request))
-
-                for i, item in enumerate(data):
-                    item["row_number"] = int(offset) + (i + 1)
-
-            return self.get_paginated_response(data)
-
-        serializer = ServicioGridSerializer(
-            queryset, many=True, context=self.get_serializer_context()
-        )
-        return Response({"count": len(serializer.data), "results": serializer.data})
-
     @action(methods=["get"], detail=True)
     def view(self, request: Request, pk=None):
         servicio = self.get_object()
@@ -147,62 +119,21 @@ class ServicioView(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ServicioRealizadoView(viewsets.ModelViewSet):
+class ServicioRealizadoView(GridMixin, viewsets.ModelViewSet):
     queryset = ServicioRealizado.objects.active().all()
     serializer_class = ServicioRealizadoSerializer
+    grid_filtros = FiltrosGrid(
+        Contiene("servicio", "servicio__nombre"),
+        Indexado("cliente", ("nombre",), relacion="cliente"),
+        Igual("pagado", tipo=Decimal),
+        Booleano("finalizado"),
+        RangoFechas("fecha_inicio", "fecha_fin", "fecha", validar=True),
+    )
 
     @action(methods=["get"], detail=True)
     def complete(self, request: Request, pk=None):
         return self.retrieve(request)
 
-    @action(methods=["get"], detail=False)
-    def grid(self, request: Request):
-        hasOffset = bool(request.query_params.get("offset"))
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        strServicio = request.query_params.get("servicio")
-        strCliente = request.query_params.get("cliente")
-        strFechaInicio = request.query_params.get("fecha_inicio")
-        strFechaFin = request.query_params.get("fecha_fin")
-        strPagado = request.query_params.get("pagado")
-        strFinalizado = request.query_params.get("finalizado")
-        
-        if strServicio:
-            queryset = queryset.filter(servicio__nombre__icontains=strServicio)
-        if strCliente:
-            queryset = queryset.filter(cliente__nombre__icontains=strCliente)
-        if strPagado:
-            queryset = queryset.filter(pagado=Decimal(strPagado))
-        if strFinalizado:
-            queryset = queryset.filter(finalizado=strFinalizado == "true")
-        if strFechaInicio and strFechaFin:
-            DateFechaInicio = parser.isoparse(strFechaInicio)
-            DateFechaFin = parser.isoparse(strFechaFin)
-            
-            if DateFechaInicio > DateFechaFin:
-                return Response(
-                    {"error": "La fecha de inicio no puede ser mayor a la fecha de fin"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            
-            queryset = queryset.filter(fecha__range=[DateFechaInicio, DateFechaFin])
-
-        page = self.paginate_queryset(queryset)
-        if hasOffset and page is not None:
-            serializer = self.get_serializer(page, many=True)
-            data = serializer.data
-
-            if isinstance(self.paginator, LimitOffsetPagination):
-                offset = int(self.paginator.get_offset(request))
-
-                for i, item in enumerate(data):
-                    item["row_number"] = int(offset) + (i + 1)
-
-            return self.get_paginated_response(data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"count": len(serializer.data), "results": serializer.data})
-
     def get_serializer(self, *args, **kwargs):
         if self.action == "grid" or self.action == "complete":
             return ServicioRealizadoAllSerializer(*args, **kwargs)
@@ -214,55 +145,28 @@ class ServicioRealizadoView(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         try:
-            return super().create(request, *args, **kwargs)
+            # Si otro registro consumió los mismos lotes se repite la transacción completa.
+            return con_reintentos(super().create)(request, *args, **kwargs)
+        except ValidationError as e:
+            # El cuerpo del 400 es un texto: los errores de asignar_fefo (una lista con un
+            # mensaje) se responden con su mensaje; los del serializer, como str(e).
+            if isinstance(e.detail, list):
+                return Response(" ".join(e.detail), status=status.HTTP_400_BAD_REQUEST)
+            return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
 
     @transaction.atomic
     def perform_create(self, serializer):
         servicioRealizado = serializer.save()
-        if self.request.data["productos"]:
+        if self.request.data.get("productos"):
             producto_data = {
                 item["producto"]: item["cantidad"]
                 for item in self.request.data["productos"]
             }
-            productos = Producto.objects.filter(id__in=producto_data.keys())
-
-            for producto in productos:
-                cantidad = producto_data.get(producto.id, 1)
-
-                if cantidad < 1:
-                    raise Exception(
-                        f"La cantidad del producto {producto.nombre} debe ser mayor a 0"
-                    )
-                if producto.get_usos_restantes < cantidad:
-                    raise Exception(
-                        f"El producto {producto.nombre} no tiene suficiente stock"
-                    )
-
-                while cantidad > 0:
-                    loteToUse = producto.get_lote_to_use
-                    if loteToUse is None:
-                        raise Exception(
-                            f"El producto {producto.nombre} no tiene lotes disponibles"
-                        )
-
-                    if cantidad <= loteToUse.get_servicios_restantes:
-                        ServicioRealizadoProducto.objects.create(
-                            servicio_realizado=servicioRealizado,
-                            producto=producto,
-                            lote=loteToUse,
-                            cantidad=cantidad,
-                        )
-                        cantidad = 0
-                    else:
-                        srvRealizado = ServicioRealizadoProducto.objects.create(
-                            servicio_realizado=servicioRealizado,
-                            producto=producto,
-                            lote=loteToUse,
-                            cantidad=loteToUse.get_servicios_restantes,
-                        )
-                        cantidad -= srvRealizado.cantidad
+            ServicioRealizadoProducto.objects.asignar_fefo(
+                servicioRealizado, producto_data
+            )
 
     @action(methods=["post"], detail=False)
     def update_finalizado_batch(self, request):
@@ -352,120 +256,140 @@ class ServicioImgView(viewsets.ModelViewSet):
         return Response(status=status.HTTP_200_OK)
 
 
-@api_view(["GET"])
-def service_per_months(request: Request):
-    period = request.query_params.get("period", "month")
-
-    ahora = timezone.now()
-
-    if period == "week":
-        # Agrupar por semana
-        servicios = (
-            ServicioRealizado.objects.active()
-            .filter(fecha__year=ahora.year)
-            .annotate(period=TruncWeek("fecha"))
-            .values("period")
-            .annotate(total_servicios=Count("id"))
-            .order_by("period")
-        )
+# Las consultas de las estadísticas se arman en estas funciones para que las vistas
+# síncronas y las asíncronas (async_views) compartan la lógica. Los parámetros
+# inválidos se reportan con ValueError.
 
-    elif period == "month":
-        # Agrupar por mes
-        servicios = (
-            ServicioRealizado.objects.active()
-            .filter(fecha__year=ahora.year)
-            .annotate(period=TruncMonth("fecha"))
-            .values("period")
-            .annotate(total_servicios=Count("id"))
-            .order_by("period")
-        )
 
-    elif period == "year":
-        # Agrupar por año
-        servicios = (
-            ServicioRealizado.objects.active()
-            .annotate(period=TruncYear("fecha"))
-            .values("period")
-            .annotate(total_servicios=Count("id"))
-            .order_by("period")
-        )
+def consulta_service_per_months(params) -> periodos.Serie:
+    """
+    Serie de servicios realizados por semana o mes del año actual hasta hoy, o por año desde
+    el primer año con servicios. Incluye los periodos sin servicios.
+    """
+    period = params.get("period", "month")
 
-    else:
-        return Response(
-            {"error": "Periodo no válido, use 'week', 'month' o 'year'"},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+    if period not in ("week", "month", "year"):
+        raise ValueError("Periodo no válido, use 'week', 'month' o 'year'")
 
-    return Response(servicios, status=status.HTTP_200_OK)
+    # La serie termina hoy: los periodos futuros del año no se completan con ceros.
+    hasta = periodos.hoy()
+    desde = None if period == "year" else periodos.periodo_actual("year")[0]
 
+    return periodos.Serie(
+        ServicioRealizadoDiario.objects,
+        "fecha",
+        desde,
+        hasta,
+        period,
+        {"total_servicios": Sum("cantidad")},
+    )
+
+
+def fila_service_per_months(fila: dict) -> dict:
+    return {
+        "period": periodos.inicio_del_dia(fila["periodo"]),
+        "total_servicios": fila["total_servicios"],
+    }
 
-@api_view(["GET"])
-def most_performed_services(request: Request):
-    period = request.query_params.get("period", "month")
-    strLimit = request.query_params.get("limit")
-
-    today = timezone.now()
-    today_date = today.date()
-
-    if period == "week":
-        start_date = today_date - datetime.timedelta(days=today_date.weekday())
-        end_date = datetime.datetime.combine(start_date + datetime.timedelta(days=6), datetime.time.max)
-    elif period == "month":
-        start_date = today_date.replace(day=1)
-        end_date = datetime.datetime.combine(today_date.replace(day=calendar.monthrange(today_date.year, today_date.month)[1]), datetime.time.max)
-    elif period == "year":
-        start_date = today_date.replace(month=1, day=1)
-        end_date = datetime.datetime.combine(today_date.replace(month=12, day=31), datetime.time.max)
-    else:
-        return Response(
-            {"error": "Periodo no válido, use 'week', 'month' o 'year'"},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+
+def consulta_most_performed_services(params):
+    period = params.get("period", "month")
+    strLimit = params.get("limit")
+
+    start_date, end_date = periodos.periodo_actual(period)
 
     servicios = (
-            ServicioRealizado.objects.active()
+            ServicioRealizadoDiario.objects
             .filter(fecha__range=[start_date, end_date])
             .values("servicio__nombre")
-            .annotate(total_servicios=Count("servicio"))
+            .annotate(total_servicios=Sum("cantidad"))
             .order_by("-total_servicios")
         )
     
     if strLimit:
         servicios = servicios[:int(strLimit)]
 
+    return servicios
+
+
+def consulta_performance_services_products(params):
+    strLimit = params.get("limit")
+    strFechaInicio = params.get("fecha_inicio")
+    strFechaFin = params.get("fecha_fin")
+
+    DateFechaInicio = parser.isoparse(strFechaInicio) if strFechaInicio else None
+    DateFechaFin = parser.isoparse(strFechaFin) if strFechaFin else None
+
+    if DateFechaInicio and DateFechaFin and DateFechaInicio > DateFechaFin:
+        raise ValueError("La fecha de inicio no puede ser mayor a la fecha de fin")
+
+    top_servicios = (
+        Servicio.objects.active()
+        .with_rendimiento(DateFechaInicio, DateFechaFin)
+        .order_by("-num_realizados", "id")
+        .values("nombre", "num_realizados", "variacion_uso")
+    )
+
+    if strLimit:
+        top_servicios = top_servicios[:int(strLimit)]
+
+    return top_servicios
+
+
+def fila_performance_services_products(servicio: dict) -> dict:
+    return {
+        "servicio": servicio["nombre"],
+        "num_realizados": servicio["num_realizados"],
+        "variacion_uso": servicio["variacion_uso"],
+    }
+
+
+@api_view(["GET"])
+@cache_estadistica("service_per_months", tags=("services.serviciorealizadodiario",))
+def service_per_months(request: Request):
+    try:
+        serie = consulta_service_per_months(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    servicios = [fila_service_per_months(fila) for fila in serie.filas()]
+
     return Response(servicios, status=status.HTTP_200_OK)
 
+
 @api_view(["GET"])
+@cache_estadistica(
+    "most_performed_services",
+    tags=("services.serviciorealizadodiario", "services.servicio"),
+)
+def most_performed_services(request: Request):
+    try:
+        servicios = consulta_most_performed_services(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(servicios, status=status.HTTP_200_OK)
+
+@api_view(["GET"])
+@cache_estadistica(
+    "performance_services_products",
+    tags=(
+        "services.servicio",
+        "services.serviciorealizado",
+        "services.serviciorealizadoproducto",
+    ),
+)
 def performance_services_products(request: Request):
-    strLimit = request.query_params.get("limit")
-    
-    top_servicios = Servicio.objects.active().annotate(num_realizados=Count('servicios_realizados')).order_by('-num_realizados')
-    
-    if strLimit:
-        top_servicios = top_servicios[:int(strLimit)]
-    
-    data_servicios = []
-
-    for servicio in top_servicios:
-        num_realizados = servicio.num_realizados
-        variacion_total = 0
-        
-        # Obtener los registros de ServicioRealizado para este servicio
-        servicios_realizados = ServicioRealizado.objects.active().filter(servicio=servicio)
-        
-        for servicio_realizado in servicios_realizados:
-            # Obtener los productos utilizados en cada ServicioRealizado
-            productos_utilizados = ServicioRealizadoProducto.objects.active().filter(servicio_realizado=servicio_realizado)
-            
-            for producto_utilizado in productos_utilizados:
-                #usos_estimados = producto_utilizado.producto.usos_est
-                # Calcular la variación total en el uso de productos
-                variacion_total += (producto_utilizado.cantidad - 1)
-        
-        data_servicios.append({
-            'servicio': servicio.nombre,
-            'num_realizados': num_realizados,
-            'variacion_uso': variacion_total
-        })
-        
-    return Response(data_servicios)
\ No newline at end of file
+    try:
+        top_servicios = consulta_performance_services_products(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    data_servicios = [fila_performance_services_products(servicio) for servicio in top_servicios]
+
+    return Response(data_servicios)
+
+
+registrar_widget("service_per_months", service_per_months)
+registrar_widget("most_performed_services", most_performed_services)
+registrar_widget("performance_services_products", performance_services_products)
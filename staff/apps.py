@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class StaffConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'staff'
+
+    def ready(self) -> None:
+        from core import busqueda
+        from .models import Personal
+
+        busqueda.registrar(Personal, ("nombre", "apellido", "cedula", "email"))
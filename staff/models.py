@@ -54,6 +54,11 @@ class Personal(AuditModel):
     estado = models.ForeignKey(PersonalState, on_delete=models.SET_NULL, null=True, related_name='personal')
     especialidades = models.ManyToManyField(ServicioEspecialidad, related_name="personal", null=True, blank=True)
 
+    class Meta(AuditModel.Meta):
+        indexes = [
+            models.Index(fields=["deleted_at", "created_at"], name="personal_activo_creado_idx"),
+        ]
+
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
 